@@ -0,0 +1,337 @@
+"""
+Benchmarks of the Log Analyzer pipeline stages on synthetic datasets.
+"""
+
+import datetime
+import gzip
+import importlib
+import json
+import os
+import shutil
+import sys
+import tracemalloc
+from collections import namedtuple
+from time import perf_counter
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from helpers.args_parser import get_args_benchmarks
+from helpers.helpers_config import get_config
+from helpers.log_generator import write_log_file
+
+CONFIG_DEFAULT_PATH = "config.json"
+BENCHMARK_LOG_DATE = datetime.datetime(2017, 6, 30)
+
+STAGES = (
+    "search_log_file",
+    "get_log_data",
+    "get_log_data_gz",
+    "parse_log_data",
+    "prepare_report_data",
+    "create_report_file",
+)
+LINES_STAGES = frozenset(STAGES) - {"search_log_file"}
+
+config: Dict[str, Union[int, float, str]] = {
+    "BENCHMARK_DIR": "./benchmark_data",
+    "DATA_ENCODING": "UTF-8",
+}
+
+BenchmarkDataset = namedtuple("BenchmarkDataset", "lines_cnt, seed, log_dir")
+
+
+def get_dataset(lines_cnt: int, seed: int, conf: dict) -> BenchmarkDataset:
+    """
+    Return the dataset directory with the plain log of the day and the gzip
+    log of the day before, both have the same lines. Generated datasets
+    are reused.
+    :param lines_cnt: amount of lines of each log
+    :param seed: seed of the random generator
+    :param conf: benchmarks configs
+    :return: named tuple (lines_cnt, seed, log_dir).
+    """
+    log_dir = os.path.join(str(conf["BENCHMARK_DIR"]), f"{lines_cnt}-{seed}")
+    plain_path = os.path.join(log_dir, get_log_filename(BENCHMARK_LOG_DATE))
+    gz_path = os.path.join(
+        log_dir,
+        f"{get_log_filename(BENCHMARK_LOG_DATE - datetime.timedelta(days=1))}.gz",
+    )
+    if not (os.path.isfile(plain_path) and os.path.isfile(gz_path)):
+        os.makedirs(log_dir, exist_ok=True)
+        encoding = conf["DATA_ENCODING"]
+        write_log_file(
+            f"{plain_path}.tmp", "", BENCHMARK_LOG_DATE, lines_cnt, seed, encoding
+        )
+        with open(f"{plain_path}.tmp", "rb") as f, gzip.open(
+            f"{gz_path}.tmp", "wb", compresslevel=6
+        ) as f_gz:
+            shutil.copyfileobj(f, f_gz)
+        os.replace(f"{gz_path}.tmp", gz_path)
+        os.replace(f"{plain_path}.tmp", plain_path)
+    return BenchmarkDataset(lines_cnt, seed, log_dir)
+
+
+def get_log_filename(log_date: datetime.datetime) -> str:
+    """
+    Return the name of the log file of the date.
+    :param log_date: date of the log
+    :return: filename.
+    """
+    return f"nginx-access-ui.log-{log_date.strftime('%Y%m%d')}"
+
+
+def import_log_analyzer(path_to_conf: str) -> ModuleType:
+    """
+    Return the Log Analyzer module. It reads cli args on import,
+    so only the config file is passed to it.
+    :param path_to_conf: path to the config file
+    :return: log_analyzer module.
+    """
+    if "log_analyzer" not in sys.modules:
+        sys.argv = [sys.argv[0], "--conf", path_to_conf]
+    return importlib.import_module("log_analyzer")
+
+
+def measure(
+    func: Callable[[], Any], trace_memory: bool
+) -> Tuple[Any, Tuple[float, int]]:
+    """
+    Call the function and measure its time and peak of allocated memory.
+    :param func: function without args
+    :param trace_memory: trace memory allocations with tracemalloc
+    :return: tuple (result, (seconds, peak memory in bytes or 0)).
+    """
+    if trace_memory:
+        tracemalloc.start()
+    started_at = perf_counter()
+    try:
+        result = func()
+        seconds = perf_counter() - started_at
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return result, (seconds, peak)
+
+
+def consume(items: Iterable[Any]) -> None:
+    """
+    Iterate all items.
+    :param items: iterable
+    :return:
+    """
+    for _ in items:
+        pass
+
+
+def run_stages(
+    log_analyzer: ModuleType,
+    dataset: BenchmarkDataset,
+    conf: dict,
+    trace_memory: bool = False,
+) -> Dict[str, Tuple[float, int]]:
+    """
+    Run the pipeline stages on the dataset. Stages, which consume the stream
+    of the previous ones (parse_log_data, prepare_report_data), are timed
+    net of the previous stages, their memory peaks include them.
+    :param log_analyzer: log_analyzer module
+    :param dataset: named tuple (lines_cnt, seed, log_dir)
+    :param conf: app configs of the dataset
+    :param trace_memory: measure peaks of memory
+    :return: dict with tuples (seconds, peak memory) by stages.
+    """
+    shutil.rmtree(conf["REPORT_DIR"], ignore_errors=True)
+    os.makedirs(conf["REPORT_DIR"])
+    la = log_analyzer
+    timings: Dict[str, Tuple[float, int]] = {}
+
+    log_file_info, timings["search_log_file"] = measure(
+        lambda: la.search_log_file(conf), trace_memory
+    )
+    gz_log_file_info = la.LastLogData(
+        os.path.join(
+            dataset.log_dir,
+            f"{get_log_filename(log_file_info.date - datetime.timedelta(days=1))}.gz",
+        ),
+        log_file_info.date - datetime.timedelta(days=1),
+        ".gz",
+    )
+
+    def get_parsed_data() -> Iterable[Tuple[str, float]]:
+        """
+        Return parsed lines of the plain log.
+        :return: generator with url string and request time float number.
+        """
+        return la.parse_log_data(
+            la.get_log_data_bytes(log_file_info, conf), log_file_info.path, conf
+        )
+
+    _, timings["get_log_data"] = measure(
+        lambda: consume(la.get_log_data_bytes(log_file_info, conf)), trace_memory
+    )
+    _, timings["get_log_data_gz"] = measure(
+        lambda: consume(la.get_log_data_bytes(gz_log_file_info, conf)), trace_memory
+    )
+    _, timings["parse_log_data"] = measure(
+        lambda: consume(get_parsed_data()), trace_memory
+    )
+    report_data, timings["prepare_report_data"] = measure(
+        lambda: la.prepare_report_data(get_parsed_data(), conf), trace_memory
+    )
+    _, timings["create_report_file"] = measure(
+        lambda: la.create_report_file(report_data, log_file_info.date, conf),
+        trace_memory,
+    )
+
+    read_seconds = timings["get_log_data"][0]
+    parse_seconds, parse_peak = timings["parse_log_data"]
+    parse_seconds = max(parse_seconds - read_seconds, 0.0)
+    prepare_seconds, prepare_peak = timings["prepare_report_data"]
+    prepare_seconds = max(prepare_seconds - read_seconds - parse_seconds, 0.0)
+    timings["parse_log_data"] = (parse_seconds, parse_peak)
+    timings["prepare_report_data"] = (prepare_seconds, prepare_peak)
+    return timings
+
+
+def benchmark_dataset(
+    log_analyzer: ModuleType,
+    dataset: BenchmarkDataset,
+    conf: dict,
+    repeat: int = 1,
+    trace_memory: bool = True,
+) -> Dict[str, dict]:
+    """
+    Return results of the stages on the dataset: the best time of the runs,
+    lines per second, peak memory (of the separate run with tracemalloc,
+    which slows the code down) and the share of the total time.
+    :param log_analyzer: log_analyzer module
+    :param dataset: named tuple (lines_cnt, seed, log_dir)
+    :param conf: app configs
+    :param repeat: amount of timed runs
+    :param trace_memory: make the run measuring peaks of memory
+    :return: dict with results by stages.
+    """
+    dataset_conf = dict(
+        conf,
+        LOG_DIR=dataset.log_dir,
+        REPORT_DIR=os.path.join(dataset.log_dir, "reports"),
+        AGGREGATE_CACHE=False,
+        WORKERS=1,
+    )
+    best_seconds: Dict[str, float] = {}
+    for _ in range(max(repeat, 1)):
+        for stage, (seconds, _) in run_stages(
+            log_analyzer, dataset, dataset_conf
+        ).items():
+            best_seconds[stage] = min(seconds, best_seconds.get(stage, seconds))
+    peaks: Dict[str, Optional[int]] = dict.fromkeys(STAGES)
+    if trace_memory:
+        for stage, (_, peak) in run_stages(
+            log_analyzer, dataset, dataset_conf, trace_memory=True
+        ).items():
+            peaks[stage] = peak
+
+    total_seconds = sum(best_seconds.values()) or 1.0
+    return {
+        stage: {
+            "seconds": round(best_seconds[stage], 6),
+            "lines_per_sec": (
+                round(dataset.lines_cnt / best_seconds[stage])
+                if stage in LINES_STAGES and best_seconds[stage]
+                else None
+            ),
+            "peak_memory": peaks[stage],
+            "share": round(best_seconds[stage] / total_seconds, 4),
+        }
+        for stage in STAGES
+    }
+
+
+def compare_results(
+    results: Dict[str, Dict[str, dict]],
+    baseline: Dict[str, Dict[str, dict]],
+    tolerance: float,
+) -> List[str]:
+    """
+    Return regressions of the results against the baseline: stages
+    of the same datasets slower than the baseline time with the tolerance.
+    :param results: dict with results of stages by datasets sizes
+    :param baseline: results of the baseline run
+    :param tolerance: allowed share of slowdown
+    :return: list of regression messages.
+    """
+    regressions = []
+    for lines_cnt, stages in results.items():
+        for stage, result in stages.items():
+            baseline_result = baseline.get(lines_cnt, {}).get(stage)
+            if not baseline_result or not baseline_result["seconds"]:
+                continue
+            ratio = result["seconds"] / baseline_result["seconds"]
+            result["baseline_ratio"] = round(ratio, 3)
+            if ratio > 1 + tolerance:
+                regressions.append(
+                    f"{stage} on {lines_cnt} lines is {ratio:.2f}x "
+                    f"of the baseline time"
+                )
+    return regressions
+
+
+def format_results(results: Dict[str, Dict[str, dict]]) -> str:
+    """
+    Return the text table with results.
+    :param results: dict with results of stages by datasets sizes
+    :return: text.
+    """
+    header = (
+        f"{'lines':>10} {'stage':<20} {'seconds':>10} {'lines/sec':>12} "
+        f"{'peak MiB':>10} {'share':>7} {'baseline':>9}"
+    )
+    rows = [header]
+    for lines_cnt, stages in results.items():
+        for stage, result in stages.items():
+            lines_per_sec = result["lines_per_sec"]
+            peak = result["peak_memory"]
+            ratio = result.get("baseline_ratio")
+            rows.append(
+                f"{lines_cnt:>10} {stage:<20} {result['seconds']:>10.3f} "
+                f"{lines_per_sec if lines_per_sec is not None else '-':>12} "
+                f"{round(peak / 2 ** 20, 1) if peak is not None else '-':>10} "
+                f"{result['share'] * 100:>6.1f}% "
+                f"{f'{ratio:.2f}x' if ratio is not None else '-':>9}"
+            )
+    return "\n".join(rows)
+
+
+def main(init_config: Dict) -> None:
+    """
+    Main method of the benchmarks app.
+    :param init_config: benchmarks config
+    :return:
+    """
+    params = get_args_benchmarks(CONFIG_DEFAULT_PATH)
+    conf = get_config(init_config, params)
+    log_analyzer = import_log_analyzer(params.conf or CONFIG_DEFAULT_PATH)
+    app_conf = dict(log_analyzer.config, **conf)
+
+    results = {}
+    for lines_cnt in params.sizes:
+        dataset = get_dataset(lines_cnt, params.seed, conf)
+        results[str(lines_cnt)] = benchmark_dataset(
+            log_analyzer, dataset, app_conf, params.repeat, not params.no_memory
+        )
+
+    regressions: List[str] = []
+    if params.baseline:
+        with open(params.baseline, "r", encoding="UTF-8") as f:
+            regressions = compare_results(results, json.load(f), params.tolerance)
+    print(format_results(results))
+    if params.save_baseline:
+        with open(params.save_baseline, "w", encoding="UTF-8") as f:
+            json.dump(results, f, indent=2)
+    if regressions:
+        print("\n".join(["Regressions:"] + regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main(config)
@@ -5,10 +5,37 @@ from utils.args_parser import get_args_log_analyzer
 
 CONFIG_DEFAULT_PATH = "config.json"
 
+CLI_CONFIG_KEYS = {
+    "workers": "WORKERS",
+    "backfill": "BACKFILL",
+    "rollup": "ROLLUP_DAYS",
+    "follow": "FOLLOW",
+    "serve": "SERVE",
+    "profile": "PROFILE",
+    "profile_format": "PROFILE_FORMAT",
+    "profile_lines": "PROFILE_LINES",
+    "trace_malloc": "TRACE_MALLOC",
+}
+
+
+def get_cli_config(params: Namespace) -> dict:
+    """
+    Return configs passed through cli, which override the config file.
+    :param params: params from cli
+    :return: dict with app configs
+    """
+    cli_config = {}
+    for param_name, config_key in CLI_CONFIG_KEYS.items():
+        value = getattr(params, param_name, None)
+        if value is not None:
+            cli_config[config_key] = value
+    return cli_config
+
 
 def get_config(conf: dict) -> dict:
     """
-    Return dict with app configs, merged from const and the passed config file.
+    Return dict with app configs, merged from const, the passed config file
+    and cli args.
     :param conf: app config
     :return: dict with app configs
     """
@@ -18,4 +45,5 @@ def get_config(conf: dict) -> dict:
         config_from_file = json.load(f)
 
     conf.update(config_from_file)
+    conf.update(get_cli_config(params))
     return conf
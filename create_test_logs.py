@@ -1,17 +1,26 @@
+import bz2
 import datetime
 import gzip
 import os
 import random
 from argparse import Namespace
-from typing import Any, Dict, List, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple, Union
 
 from faker import Faker
 
 from helpers.args_parser import get_args_create_test_logs
 from helpers.helpers_config import get_config
+from helpers.log_generator import write_log_file
 from utils.logging_utils import get_logger_adapter
 
 GZ_EXT = ".gz"
+BZ2_EXT = ".bz2"
+LOG_EXTENSIONS = (GZ_EXT, "", BZ2_EXT, ".tar")
+COMPRESSORS: Dict[str, Callable[[str, str], Any]] = {
+    GZ_EXT: gzip.open,
+    BZ2_EXT: bz2.open,
+}
 CONFIG_DEFAULT_PATH = "config.json"
 
 config: Dict[str, Union[int, float, str]] = {
@@ -48,7 +57,7 @@ def create_log_file(fn: str, ext: str, records: List, conf: dict) -> None:
     :param conf: app configs
     :return:
     """
-    f_ext = ext if ext != GZ_EXT else ""
+    f_ext = ext if ext not in COMPRESSORS else ""
     fn = f"{fn}{f_ext}"
     log_dir = conf["GENERATED_LOG_DIR"]
     encoding = conf["DATA_ENCODING"]
@@ -56,10 +65,10 @@ def create_log_file(fn: str, ext: str, records: List, conf: dict) -> None:
     f_path = os.path.join(log_dir, fn)
     with open(f_path, "w", encoding=encoding) as f:
         f.writelines(records)
-    if ext == GZ_EXT:
+    if ext in COMPRESSORS:
         logger_adapter.info(f"Start compressing the file {fn}")
         f_gz_path = os.path.join(log_dir, f"{fn}{ext}")
-        with open(f_path, "rb") as f, gzip.open(f_gz_path, "wb") as f_gz:
+        with open(f_path, "rb") as f, COMPRESSORS[ext](f_gz_path, "wb") as f_gz:
             f_gz.writelines(f)
         os.remove(f_path)
         logger_adapter.info(
@@ -142,10 +151,7 @@ def generate_logs_data(
     base = datetime.datetime.today()
     dates_list = [base - datetime.timedelta(days=x) for x in range(days_cnt)]
     names = map(
-        lambda logs_date: (
-            f"nginx-access-ui.log-{datetime.datetime.strftime(logs_date, '%Y%m%d')}",
-            logs_date,
-        ),
+        lambda logs_date: (get_log_file_name(logs_date), logs_date),
         dates_list,
     )
     logs_data = []
@@ -154,7 +160,7 @@ def generate_logs_data(
         logs_data.append(
             (
                 name,
-                str(fake.random_element(elements=(".gz", "", ".bz2", ".tar"))),
+                str(fake.random_element(elements=LOG_EXTENSIONS)),
                 records,
             )
         )
@@ -162,10 +168,65 @@ def generate_logs_data(
     return logs_data
 
 
+def get_log_file_name(logs_date: datetime.datetime) -> str:
+    """
+    Return the name of the log file of the date without an extension.
+    :param logs_date: date of the log file
+    :return: filename.
+    """
+    return f"nginx-access-ui.log-{datetime.datetime.strftime(logs_date, '%Y%m%d')}"
+
+
+def create_log_file_fast(task: Tuple[str, str, datetime.datetime, int, str]) -> str:
+    """
+    Create the log file with records streamed from the fast generator.
+    :param task: tuple (path, extension, date, amount of records, seed)
+    :return: path to the created file.
+    """
+    path, ext, logs_date, records_cnt, seed = task
+    write_log_file(path, ext, logs_date, records_cnt, seed)
+    return path
+
+
+def create_logs_fast(
+    conf: dict, days_cnt: int, records_cnt: int, seed: int, workers: int = 1
+) -> None:
+    """
+    Create log files with the fast generator by several processes. Extension
+    and records of each file depend on the seed and the date only,
+    so the same seed gives the same files.
+    :param conf: app config
+    :param days_cnt: amount of days should be covered with logs
+    :param records_cnt: amount of records in each log file
+    :param seed: seed of the generator
+    :param workers: amount of processes
+    :return:
+    """
+    base = datetime.datetime.today()
+    tasks = []
+    for days in range(days_cnt):
+        logs_date = base - datetime.timedelta(days=days)
+        file_seed = f"{seed}-{datetime.datetime.strftime(logs_date, '%Y%m%d')}"
+        ext = random.Random(file_seed).choice(LOG_EXTENSIONS)
+        path = os.path.join(
+            conf["GENERATED_LOG_DIR"], f"{get_log_file_name(logs_date)}{ext}"
+        )
+        tasks.append((path, ext, logs_date, records_cnt, file_seed))
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            created_paths = list(executor.map(create_log_file_fast, tasks))
+    else:
+        created_paths = [create_log_file_fast(task) for task in tasks]
+    for path in created_paths:
+        logger_adapter.info(f"The file {path!r} has been created successfully.")
+
+
 def create_logs(conf: dict, params: Namespace) -> None:
     """
     Creates random log files.
     :param conf: app config
+    :param params: params from cli with amount of log files and amount
     of records in each log file.
     :return:
     """
@@ -173,8 +234,17 @@ def create_logs(conf: dict, params: Namespace) -> None:
     clear_test_logs_dir(conf)
     cnt = int(params.cnt)
     records = int(params.records)
-    logs_data = generate_logs_data(cnt, records)
-    generate_log_files(logs_data, conf)
+    if getattr(params, "fast", False):
+        create_logs_fast(
+            conf,
+            cnt,
+            records,
+            int(getattr(params, "seed", 0) or 0),
+            int(getattr(params, "workers", 1) or 1),
+        )
+    else:
+        logs_data = generate_logs_data(cnt, records)
+        generate_log_files(logs_data, conf)
     logger_adapter.info("Finish logs generation...")
 
 
@@ -55,6 +55,116 @@ def get_args_create_test_logs(path_to_conf: Optional[str]) -> Namespace:
                 "default": path_to_conf,
             },
         },
+        {
+            "names": ("--fast",),
+            "kwargs": {
+                "help": "Stream records drawn from precomputed value pools "
+                "(for large files)",
+                "required": False,
+                "action": "store_true",
+            },
+        },
+        {
+            "names": ("--seed",),
+            "kwargs": {
+                "help": "Seed of the fast generator",
+                "required": False,
+                "type": int,
+                "default": 0,
+            },
+        },
+        {
+            "names": ("--workers", "-w"),
+            "kwargs": {
+                "help": "Amount of processes generating files in the fast mode",
+                "required": False,
+                "type": int,
+                "default": 1,
+            },
+        },
+    ]
+    args = get_parsed_args(args_params)
+    return args
+
+
+def get_args_benchmarks(path_to_conf: Optional[str]) -> Namespace:
+    """
+    Return the Namespace with args for benchmarks app
+    passed through cli.
+    :param path_to_conf: default config file path
+    :return: namespace with passed args
+    """
+    args_params = [
+        {
+            "names": ("--sizes", "-s"),
+            "kwargs": {
+                "help": "Amounts of lines of the benchmark datasets",
+                "required": False,
+                "type": int,
+                "nargs": "+",
+                "default": [100000, 1000000, 10000000],
+            },
+        },
+        {
+            "names": ("--seed",),
+            "kwargs": {
+                "help": "Seed of the random generator of datasets",
+                "required": False,
+                "type": int,
+                "default": 42,
+            },
+        },
+        {
+            "names": ("--repeat",),
+            "kwargs": {
+                "help": "Amount of runs of each dataset, the best time is taken",
+                "required": False,
+                "type": int,
+                "default": 1,
+            },
+        },
+        {
+            "names": ("--no-memory",),
+            "kwargs": {
+                "help": "Skip the run measuring peak memory with tracemalloc",
+                "required": False,
+                "action": "store_true",
+            },
+        },
+        {
+            "names": ("--baseline",),
+            "kwargs": {
+                "help": "Path to the baseline json to compare the results with",
+                "required": False,
+                "type": str,
+            },
+        },
+        {
+            "names": ("--save-baseline",),
+            "kwargs": {
+                "help": "Path to the json file to save the results as the baseline",
+                "required": False,
+                "type": str,
+            },
+        },
+        {
+            "names": ("--tolerance",),
+            "kwargs": {
+                "help": "Allowed share of slowdown against the baseline",
+                "required": False,
+                "type": float,
+                "default": 0.1,
+            },
+        },
+        {
+            "names": ("--conf",),
+            "kwargs": {
+                "help": f"Path to the config file (default: {path_to_conf!r})",
+                "required": False,
+                "type": str,
+                "default": path_to_conf,
+            },
+        },
     ]
     args = get_parsed_args(args_params)
     return args
@@ -0,0 +1,180 @@
+"""
+Fast generator of synthetic ui_short logs from precomputed value pools.
+"""
+
+import bz2
+import calendar
+import datetime
+import gzip
+import lzma
+import random
+from collections import namedtuple
+from functools import partial
+from itertools import accumulate
+from typing import Any, Callable, Dict, Generator, List
+
+URLS_POOL_SIZE = 10000
+URLS_ZIPF_EXPONENT = 1.1
+REMOTE_ADDRS_POOL_SIZE = 5000
+REQUEST_TIMES_POOL_SIZE = 4096
+REQUEST_TIME_MU = -2.0
+REQUEST_TIME_SIGMA = 1.0
+GENERATOR_CHUNK_SIZE = 10000
+GZIP_COMPRESS_LEVEL = 6
+SECONDS_IN_DAY = 86400
+
+STATUSES = ("200", "302", "404")
+STATUSES_WEIGHTS = (90, 5, 5)
+METHODS = ("GET", "GET", "GET", "POST")
+URL_PREFIXES = (
+    "/api/v2/banner/",
+    "/api/v2/slot/",
+    "/api/v2/group/",
+    "/api/v2/internal/banner/",
+    "/api/1/photogenic_banners/list/?server_name=",
+)
+USER_AGENTS = (
+    "Lynx/2.8.8dev.9 libwww-FM/2.14 SSL-MM/1.4.1 GNUTLS/2.10.5",
+    "Python-urllib/2.7",
+    "Slotovod",
+    "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36",
+    "-",
+)
+LOG_RECORD_TEMPLATE = (
+    '%s %s  - [%s] "%s %s HTTP/1.1" %s %d "-" "%s" "-" "%d-%d-4708-%d" "-" %s\n'
+)
+
+COMPRESS_OPENERS: Dict[str, Callable[..., Any]] = {
+    ".gz": partial(gzip.GzipFile, compresslevel=GZIP_COMPRESS_LEVEL, mtime=0),
+    ".bz2": bz2.open,
+    ".xz": lzma.open,
+}
+
+ValuePools = namedtuple(
+    "ValuePools",
+    "urls, urls_cum_weights, remote_addrs, remote_users, request_times",
+)
+
+
+def get_zipf_cum_weights(size: int, exponent: float) -> List[float]:
+    """
+    Return cumulative weights of the Zipf distribution of ranks.
+    :param size: amount of ranks
+    :param exponent: exponent of the distribution
+    :return: list of cumulative weights.
+    """
+    return list(accumulate(1 / rank**exponent for rank in range(1, size + 1)))
+
+
+def get_value_pools(rng: random.Random) -> ValuePools:
+    """
+    Return pools of values of log records drawn from the random generator.
+    Urls are ordered by their Zipf weights, request times are drawn
+    from the lognormal distribution.
+    :param rng: random generator
+    :return: named tuple with pools.
+    """
+    urls = [
+        f"{rng.choice(URL_PREFIXES)}{rng.randrange(10 ** 8)}"
+        for _ in range(URLS_POOL_SIZE)
+    ]
+    remote_addrs = [
+        f"1.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}"
+        for _ in range(REMOTE_ADDRS_POOL_SIZE)
+    ]
+    remote_users = ["-"] * 3 + [f"{rng.getrandbits(52):013x}" for _ in range(7)]
+    request_times = [
+        f"{rng.lognormvariate(REQUEST_TIME_MU, REQUEST_TIME_SIGMA):.3f}"
+        for _ in range(REQUEST_TIMES_POOL_SIZE)
+    ]
+    return ValuePools(
+        urls,
+        get_zipf_cum_weights(URLS_POOL_SIZE, URLS_ZIPF_EXPONENT),
+        remote_addrs,
+        remote_users,
+        request_times,
+    )
+
+
+def iter_log_records_chunks(
+    date: datetime.datetime, records_cnt: int, seed: Any
+) -> Generator[List[str], None, None]:
+    """
+    Return chunks of log records of the day ordered by time. Values of every
+    chunk are drawn at once from the pools, so the same seed gives the same
+    records.
+    :param date: date of the log file
+    :param records_cnt: amount of log records
+    :param seed: seed of the random generator
+    :return: generator of lists of log records.
+    """
+    rng = random.Random(seed)
+    pools = get_value_pools(rng)
+    start_date = date.replace(hour=0, minute=0, second=0, microsecond=0)
+    start_timestamp = calendar.timegm(start_date.timetuple())
+    time_local = ""
+    time_second = -1
+    for chunk_start in range(0, records_cnt, GENERATOR_CHUNK_SIZE):
+        chunk_size = min(GENERATOR_CHUNK_SIZE, records_cnt - chunk_start)
+        draws = zip(
+            rng.choices(pools.remote_addrs, k=chunk_size),
+            rng.choices(pools.remote_users, k=chunk_size),
+            rng.choices(METHODS, k=chunk_size),
+            rng.choices(pools.urls, cum_weights=pools.urls_cum_weights, k=chunk_size),
+            rng.choices(STATUSES, STATUSES_WEIGHTS, k=chunk_size),
+            rng.choices(USER_AGENTS, k=chunk_size),
+            rng.choices(pools.request_times, k=chunk_size),
+        )
+        records = []
+        for i, (addr, user, method, url, status, agent, request_time) in enumerate(
+            draws, chunk_start
+        ):
+            second = i * SECONDS_IN_DAY // records_cnt
+            if second != time_second:
+                time_second = second
+                time_local = (start_date + datetime.timedelta(seconds=second)).strftime(
+                    "%d/%b/%Y:%H:%M:%S +0300"
+                )
+            records.append(
+                LOG_RECORD_TEMPLATE
+                % (
+                    addr,
+                    user,
+                    time_local,
+                    method,
+                    url,
+                    status,
+                    rng.getrandbits(14),
+                    agent,
+                    start_timestamp + second,
+                    rng.getrandbits(31),
+                    i,
+                    request_time,
+                )
+            )
+        yield records
+
+
+def write_log_file(
+    path: str,
+    ext: str,
+    date: datetime.datetime,
+    records_cnt: int,
+    seed: Any,
+    encoding: str = "UTF-8",
+) -> None:
+    """
+    Stream generated log records into the file, compressed files are written
+    through the compressor without temporary files.
+    :param path: path to the log file (with the extension)
+    :param ext: extension of the log file
+    :param date: date of the log file
+    :param records_cnt: amount of log records
+    :param seed: seed of the random generator
+    :param encoding: encoding of the log file
+    :return:
+    """
+    open_file = COMPRESS_OPENERS.get(ext, open)
+    with open_file(path, "wb") as f:
+        for records in iter_log_records_chunks(date, records_cnt, seed):
+            f.write("".join(records).encode(encoding))
@@ -6,65 +6,324 @@ Log analyzer app.
 #                     '$status $body_bytes_sent "$http_referer" '
 #                     '"$http_user_agent" "$http_x_forwarded_for" "$http_X_REQUEST_ID" "$http_X_RB_USER" '
 #                     '$request_time';
+#
+# The format is available as LOG_FORMAT_UI_SHORT, another one may be set
+# with the LOG_FORMAT config.
 
+import asyncio
 import gzip
+import heapq
 import json
+import multiprocessing
 import os
 import re
 import sys
+from array import array
 from collections import namedtuple
-from datetime import datetime
-from statistics import mean, median
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import partial
+from itertools import islice
 from string import Template
+from time import sleep
 from typing import (
     Any,
+    AnyStr,
+    Callable,
     Dict,
     Generator,
+    Iterable,
+    List,
+    Optional,
+    Pattern,
+    Sequence,
     Tuple,
     Union,
-    List,
-    Callable,
 )
 
 from config import get_config
+from utils.aggregate_cache import (
+    get_source_info,
+    load_aggregate_cache,
+    read_aggregate_cache,
+    save_aggregate_cache,
+)
+from utils.columns_cache import (
+    ColumnsRecorder,
+    ParsedColumns,
+    iter_columns,
+    load_columns_cache,
+    save_columns_cache,
+)
+from utils.group_by import (
+    CUBE_FIELDS_SEPARATOR,
+    CubesData,
+    aggregate_cubes,
+    decode_cube_key,
+    get_cube_name,
+    get_group_fields,
+    get_metric_quantile,
+    parse_group_by,
+    parse_metrics,
+)
+from utils.heavy_hitters import SpaceSaving
+from utils.latency_series import SERIES_TYPECODE, LatencySeries
+from utils.latency_summary import DEFAULT_RELATIVE_ACCURACY, LatencySummary
+from utils.log_catalog import LogCatalog
+from utils.log_codecs import (
+    CODECS,
+    get_codec,
+    get_codecs_ext_pattern,
+    get_stream_segments,
+    iter_decompressed_streams,
+)
+from utils.log_follower import LogFollower
+from utils.log_format import LOG_FORMAT_UI_SHORT, URL_FIELD, compile_log_format
+from utils.log_readers import (
+    BLOCKS_QUEUE_SIZE,
+    iter_block_lines,
+    iter_blocks_lines,
+    iter_gzip_blocks,
+    iter_mmap_lines,
+    iter_threaded_blocks,
+)
 from utils.logging_utils import get_logger_adapter
+from utils.metrics import (
+    METRICS_HISTORY_SIZE,
+    RunMetrics,
+    save_metrics_json,
+    save_prometheus_textfile,
+)
+from utils.numpy_backend import (
+    SeriesStats,
+    get_series_peaks,
+    get_series_stats,
+    group_bucketed_times_by_ids,
+    group_times_by_ids,
+    is_numpy_available,
+)
+from utils.profiling import PROFILE_FORMAT_PSTATS, StageProfiler
+from utils.report_data import write_report_data
+from utils.report_service import SERVICE_CACHE_SIZE, ReportService
+from utils.time_buckets import (
+    TIME_BUCKET_SECONDS,
+    BucketedSeries,
+    BucketedSummary,
+    format_time_bucket,
+    get_time_bucket,
+    get_time_bucket_size,
+)
+from utils.url_normalizer import (
+    DEFAULT_URL_RULES,
+    URL_NORMALIZE_CACHE_SIZE,
+    get_url_normalizer,
+)
 
 PARSE_ERROR_LIMIT = 0.2
+PARSE_ERROR_MIN_SAMPLE = 1000
+PARSE_ERROR_LOG_FIRST = 10
+PARSE_ERROR_LOG_EVERY = 1000
+AGGREGATION_MODE_EXACT = "exact"
+AGGREGATION_MODE_STREAMING = "streaming"
+AGGREGATION_BACKEND_AUTO = "auto"
+AGGREGATION_BACKEND_PYTHON = "python"
+AGGREGATION_BACKEND_NUMPY = "numpy"
+REPORT_OUTPUT_INLINE = "inline"
+REPORT_OUTPUT_SIDECAR = "sidecar"
+SERVE_HOST = "127.0.0.1"
+SERVE_PORT = 8080
 
 config: Dict[str, Union[int, float, str]] = {
     "REPORT_SIZE": 1000,
     "REPORT_DIR": "./reports",
+    "REPORT_OUTPUT": REPORT_OUTPUT_INLINE,
+    "REPORT_PERCENTILES": "",
+    "REPORT_DATA_GZIP": False,
     "LOG_DIR": "./log",
     "DATA_ENCODING": "UTF-8",
     "PARSE_ERROR_LIMIT": PARSE_ERROR_LIMIT,
+    "PARSE_ERROR_MIN_SAMPLE": PARSE_ERROR_MIN_SAMPLE,
+    "PARSE_ERROR_LOG_FIRST": PARSE_ERROR_LOG_FIRST,
+    "PARSE_ERROR_LOG_EVERY": PARSE_ERROR_LOG_EVERY,
+    "WORKERS": 1,
+    "AGGREGATION_MODE": AGGREGATION_MODE_EXACT,
+    "SUMMARY_RELATIVE_ACCURACY": DEFAULT_RELATIVE_ACCURACY,
+    "AGGREGATION_BACKEND": AGGREGATION_BACKEND_AUTO,
+    "LOG_FORMAT": LOG_FORMAT_UI_SHORT,
+    "BACKFILL": False,
+    "BACKFILL_GZIP_LIMIT": 2,
+    "LOG_CATALOG": "",
+    "AGGREGATE_CACHE": False,
+    "COLUMNS_CACHE": False,
+    "TIME_BUCKET": "",
+    "GROUP_BY": "",
+    "GROUP_BY_METRICS": "",
+    "ROLLUP_DAYS": 0,
+    "HEAVY_HITTERS": 0,
+    "GZIP_THREADED": True,
+    "GZIP_QUEUE_SIZE": BLOCKS_QUEUE_SIZE,
+    "URL_NORMALIZE": False,
+    "URL_NORMALIZE_STRIP_QUERY": True,
+    "URL_NORMALIZE_CACHE_SIZE": URL_NORMALIZE_CACHE_SIZE,
+    "FOLLOW": False,
+    "FOLLOW_LOG_PATH": "",
+    "FOLLOW_INTERVAL": 60,
+    "FOLLOW_ITERATIONS": 0,
+    "LOG_QUEUE": False,
+    "SERVE": False,
+    "SERVE_HOST": SERVE_HOST,
+    "SERVE_PORT": SERVE_PORT,
+    "SERVE_CACHE_SIZE": SERVICE_CACHE_SIZE,
+    "METRICS": False,
+    "METRICS_HISTORY_SIZE": METRICS_HISTORY_SIZE,
+    "METRICS_PROMETHEUS_PATH": "",
+    "PROFILE": "",
+    "PROFILE_FORMAT": PROFILE_FORMAT_PSTATS,
+    "PROFILE_DIR": "",
+    "PROFILE_LINES": 0,
+    "TRACE_MALLOC": 0,
 }
 
+LOG_LINE_FIELDS = ("url", "request_time")
+TIME_LOCAL_FIELD = "time_local"
+TIME_BUCKET_FIELD = "time_bucket"
+LOG_LINE_BUCKET_FIELDS = (*LOG_LINE_FIELDS, TIME_BUCKET_FIELD)
+GZIP_TRAILER_SIZE = 4
+PARSE_ERROR_MESSAGE_SIZE = 1000
+AGGREGATE_CACHE_EXT = ".cache.json.gz"
+FOLLOW_LOG_FILENAME = "nginx-access-ui.log"
+FOLLOW_CHECKPOINT_FILENAME = "follow-checkpoint.json.gz"
+METRICS_FILENAME = "metrics.json"
+COLUMNS_CACHE_EXT = ".columns"
+# key of requests of urls evicted from HEAVY_HITTERS, it isn't a valid url
+EVICTED_URLS_KEY = "<evicted urls>"
+
 LastLogData = namedtuple("LastLogData", "path, date, ext")
+LogShard = namedtuple("LogShard", "path, start, end, conf")
+ShardResult = namedtuple("ShardResult", "urls_data, parse_stats, cubes_data")
+LogSegment = namedtuple("LogSegment", "path, ext, start, end, conf")
+SegmentResult = namedtuple(
+    "SegmentResult", "urls_data, parse_stats, head, tail, cubes_data"
+)
 
 logger_adapter = get_logger_adapter(__name__, get_config(config))
 
+backfill_gzip_semaphore: Any = None
+run_metrics = RunMetrics()
+stage_profiler = StageProfiler()
 
-def search_log_file(conf) -> LastLogData:
+
+def parse_log_file_name(
+    name: str, fn_pattern: Pattern
+) -> Optional[Tuple[datetime, str]]:
+    """
+    Returns the date and the extension of the log file name.
+    :param name: name of the file
+    :param fn_pattern: compiled pattern of log file names
+    :return: tuple (date_in_filename, file_extension) or None if the name
+    doesn't match.
+    """
+    fn_match = fn_pattern.match(name)
+    if not fn_match:
+        return None
+    return datetime.strptime(fn_match.group("date"), "%Y%m%d"), fn_match.group("ext")
+
+
+def get_log_file_name_pattern() -> Pattern:
+    """
+    Returns compiled pattern of log file names with the date and
+    the extension of supported codecs.
+    :return: compiled pattern.
+    """
+    return re.compile(
+        rf"^[\w\-.]+(?P<date>\d{{8}})(?P<ext>{get_codecs_ext_pattern()})$"
+    )
+
+
+def get_log_catalog(conf: dict) -> Optional[LogCatalog]:
     """
-    Returns last log file by date in the name of log.
+    Returns the catalog of log files refreshed with the LOG_DIR
+    if the LOG_CATALOG config is set.
     :param conf: app configs
-    :return: named tuple (path_to_file, date_in_filename, file_extension)
+    :return: log catalog or None.
     """
-    logger_adapter.info("Searching last log file...")
+    catalog_path = conf.get("LOG_CATALOG")
+    if not catalog_path:
+        return None
     log_dir = str(conf.get("LOG_DIR"))
-
     if not os.path.isdir(log_dir):
         raise NotADirectoryError
+    catalog = LogCatalog(str(catalog_path))
+    if catalog.refresh(
+        log_dir, partial(parse_log_file_name, fn_pattern=get_log_file_name_pattern())
+    ):
+        logger_adapter.info(f"Log catalog has been refreshed with {log_dir!r}")
+    return catalog
 
-    log_file_info = None
 
+def iter_log_files(
+    log_dir: str, catalog: Optional[LogCatalog] = None
+) -> Generator[LastLogData, None, None]:
+    """
+    Returns all log files with the date in the name from the log dir.
+    :param log_dir: path to the dir with logs
+    :param catalog: refreshed log catalog, which is used instead of listing
+    of the dir
+    :return: generator of named tuples (path_to_file, date_in_filename, file_extension)
+    """
+    if catalog is not None:
+        for path, log_date, ext in catalog.get_log_files(log_dir):
+            yield LastLogData(path, log_date, ext)
+        return
+
+    if not os.path.isdir(log_dir):
+        raise NotADirectoryError
+
+    fn_pattern = get_log_file_name_pattern()
     for file in os.listdir(log_dir):
-        fn_match = re.match(r"^[\w\-.]+(?P<date>\d{8})(?P<ext>.gz|)$", file)
-        if fn_match:
-            log_date = datetime.strptime(fn_match.group("date"), "%Y%m%d")
-            ext = fn_match.group("ext")
+        log_file_name = parse_log_file_name(file, fn_pattern)
+        if log_file_name:
+            log_date, ext = log_file_name
+            yield LastLogData(os.path.join(log_dir, file), log_date, ext)
+
+
+def iter_conf_log_files(conf: dict) -> Generator[LastLogData, None, None]:
+    """
+    Returns all log files from the LOG_DIR, the LOG_CATALOG is used if it is set.
+    :param conf: app configs
+    :return: generator of named tuples (path_to_file, date_in_filename, file_extension)
+    """
+    log_dir = str(conf.get("LOG_DIR"))
+    catalog = get_log_catalog(conf)
+    if catalog is None:
+        yield from iter_log_files(log_dir)
+        return
+    with catalog:
+        log_files_info = list(iter_log_files(log_dir, catalog))
+    yield from log_files_info
+
+
+def search_log_file(conf) -> LastLogData:
+    """
+    Returns last log file by date in the name of log, with the LOG_CATALOG
+    the last one, which isn't processed yet.
+    :param conf: app configs
+    :return: named tuple (path_to_file, date_in_filename, file_extension)
+    """
+    logger_adapter.info("Searching last log file...")
+    log_dir = str(conf.get("LOG_DIR"))
+
+    log_file_info = None
 
-            current_file_info = LastLogData(os.path.join(log_dir, file), log_date, ext)
+    catalog = get_log_catalog(conf)
+    if catalog is not None:
+        with catalog:
+            last_log_file = catalog.get_last_log_file(log_dir)
+        if last_log_file is not None:
+            log_file_info = LastLogData(*last_log_file)
+    else:
+        for current_file_info in iter_log_files(log_dir):
             if log_file_info is None or log_file_info.date < current_file_info.date:
                 log_file_info = current_file_info
 
@@ -83,6 +342,38 @@ def search_log_file(conf) -> LastLogData:
     return log_file_info
 
 
+def get_log_data_size(log_file_info: LastLogData) -> int:
+    """
+    Returns size of the uncompressed log data. The size of gzip file
+    is taken from its trailer (modulo 2^32, as gzip stores it).
+    :param log_file_info: named tuple (path_to_file, date_in_filename, file_extension)
+    :return: size in bytes.
+    """
+    size = os.path.getsize(log_file_info.path)
+    if log_file_info.ext == ".gz" and size >= GZIP_TRAILER_SIZE:
+        with open(log_file_info.path, "rb") as fb:
+            fb.seek(-GZIP_TRAILER_SIZE, os.SEEK_END)
+            size = max(size, int.from_bytes(fb.read(GZIP_TRAILER_SIZE), "little"))
+    return size
+
+
+def search_unreported_log_files(conf: dict) -> List[LastLogData]:
+    """
+    Returns all log files without reports, the largest ones go first.
+    :param conf: app configs
+    :return: list of named tuples (path_to_file, date_in_filename, file_extension)
+    """
+    logger_adapter.info("Searching log files without reports...")
+    log_files_info = [
+        log_file_info
+        for log_file_info in iter_conf_log_files(conf)
+        if not os.path.isfile(get_report_path(log_file_info.date, conf))
+    ]
+    log_files_info.sort(key=get_log_data_size, reverse=True)
+    logger_adapter.info(f"{len(log_files_info)} log files without reports found.")
+    return log_files_info
+
+
 def get_log_data(log_file_info: LastLogData, conf: dict) -> Generator[str, None, None]:
     """
     Returns records of the log file.
@@ -91,62 +382,213 @@ def get_log_data(log_file_info: LastLogData, conf: dict) -> Generator[str, None,
     :return: generator for strings of log file records
     """
     logger_adapter.info(f"Loading the log file {log_file_info.path!r}...")
-    gzip_open: Callable[[str, str], Any] = gzip.open
+    codec = get_codec(log_file_info.ext)
     file_open: Callable[[str, str], Any] = open
-    open_fn: Callable[[str, str], Any] = (
-        gzip_open if log_file_info.ext == ".gz" else file_open
-    )
+    open_fn: Callable[[str, str], Any] = codec.open_file if codec else file_open
     with open_fn(log_file_info.path, "rb") as fb:
         for line in fb:
-            yield line.decode(encoding=conf["DATA_ENCODING"])
+            yield line.decode(encoding=conf["DATA_ENCODING"], errors="replace")
     logger_adapter.info(
         f"The file {log_file_info.path!r} has been successfully loaded!"
     )
 
 
-def parse_log_data(
-    log_file_data: Generator[str, None, None], filepath: str, conf: dict
-) -> Generator[Tuple[str, float], None, None]:
+def get_log_data_bytes(
+    log_file_info: LastLogData, conf: dict
+) -> Generator[bytes, None, None]:
     """
-    Return parsed log file data.
-    :param log_file_data: log file data by lines generator
-    :param filepath: path to log file
+    Returns undecoded records of the log file. Uncompressed files are mapped
+    into memory, compressed files are read by large blocks. If the GZIP_THREADED
+    config is set, gzip files are decompressed on the background thread.
+    :param log_file_info: named tuple (path_to_file, date_in_filename, file_extension)
+    :param conf: app config
+    :return: generator for bytes of log file records
+    """
+    logger_adapter.info(f"Loading the log file {log_file_info.path!r}...")
+    if log_file_info.ext == ".gz" and conf.get("GZIP_THREADED"):
+        wait_stats: Dict[str, float] = {}
+        with open(log_file_info.path, "rb") as fb:
+            blocks = iter_threaded_blocks(
+                iter_gzip_blocks(fb),
+                int(conf.get("GZIP_QUEUE_SIZE") or BLOCKS_QUEUE_SIZE),
+                wait_stats,
+            )
+            yield from iter_blocks_lines(blocks)
+        logger_adapter.info(
+            f"Decompression has waited for parsing "
+            f"{wait_stats['producer_wait']:.3f}s, parsing has waited "
+            f"for decompression {wait_stats['consumer_wait']:.3f}s."
+        )
+    elif log_file_info.ext:
+        with CODECS[log_file_info.ext].open_file(log_file_info.path, "rb") as fb:
+            yield from iter_block_lines(fb)
+    else:
+        yield from iter_mmap_lines(log_file_info.path)
+    logger_adapter.info(
+        f"The file {log_file_info.path!r} has been successfully loaded!"
+    )
+
+
+def get_log_line_pattern(conf: dict, binary: bool = False) -> Pattern:
+    """
+    Return the parser of log lines compiled from the LOG_FORMAT config.
+    The time_bucket group (the prefix of time_local, which is the key
+    of the time bucket) is captured if the TIME_BUCKET config is set,
+    fields of cubes are captured if the GROUP_BY config is set.
     :param conf: app configs
-    :return: generator with url string and request time float number.
+    :param binary: return the parser of bytes lines
+    :return: compiled regex pattern with url and request_time groups.
     """
-    logger_adapter.info(f"Start parsing log file ({filepath!r}) data...")
-    errors_limit = conf.get("PARSE_ERROR_LIMIT") or PARSE_ERROR_LIMIT
-    total_lines_cnt = 0
-    errors_cnt = 0
+    log_format = str(conf.get("LOG_FORMAT") or LOG_FORMAT_UI_SHORT)
+    fields: Tuple[str, ...] = LOG_LINE_FIELDS
+    prefix_groups: Tuple[Tuple[str, str, int], ...] = ()
+    time_bucket = conf.get("TIME_BUCKET")
+    if time_bucket:
+        time_bucket_size = get_time_bucket_size(str(time_bucket))
+        prefix_groups = ((TIME_LOCAL_FIELD, TIME_BUCKET_FIELD, time_bucket_size),)
+    group_fields = get_group_fields(parse_group_by(conf.get("GROUP_BY")))
+    fields += tuple(field for field in group_fields if field not in fields)
+    return compile_log_format(log_format, fields, binary, prefix_groups)
 
-    for line in log_file_data:
-        total_lines_cnt += 1
-        line = line.replace('"', "")
+
+class LogLineError(ValueError):
+    """
+    Error of the log line parsing with the kind of the error.
+    """
+
+    def __init__(self, kind: str, message: str):
+        """
+        Init the error.
+        :param kind: kind of the error for the errors summary
+        :param message: error message
+        """
+        super().__init__(message)
+        self.kind = kind
+
+
+def parse_log_line(
+    line: AnyStr,
+    line_pattern: Pattern,
+    encoding: str,
+    time_bucket_size: int = 0,
+    group_fields: Tuple[str, ...] = (),
+) -> Tuple[Any, ...]:
+    """
+    Return url and request time parsed from the log line.
+    Only the url of bytes line is decoded, group values are decoded
+    in report tables of cubes.
+    :param line: log file record
+    :param line_pattern: compiled log format of the same type as the line
+    :param encoding: encoding of bytes line
+    :param time_bucket_size: size of the time_local prefix, which is the key
+    of the time bucket captured by the time_bucket group (0 - no time bucket)
+    :param group_fields: fields of cubes, which values are returned
+    :return: tuple with url string and request time float number
+    (and the time bucket key, if the time_bucket_size is passed,
+    and the tuple of group values, if the group_fields are passed).
+    """
+    srch_result = line_pattern.match(line)
+    if srch_result:
+        if time_bucket_size:
+            url, time, time_bucket = srch_result.group(*LOG_LINE_BUCKET_FIELDS)
+        else:
+            url, time = srch_result.group(*LOG_LINE_FIELDS)
+        if isinstance(url, bytes):
+            url = url.decode(encoding, errors="replace")
         try:
-            srch_result = re.search(
-                r"^.* (?P<url>/.*) HTTP/1.\d \d{3}.* (?P<time>\d+.\d+)$", line
+            time = float(time)
+        except ValueError:
+            raise LogLineError(
+                "bad_request_time", f"Can't parse request time {time!r}"
+            ) from None
+        if group_fields:
+            group_values = (
+                srch_result.group(*group_fields)
+                if len(group_fields) > 1
+                else (srch_result.group(group_fields[0]),)
             )
-            if srch_result:
-                url = str(srch_result.group("url"))
-                time = float(srch_result.group("time"))
-            else:
-                raise ValueError(f"Can't parse url and time from log string:\n{line}")
-        except Exception as e:
-            logger_adapter.error(
-                f"The error occurred while parsing file {filepath!r}: {e}"
-            )
-            errors_cnt += 1
-            continue
+            if time_bucket_size:
+                return url, time, time_bucket, group_values
+            return url, time, group_values
+        if time_bucket_size:
+            return url, time, time_bucket
+        return url, time
+    if isinstance(line, bytes):
+        line_text = line.decode(encoding, errors="replace")
+    else:
+        line_text = line
+    raise LogLineError(
+        "no_match", f"Can't parse url and time from log string:\n{line_text}"
+    )
+
+
+def get_lines_cnt_estimate(parse_stats: dict, data_size: int) -> float:
+    """
+    Return the estimated total amount of lines of the data: lines so far
+    and the rest of the data divided by the mean length of lines so far.
+    :param parse_stats: dict with total_lines_cnt and bytes_cnt counters
+    :param data_size: size of the data in bytes
+    :return: amount of lines.
+    """
+    total_lines_cnt = parse_stats["total_lines_cnt"]
+    bytes_left = max(data_size - parse_stats["bytes_cnt"], 0)
+    return total_lines_cnt + bytes_left * total_lines_cnt / parse_stats["bytes_cnt"]
+
+
+def get_errors_limit(conf: dict) -> float:
+    """
+    Return max share of lines with parse errors.
+    :param conf: app configs
+    :return: share of lines.
+    """
+    return float(conf.get("PARSE_ERROR_LIMIT") or PARSE_ERROR_LIMIT)
+
 
-        yield url, time
+def merge_parse_stats(parse_stats: dict, other_parse_stats: dict) -> dict:
+    """
+    Merge the other counters of lines and errors into the parse_stats.
+    :param parse_stats: dict with counters
+    :param other_parse_stats: dict with counters to merge
+    :return: merged dict with counters.
+    """
+    for key in ("total_lines_cnt", "errors_cnt", "bytes_cnt"):
+        parse_stats[key] = parse_stats.get(key, 0) + other_parse_stats.get(key, 0)
+    errors_by_kind = parse_stats.setdefault("errors_by_kind", {})
+    for kind, cnt in other_parse_stats.get("errors_by_kind", {}).items():
+        errors_by_kind[kind] = errors_by_kind.get(kind, 0) + cnt
+    return parse_stats
 
-    errors_limit = total_lines_cnt * errors_limit
+
+def check_parse_errors(parse_stats: dict, filepath: str, conf: dict) -> None:
+    """
+    Raise RuntimeError if the parse errors amount exceeds PARSE_ERROR_LIMIT.
+    Counters are added to the metrics of the run.
+    :param parse_stats: dict with total_lines_cnt, errors_cnt, bytes_cnt
+    and errors_by_kind counters
+    :param filepath: path to log file
+    :param conf: app configs
+    :return:
+    """
+    errors_cnt = parse_stats.get("errors_cnt", 0)
+    total_lines_cnt = parse_stats.get("total_lines_cnt", 0)
+    run_metrics.add("lines_read", total_lines_cnt)
+    run_metrics.add("lines_parsed", total_lines_cnt - errors_cnt)
+    run_metrics.add("parse_errors", errors_cnt)
+    run_metrics.add("bytes_read_uncompressed", parse_stats.get("bytes_cnt", 0))
+    if errors_cnt:
+        logger_adapter.info(
+            f"Parse errors of the file {filepath!r} by kind: "
+            f"{parse_stats.get('errors_by_kind')!r}"
+        )
+    errors_limit = total_lines_cnt * get_errors_limit(conf)
     if errors_cnt > errors_limit:
         raise RuntimeError(
             f"Too much errors has occurred while parsing file {filepath!r}"
         )
     else:
-        errors_perc = round(errors_cnt / total_lines_cnt * 100, 2)
+        errors_perc = (
+            round(errors_cnt / total_lines_cnt * 100, 2) if total_lines_cnt else 0
+        )
         errors_percentage_text = (
             f" There were ~{errors_perc}% of errors." if errors_perc else ""
         )
@@ -155,121 +597,1573 @@ def parse_log_data(
         )
 
 
-def prepare_report_data(parsed_data: Generator) -> List[dict]:
+def log_parse_error(
+    error: Exception, errors_cnt: int, filepath: str, conf: dict
+) -> None:
     """
-    Return data prepared for the report with passed log file data.
-    :param parsed_data: parsed log file data generator (url, request_time)
-    :return: list of a report lines.
+    Log the parse error, if it is sampled: the first PARSE_ERROR_LOG_FIRST
+    errors and then every PARSE_ERROR_LOG_EVERY error are logged.
+    :param error: parse error
+    :param errors_cnt: number of the error in the file
+    :param filepath: path to log file
+    :param conf: app configs
+    :return:
     """
-    logger_adapter.info(f"Start preparing report data...")
+    log_first = int(conf.get("PARSE_ERROR_LOG_FIRST", PARSE_ERROR_LOG_FIRST))
+    log_every = int(conf.get("PARSE_ERROR_LOG_EVERY", PARSE_ERROR_LOG_EVERY))
+    if errors_cnt <= log_first or (log_every and errors_cnt % log_every == 0):
+        logger_adapter.error(
+            f"The error #{errors_cnt} occurred while parsing file {filepath!r}: "
+            f"{str(error)[:PARSE_ERROR_MESSAGE_SIZE]}"
+        )
+
+
+def parse_log_lines(
+    log_file_data: Iterable[AnyStr],
+    filepath: str,
+    conf: dict,
+    parse_stats: dict,
+    fail_fast: bool = True,
+    data_size: int = 0,
+) -> Generator[Tuple[str, float], None, None]:
+    """
+    Return parsed lines of the log, counters of lines and errors
+    are accumulated in the parse_stats. With fail_fast and the known size
+    of the data the parsing is aborted with RuntimeError after at least
+    PARSE_ERROR_MIN_SAMPLE lines, as soon as the PARSE_ERROR_LIMIT can't be
+    met anymore: errors exceed the limit of the total amount of lines, which
+    is estimated from the data size and the mean length of lines so far.
+    So a file with a bad prefix and the valid share of errors isn't aborted.
+    :param log_file_data: log file data by lines generator (str or bytes lines)
+    :param filepath: path to log file
+    :param conf: app configs
+    :param parse_stats: dict with total_lines_cnt, errors_cnt, bytes_cnt
+    and errors_by_kind counters
+    :param fail_fast: check the share of errors while parsing
+    :param data_size: size of the (uncompressed) data in bytes,
+    0 - unknown, errors are checked after parsing only
+    :return: generator with url string and request time float number
+    (and the time bucket key, if the TIME_BUCKET config is set,
+    and the tuple of group values, if the GROUP_BY config is set).
+    """
+    encoding = conf["DATA_ENCODING"]
+    time_bucket = conf.get("TIME_BUCKET")
+    time_bucket_size = get_time_bucket_size(str(time_bucket)) if time_bucket else 0
+    group_fields = get_group_fields(parse_group_by(conf.get("GROUP_BY")))
+    line_patterns = {
+        str: get_log_line_pattern(conf),
+        bytes: get_log_line_pattern(conf, binary=True),
+    }
+    errors_limit = get_errors_limit(conf)
+    min_sample = int(conf.get("PARSE_ERROR_MIN_SAMPLE", PARSE_ERROR_MIN_SAMPLE))
+    parse_stats.setdefault("total_lines_cnt", 0)
+    parse_stats.setdefault("errors_cnt", 0)
+    parse_stats.setdefault("bytes_cnt", 0)
+    errors_by_kind = parse_stats.setdefault("errors_by_kind", {})
+
+    for line in log_file_data:
+        parse_stats["total_lines_cnt"] += 1
+        parse_stats["bytes_cnt"] += len(line)
+        try:
+            parsed_line = parse_log_line(
+                line,
+                line_patterns[type(line)],
+                encoding,
+                time_bucket_size,
+                group_fields,
+            )
+        except Exception as e:
+            parse_stats["errors_cnt"] += 1
+            kind = getattr(e, "kind", type(e).__name__)
+            errors_by_kind[kind] = errors_by_kind.get(kind, 0) + 1
+            log_parse_error(e, parse_stats["errors_cnt"], filepath, conf)
+            total_lines_cnt = parse_stats["total_lines_cnt"]
+            if (
+                fail_fast
+                and data_size
+                and total_lines_cnt >= min_sample
+                and parse_stats["errors_cnt"]
+                > get_lines_cnt_estimate(parse_stats, data_size) * errors_limit
+            ):
+                raise RuntimeError(
+                    f"Too much errors has occurred while parsing file {filepath!r}: "
+                    f"{parse_stats['errors_cnt']} of {total_lines_cnt} lines, "
+                    f"errors by kind: {errors_by_kind!r}"
+                )
+            continue
+
+        yield parsed_line  # type: ignore[misc]
+
+
+def parse_log_data(
+    log_file_data: Iterable[AnyStr], filepath: str, conf: dict, data_size: int = 0
+) -> Generator[Tuple[str, float], None, None]:
+    """
+    Return parsed log file data.
+    :param log_file_data: log file data by lines generator (str or bytes lines)
+    :param filepath: path to log file
+    :param conf: app configs
+    :param data_size: size of the uncompressed data for the early check
+    of parse errors, 0 - unknown
+    :return: generator with url string and request time float number.
+    """
+    logger_adapter.info(f"Start parsing log file ({filepath!r}) data...")
+    parse_stats: Dict[str, Any] = {}
+    yield from parse_log_lines(
+        log_file_data, filepath, conf, parse_stats, data_size=data_size
+    )
+    check_parse_errors(parse_stats, filepath, conf)
+
+
+def get_log_shards(path: str, shards_cnt: int) -> List[Tuple[int, int]]:
+    """
+    Split the uncompressed log file into line-aligned byte ranges.
+    :param path: path to log file
+    :param shards_cnt: desired amount of shards
+    :return: list of (start, end) byte offsets.
+    """
+    size = os.path.getsize(path)
+    step = size // max(shards_cnt, 1)
+    bounds = [0]
+    with open(path, "rb") as fb:
+        for shard_num in range(1, shards_cnt):
+            fb.seek(max(shard_num * step, bounds[-1]))
+            fb.readline()
+            pos = fb.tell()
+            if pos >= size:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def parse_log_shard(shard: LogShard) -> ShardResult:
+    """
+    Parse the byte range of the log file and aggregate it by urls.
+    Runs in the worker process. The errors limit isn't checked by shards,
+    it is applied to the merged counters of the file.
+    :param shard: named tuple (path_to_file, start_offset, end_offset, app_configs)
+    :return: named tuple (urls_data, parse_stats, cubes_data)
+    """
+    parse_stats: Dict[str, Any] = {}
+    parsed_data = parse_log_lines(
+        iter_mmap_lines(shard.path, shard.start, shard.end),
+        shard.path,
+        shard.conf,
+        parse_stats,
+        fail_fast=False,
+    )
+    cubes_data: CubesData = {}
+    urls_data_dict = aggregate_parsed_data(parsed_data, shard.conf, cubes_data)
+    return ShardResult(urls_data_dict, parse_stats, cubes_data)
+
+
+def get_workers_cnt(conf: dict) -> int:
+    """
+    Return amount of worker processes from the WORKERS config.
+    Zero or negative value means the number of CPUs.
+    :param conf: app configs
+    :return: amount of workers.
+    """
+    workers = int(conf.get("WORKERS") or 1)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def parse_log_data_parallel(
+    log_file_info: LastLogData,
+    conf: dict,
+    workers: int,
+    cubes_data: Optional[CubesData] = None,
+) -> Dict[str, Any]:
+    """
+    Parse the uncompressed log file with the pool of processes.
+    Each worker aggregates its own shard, the partials are merged then.
+    :param log_file_info: named tuple (path_to_file, date_in_filename, file_extension)
+    :param conf: app configs
+    :param workers: amount of worker processes
+    :param cubes_data: dict, which aggregated data of GROUP_BY cubes
+    is merged into
+    :return: dict with aggregated data by urls.
+    """
+    filepath = log_file_info.path
+    logger_adapter.info(
+        f"Start parsing log file ({filepath!r}) data with {workers} workers..."
+    )
+    shards = [
+        LogShard(filepath, start, end, conf)
+        for start, end in get_log_shards(filepath, workers)
+    ]
     urls_data_dict: Dict[str, Any] = {}
-    total_time_sum = total_measurments = 0
-    for url, time in parsed_data:
-        url_measurments = urls_data_dict.get(url)
-        if url_measurments:
-            url_measurments["series"].append(time)
-            url_measurments["time_sum"] += time
-        else:
-            urls_data_dict[url] = {
-                "series": [time],
-                "time_sum": time,
-            }
-        total_time_sum += time
-        total_measurments += 1
-
-    urls_data = [
-        {
-            "url": data[0],
-            "series": data[1]["series"],
-            "time_sum": data[1]["time_sum"],
-        }
-        for data in urls_data_dict.items()
+    parse_stats: Dict[str, Any] = {}
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as executor:
+        for shard_result in executor.map(parse_log_shard, shards):
+            merge_urls_data(urls_data_dict, shard_result.urls_data)
+            merge_parse_stats(parse_stats, shard_result.parse_stats)
+            if cubes_data is not None:
+                merge_cubes_data(cubes_data, shard_result.cubes_data)
+
+    check_parse_errors(parse_stats, filepath, conf)
+    return urls_data_dict
+
+
+def parse_log_segment(segment: LogSegment) -> SegmentResult:
+    """
+    Decompress the range of independent streams of the compressed log file,
+    parse and aggregate its lines by urls. Runs in the worker process,
+    the errors limit is applied to the merged counters of the file.
+    The range isn't line-aligned, so the first line and the last line
+    without line break are returned unparsed to be joined with the lines
+    of the neighbour ranges.
+    :param segment: named tuple (path_to_file, file_extension, start_offset,
+    end_offset, app_configs)
+    :return: named tuple (urls_data, parse_stats, head, tail, cubes_data),
+    tail is None if there are no line breaks in the range.
+    """
+    with open(segment.path, "rb") as fb:
+        fb.seek(segment.start)
+        data = fb.read(segment.end - segment.start)
+    blocks = iter_decompressed_streams(data, CODECS[segment.ext].get_decompressor)
+    lines = iter_blocks_lines(blocks)
+    head = next(lines, b"")
+    if not head.endswith(b"\n"):
+        return SegmentResult({}, {}, head, None, {})
+
+    tail = b""
+
+    def iter_complete_lines() -> Generator[bytes, None, None]:
+        """
+        Return complete lines of the range, the last partial line is kept.
+        :return: generator of lines.
+        """
+        nonlocal tail
+        for line in lines:
+            if line.endswith(b"\n"):
+                yield line
+            else:
+                tail = line
+
+    parse_stats: Dict[str, Any] = {}
+    parsed_data = parse_log_lines(
+        iter_complete_lines(), segment.path, segment.conf, parse_stats, fail_fast=False
+    )
+    cubes_data: CubesData = {}
+    urls_data_dict = aggregate_parsed_data(parsed_data, segment.conf, cubes_data)
+    return SegmentResult(urls_data_dict, parse_stats, head, tail, cubes_data)
+
+
+def parse_compressed_log_parallel(
+    log_file_info: LastLogData,
+    conf: dict,
+    workers: int,
+    cubes_data: Optional[CubesData] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Parse the compressed log file, that consists of independent streams
+    (multi-stream bz2 and xz, zstd frames), with the pool of processes.
+    Ranges of streams are decompressed and aggregated by workers, lines
+    split between ranges are joined and parsed here.
+    :param log_file_info: named tuple (path_to_file, date_in_filename, file_extension)
+    :param conf: app configs
+    :param workers: amount of worker processes
+    :param cubes_data: dict, which aggregated data of GROUP_BY cubes
+    is merged into
+    :return: dict with aggregated data by urls or None if the file can't be
+    split into streams, so it should be parsed sequentially.
+    """
+    filepath = log_file_info.path
+    codec = get_codec(log_file_info.ext)
+    if codec is None or codec.stream_magic is None:
+        return None
+    segments = [
+        LogSegment(filepath, log_file_info.ext, start, end, conf)
+        for start, end in get_stream_segments(filepath, codec, workers)
     ]
-    urls_data = sorted(urls_data, key=lambda el: el["time_sum"], reverse=True)
-    report_size = int(config["REPORT_SIZE"])
-    if report_size:
-        urls_data = urls_data[:report_size]
+    if len(segments) < 2:
+        return None
 
-    report_data = []
-    for url_data in urls_data:
-        url, series, time_sum = url_data.values()
-        report_data.append(
-            {
-                "url": url,
-                "count": len(series),
-                "count_perc": round(len(series) / total_measurments * 100, 3),
-                "time_sum": round(time_sum, 3),
-                "time_perc": round(time_sum / total_time_sum * 100, 3),
-                "time_avg": round(mean(series), 3),
-                "time_max": round(max(series), 3),
-                "time_med": round(median(series), 3),
-            }
+    logger_adapter.info(
+        f"Start parsing log file ({filepath!r}) data with {workers} workers "
+        f"by {len(segments)} ranges of compressed streams..."
+    )
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(segments))) as executor:
+            segment_results = list(executor.map(parse_log_segment, segments))
+    except Exception as e:
+        logger_adapter.info(
+            f"Warning: streams of {filepath!r} can't be decompressed separately, "
+            f"the file will be parsed sequentially: {e}"
         )
-    logger_adapter.info(f"Report data has been prepared successfully.")
-    return report_data
+        return None
 
+    urls_data_dict: Dict[str, Any] = {}
+    parse_stats: Dict[str, Any] = {}
+    joined_lines = []
+    line_start = b""
+    for segment_result in segment_results:
+        merge_urls_data(urls_data_dict, segment_result.urls_data)
+        merge_parse_stats(parse_stats, segment_result.parse_stats)
+        if cubes_data is not None:
+            merge_cubes_data(cubes_data, segment_result.cubes_data)
+        line_start += segment_result.head
+        if segment_result.tail is not None:
+            joined_lines.append(line_start)
+            line_start = segment_result.tail
+    if line_start:
+        joined_lines.append(line_start)
 
-def get_report_path(report_date: datetime, conf: dict) -> str:
+    parsed_data = parse_log_lines(
+        joined_lines, filepath, conf, parse_stats, fail_fast=False
+    )
+    merge_urls_data(
+        urls_data_dict, aggregate_parsed_data(parsed_data, conf, cubes_data)
+    )
+
+    check_parse_errors(parse_stats, filepath, conf)
+    return urls_data_dict
+
+
+def get_summary_accuracy(conf: dict) -> Optional[float]:
     """
-    Return report path based on the report date and the REPORT_DIR config.
-    :param report_date: date of current report
+    Return relative accuracy of the streaming summaries
+    if the AGGREGATION_MODE config is streaming.
     :param conf: app configs
-    :return: path to report file.
+    :return: relative accuracy or None for the exact aggregation.
     """
-    report_fn = f"report-{datetime.strftime(report_date, '%Y.%m.%d')}.html"
-    return os.path.join(conf["REPORT_DIR"], report_fn)
+    mode = conf.get("AGGREGATION_MODE") or AGGREGATION_MODE_EXACT
+    if mode == AGGREGATION_MODE_EXACT:
+        return None
+    if mode == AGGREGATION_MODE_STREAMING:
+        return float(conf.get("SUMMARY_RELATIVE_ACCURACY") or DEFAULT_RELATIVE_ACCURACY)
+    raise ValueError(f"Unknown aggregation mode: {mode!r}")
 
 
-def create_report_file(
-    report_data: List[dict], report_date: datetime, conf: dict
-) -> None:
+def use_numpy_backend(conf: dict) -> bool:
     """
-    Create report file with passed report data
-    :param report_data: list of dicts with the data of report lines
-    :param report_date: date of the report
+    Check if the exact aggregation should use the NumPy backend.
+    The auto AGGREGATION_BACKEND config chooses it if NumPy is installed.
     :param conf: app configs
+    :return: bool.
+    """
+    backend = conf.get("AGGREGATION_BACKEND") or AGGREGATION_BACKEND_AUTO
+    if backend == AGGREGATION_BACKEND_AUTO:
+        return is_numpy_available()
+    if backend == AGGREGATION_BACKEND_PYTHON:
+        return False
+    if backend == AGGREGATION_BACKEND_NUMPY:
+        if not is_numpy_available():
+            raise ValueError("NumPy aggregation backend requires numpy")
+        return True
+    raise ValueError(f"Unknown aggregation backend: {backend!r}")
+
+
+def add_url_measurement(
+    urls_data_dict: Dict[str, Any],
+    url: str,
+    time: float,
+    relative_accuracy: Optional[float] = None,
+) -> None:
+    """
+    Add the request time of the url to the aggregated data.
+    :param urls_data_dict: dict with aggregated data by urls
+    :param url: url string
+    :param time: request time
+    :param relative_accuracy: accuracy of the streaming summary,
+    None for the exact aggregation with series of request times
     :return:
     """
-    logger_adapter.info("Start report file creating...")
-    report_path = get_report_path(report_date, conf)
-    with open(
-        "templates/report.html", "r", encoding=conf["DATA_ENCODING"]
-    ) as report_template:
-        with open(report_path, "w", encoding=conf["DATA_ENCODING"]) as report:
-            report_str_template = Template(report_template.read())
-            report_str = report_str_template.safe_substitute(
-                table_json=json.dumps(report_data)
-            )
-            report.write(report_str)
-    logger_adapter.info(f"Finish report file {str(report_path)!r} creating...")
+    url_measurments = urls_data_dict.get(url)
+    if url_measurments is None:
+        if relative_accuracy is None:
+            url_measurments = urls_data_dict[url] = LatencySeries()
+        else:
+            url_measurments = urls_data_dict[url] = LatencySummary(relative_accuracy)
+    url_measurments.add(time)
 
 
-def main(init_config) -> None:
+def evict_url_measurments(urls_data_dict: Dict[str, Any], url: str, conf: dict) -> None:
     """
-    Main method of the Log Analyzer.
-    :param init_config: app configs
+    Move the aggregated data of the url evicted from heavy hitters into
+    the summary of evicted urls (EVICTED_URLS_KEY), so requests of the url
+    are still counted in totals of the report. The summary is merged
+    with partials of other shards and cached as the other urls.
+    :param urls_data_dict: dict with aggregated data by urls
+    :param url: evicted url
+    :param conf: app configs
     :return:
     """
-    try:
+    url_measurments = urls_data_dict.pop(url)
+    evicted_summary = urls_data_dict.get(EVICTED_URLS_KEY)
+    if evicted_summary is None:
+        evicted_summary = urls_data_dict[EVICTED_URLS_KEY] = LatencySummary(
+            float(conf.get("SUMMARY_RELATIVE_ACCURACY") or DEFAULT_RELATIVE_ACCURACY)
+        )
+    if isinstance(url_measurments, LatencySummary):
+        evicted_summary.merge(url_measurments)
+    else:
+        for time in url_measurments.times:
+            evicted_summary.add(time)
 
-        conf = get_config(init_config)
 
-        logger_adapter.info("Log analyzer has been started...")
-        log_file_info = search_log_file(conf)
-        log_file_data = get_log_data(log_file_info, conf)
-        parsed_data = parse_log_data(log_file_data, log_file_info.path, conf)
-        report_data = prepare_report_data(parsed_data)
-        create_report_file(report_data, log_file_info.date, conf)
+def merge_urls_data(
+    urls_data_dict: Dict[str, Any], other_urls_data: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Merge the other aggregated data into the urls_data_dict.
+    :param urls_data_dict: dict with aggregated data by urls
+    :param other_urls_data: partial aggregated data to merge
+    :return: merged dict with aggregated data by urls.
+    """
+    for url, other_measurments in other_urls_data.items():
+        url_measurments = urls_data_dict.get(url)
+        if url_measurments is not None:
+            url_measurments.merge(other_measurments)
+        else:
+            urls_data_dict[url] = other_measurments
+    return urls_data_dict
+
+
+def merge_cubes_data(cubes_data: CubesData, other_cubes_data: CubesData) -> CubesData:
+    """
+    Merge the other aggregated data of cubes into the cubes_data.
+    :param cubes_data: dict with aggregated data by keys by cube names
+    :param other_cubes_data: partial aggregated data of cubes to merge
+    :return: merged dict with aggregated data of cubes.
+    """
+    for cube_name, other_cube_data in other_cubes_data.items():
+        merge_urls_data(cubes_data.setdefault(cube_name, {}), other_cube_data)
+    return cubes_data
+
+
+def get_url_normalization(conf: dict) -> Optional[Callable[[str], str]]:
+    """
+    Return the url normalization function if the URL_NORMALIZE config is set.
+    Default rules (numeric ids, uuids, hex tokens) are followed by the
+    URL_NORMALIZE_RULES config pairs of regex pattern and replacement.
+    :param conf: app configs
+    :return: url normalization function or None.
+    """
+    if not conf.get("URL_NORMALIZE"):
+        return None
+    rules = list(DEFAULT_URL_RULES) + list(conf.get("URL_NORMALIZE_RULES") or [])
+    strip_query = conf.get("URL_NORMALIZE_STRIP_QUERY")
+    return get_url_normalizer(
+        rules,
+        strip_query=True if strip_query is None else bool(strip_query),
+        cache_size=int(
+            conf.get("URL_NORMALIZE_CACHE_SIZE") or URL_NORMALIZE_CACHE_SIZE
+        ),
+    )
+
+
+def aggregate_parsed_data(
+    parsed_data: Iterable[Tuple[Any, ...]],
+    conf: Optional[dict] = None,
+    cubes_data: Optional[CubesData] = None,
+) -> Dict[str, Any]:
+    """
+    Return parsed log file data aggregated by urls. If the HEAVY_HITTERS
+    config is set, only this amount of urls with the largest time_sum
+    is tracked (Space-Saving algorithm), requests of evicted urls are kept
+    for totals of the report (see evict_url_measurments). Urls are
+    normalized before the aggregation if the URL_NORMALIZE config is set.
+    With the NumPy backend lines of the exact aggregation are collected
+    into columns of url ids and request times, which are grouped with NumPy.
+    If the TIME_BUCKET config is set, lines have time bucket keys,
+    and the latency of urls is tracked by buckets too. If the GROUP_BY
+    config is set, lines have group values, which are aggregated by cubes
+    into the cubes_data in the same pass (into streaming summaries).
+    :param parsed_data: parsed log file data generator (url, request_time)
+    or (url, request_time, time_bucket), group values are the last item
+    :param conf: app configs
+    :param cubes_data: dict with aggregated data of cubes by cube names
+    :return: dict with aggregated data by urls.
+    """
+    conf = conf or config
+    relative_accuracy = get_summary_accuracy(conf)
+    heavy_hitters_cnt = int(conf.get("HEAVY_HITTERS") or 0)
+    cubes = parse_group_by(conf.get("GROUP_BY"))
+    if cubes:
+        # cells of cubes are summaries in the exact mode too, so the memory
+        # of cubes is bounded by the amount of cells instead of requests
+        cube_accuracy = float(
+            conf.get("SUMMARY_RELATIVE_ACCURACY") or DEFAULT_RELATIVE_ACCURACY
+        )
+        parsed_data = aggregate_cubes(
+            parsed_data,
+            cubes,
+            cubes_data if cubes_data is not None else {},
+            partial(LatencySummary, cube_accuracy),
+        )
+    time_bucket = conf.get("TIME_BUCKET")
+    if (
+        relative_accuracy is None
+        and not heavy_hitters_cnt
+        and not time_bucket
+        and use_numpy_backend(conf)
+    ):
+        columns_recorder = ColumnsRecorder()
+        columns_recorder.add_lines(parsed_data)
+        return aggregate_columns(columns_recorder.get_columns(), conf)
+
+    normalize_url = get_url_normalization(conf)
+    if time_bucket:
+        return aggregate_bucketed_data(
+            parsed_data, str(time_bucket), normalize_url, conf
+        )
+
+    if normalize_url is not None:
+        parsed_data = ((normalize_url(url), time) for url, time in parsed_data)
+    urls_data_dict: Dict[str, Any] = {}
+    if not heavy_hitters_cnt:
+        for url, time in parsed_data:
+            add_url_measurement(urls_data_dict, url, time, relative_accuracy)
+        return urls_data_dict
+
+    heavy_hitters = SpaceSaving(heavy_hitters_cnt)
+    for url, time in parsed_data:
+        evicted_url = heavy_hitters.add(url, time)
+        if evicted_url is not None:
+            evict_url_measurments(urls_data_dict, evicted_url, conf)
+        add_url_measurement(urls_data_dict, url, time, relative_accuracy)
+    return urls_data_dict
+
+
+def aggregate_columns(
+    columns: ParsedColumns, conf: Optional[dict] = None
+) -> Dict[str, Any]:
+    """
+    Return the columns of parsed lines aggregated by urls. In the exact mode
+    request times are grouped by url ids first, so urls are normalized
+    and looked up once per distinct url, not per line.
+    :param columns: named tuple (urls, url_ids, times)
+    :param conf: app configs
+    :return: dict with aggregated data by urls.
+    """
+    conf = conf or config
+    if get_summary_accuracy(conf) is not None or conf.get("HEAVY_HITTERS"):
+        return aggregate_parsed_data(iter_columns(columns), conf)
+
+    if use_numpy_backend(conf):
+        times_by_url_id = group_times_by_ids(
+            columns.url_ids, columns.times, len(columns.urls)
+        )
+    else:
+        times_by_url_id = [array(SERIES_TYPECODE) for _ in columns.urls]
+        appends = [times.append for times in times_by_url_id]
+        for url_id, time in zip(columns.url_ids, columns.times):
+            appends[url_id](time)
+
+    normalize_url = get_url_normalization(conf)
+    urls_data_dict: Dict[str, Any] = {}
+    for url, times in zip(columns.urls, times_by_url_id):
+        if normalize_url is not None:
+            url = normalize_url(url)
+        merge_urls_data(urls_data_dict, {url: LatencySeries(times)})
+    return urls_data_dict
+
+
+def get_url_time_sum(url_measurments: Any) -> float:
+    """
+    Return total request time of the url.
+    :param url_measurments: aggregated data of the url
+    :return: sum of request times.
+    """
+    return url_measurments.time_sum
+
+
+def get_url_stats_count(url_measurments: Any) -> int:
+    """
+    Return amount of requests of the url.
+    :param url_measurments: aggregated data of the url
+    :return: amount of requests.
+    """
+    return url_measurments.count
+
+
+def get_url_stats(url_measurments: Any, quantiles: Sequence[float] = ()) -> SeriesStats:
+    """
+    Return statistics of the url request times. The median and quantiles
+    are computed together, so the series is sorted once.
+    :param url_measurments: aggregated data of the url
+    :param quantiles: quantiles in [0, 1]
+    :return: tuple (count, time_sum, time_avg, time_max, time_med,
+    tuple of quantiles)
+    """
+    count = url_measurments.count
+    if quantiles:
+        time_med, *quantile_values = url_measurments.quantiles((0.5, *quantiles))
+    else:
+        time_med, quantile_values = url_measurments.median(), []
+    return (
+        count,
+        url_measurments.time_sum,
+        url_measurments.mean(),
+        url_measurments.time_max,
+        time_med,
+        tuple(quantile_values),
+    )
+
+
+def aggregate_bucketed_data(
+    parsed_data: Iterable[Tuple[Any, ...]],
+    time_bucket: str,
+    normalize_url: Optional[Callable[[str], str]],
+    conf: dict,
+) -> Dict[str, Any]:
+    """
+    Return parsed log file data with time bucket keys aggregated by urls.
+    Keys are converted to bucket numbers only when they change, as lines
+    are in the order of time, and bucket numbers are kept by runs of request
+    times (BucketedSeries, see aggregate_bucketed_columns for the NumPy
+    backend) or by buckets (BucketedSummary).
+    :param parsed_data: parsed log file data generator
+    (url, request_time, time_bucket_key)
+    :param time_bucket: minute or hour
+    :param normalize_url: url normalization or None
+    :param conf: app configs
+    :return: dict with aggregated data by urls.
+    """
+    relative_accuracy = get_summary_accuracy(conf)
+    heavy_hitters_cnt = int(conf.get("HEAVY_HITTERS") or 0)
+    bucket_seconds = TIME_BUCKET_SECONDS[time_bucket]
+    if relative_accuracy is None and not heavy_hitters_cnt and use_numpy_backend(conf):
+        return aggregate_bucketed_columns(parsed_data, bucket_seconds, normalize_url)
+
+    heavy_hitters = SpaceSaving(heavy_hitters_cnt) if heavy_hitters_cnt else None
+    urls_data_dict: Dict[str, Any] = {}
+    last_key = None
+    bucket = 0
+    for url, time, key in parsed_data:
+        if key != last_key:
+            last_key = key
+            bucket = get_key_time_bucket(key, bucket_seconds, bucket)
+        if normalize_url is not None:
+            url = normalize_url(url)
+        if heavy_hitters is not None:
+            evicted_url = heavy_hitters.add(url, time)
+            if evicted_url is not None:
+                evict_url_measurments(urls_data_dict, evicted_url, conf)
+        url_measurments = urls_data_dict.get(url)
+        if url_measurments is None:
+            if relative_accuracy is None:
+                url_measurments = urls_data_dict[url] = BucketedSeries()
+            else:
+                url_measurments = urls_data_dict[url] = BucketedSummary(
+                    relative_accuracy
+                )
+        url_measurments.add(time, bucket)
+    return urls_data_dict
+
+
+def get_key_time_bucket(key: Any, bucket_seconds: int, last_bucket: int) -> int:
+    """
+    Return the bucket number of the time bucket key, the last bucket
+    is kept if the key can't be parsed.
+    :param key: prefix of $time_local (str or bytes)
+    :param bucket_seconds: size of the bucket in seconds
+    :param last_bucket: bucket number of the previous key
+    :return: bucket number.
+    """
+    try:
+        return get_time_bucket(key, bucket_seconds)
+    except (KeyError, ValueError):
+        logger_adapter.warning(f"Can't parse time bucket {key!r}")
+        return last_bucket
+
+
+def aggregate_bucketed_columns(
+    parsed_data: Iterable[Tuple[Any, ...]],
+    bucket_seconds: int,
+    normalize_url: Optional[Callable[[str], str]],
+) -> Dict[str, Any]:
+    """
+    Return parsed log file data with time bucket keys aggregated by urls
+    with the NumPy backend. Lines are collected into columns of url ids
+    and request times, keys are kept by runs of lines, so the line costs
+    the same as without time buckets. Columns are grouped by url ids
+    with runs of buckets (BucketedSeries) with NumPy, urls are normalized
+    once per distinct url.
+    :param parsed_data: parsed log file data generator
+    (url, request_time, time_bucket_key)
+    :param bucket_seconds: size of the bucket in seconds
+    :param normalize_url: url normalization or None
+    :return: dict with aggregated data by urls.
+    """
+    columns_recorder = ColumnsRecorder()
+    run_keys, run_starts = columns_recorder.add_keyed_lines(parsed_data)
+    run_buckets = []
+    bucket = 0
+    for key in run_keys:
+        bucket = get_key_time_bucket(key, bucket_seconds, bucket)
+        run_buckets.append(bucket)
+
+    columns = columns_recorder.get_columns()
+    urls_data_dict: Dict[str, Any] = {}
+    for url, (times, url_run_buckets, url_run_starts) in zip(
+        columns.urls,
+        group_bucketed_times_by_ids(
+            columns.url_ids, columns.times, run_buckets, run_starts, len(columns.urls)
+        ),
+    ):
+        if normalize_url is not None:
+            url = normalize_url(url)
+        merge_urls_data(
+            urls_data_dict,
+            {url: BucketedSeries(times, url_run_buckets, url_run_starts)},
+        )
+    return urls_data_dict
+
+
+def get_peak_window_stats(
+    peak_window: Optional[Tuple[int, int, float]], time_bucket: str
+) -> dict:
+    """
+    Return columns of the peak window of the url: the time bucket with
+    the largest sum of request times.
+    :param peak_window: tuple (bucket number, count, time_sum) or None
+    :param time_bucket: minute or hour
+    :return: dict with peak_window, peak_count, peak_time_sum, peak_time_avg.
+    """
+    if peak_window is None:
+        return {}
+    bucket, count, time_sum = peak_window
+    return {
+        "peak_window": format_time_bucket(bucket, TIME_BUCKET_SECONDS[time_bucket]),
+        "peak_count": count,
+        "peak_time_sum": round(time_sum, 3),
+        "peak_time_avg": round(time_sum / count, 3),
+    }
+
+
+def get_peak_windows(
+    measurments: List[Any], conf: dict
+) -> List[Optional[Tuple[int, int, float]]]:
+    """
+    Return peak windows of urls with time buckets, stats by buckets
+    are computed only for urls of the report. Peak windows of the exact
+    series are computed in one batch with the NumPy backend.
+    :param measurments: aggregated data of urls of the report
+    :param conf: app configs
+    :return: list of tuples (bucket number, count, time_sum) or None
+    for urls without time buckets.
+    """
+    if all(isinstance(el, BucketedSeries) for el in measurments) and (
+        use_numpy_backend(conf)
+    ):
+        return list(get_series_peaks(measurments))
+    return [
+        (
+            url_measurments.get_peak_window()
+            if isinstance(url_measurments, (BucketedSeries, BucketedSummary))
+            else None
+        )
+        for url_measurments in measurments
+    ]
+
+
+def get_report_percentiles(conf: dict) -> Tuple[str, ...]:
+    """
+    Return percentile columns of the report of urls from the REPORT_PERCENTILES
+    config: the list of percentiles or the string of percentiles separated
+    with ",", e.g. "90,95,99,99.9" gives time_p90, time_p95, time_p99, time_p99.9.
+    :param conf: app configs
+    :return: tuple of column names.
+    """
+    percentiles = conf.get("REPORT_PERCENTILES")
+    if not percentiles:
+        return ()
+    if isinstance(percentiles, str):
+        percentiles = percentiles.split(",")
+    return parse_metrics([f"time_p{float(percentile):g}" for percentile in percentiles])
+
+
+def build_report_data(
+    urls_data_dict: Dict[Any, Any],
+    conf: dict,
+    key_fields: Tuple[str, ...] = (URL_FIELD,),
+    metrics: Optional[Tuple[str, ...]] = None,
+) -> List[dict]:
+    """
+    Return data prepared for the report with the aggregated data by urls
+    (or by keys of the cube). Statistics of the exact series are computed
+    in one batch with the NumPy backend. Urls with time buckets get columns
+    of the peak window. Requests of urls evicted from heavy hitters are
+    counted in totals of count_perc and time_perc, but aren't reported.
+    :param urls_data_dict: dict with aggregated data by urls
+    :param conf: app configs
+    :param key_fields: columns of keys, keys of several fields are tuples
+    :param metrics: columns of metrics (see parse_metrics), all columns
+    and REPORT_PERCENTILES columns if metrics aren't passed
+    :return: list of a report lines.
+    """
+    logger_adapter.info(f"Start preparing report data...")
+    total_time_sum = 0.0
+    total_measurments = 0
+    for url_measurments in urls_data_dict.values():
+        total_time_sum += get_url_time_sum(url_measurments)
+        total_measurments += get_url_stats_count(url_measurments)
+
+    report_items: Iterable[Tuple[Any, Any]] = urls_data_dict.items()
+    if key_fields == (URL_FIELD,) and EVICTED_URLS_KEY in urls_data_dict:
+        report_items = (el for el in report_items if el[0] != EVICTED_URLS_KEY)
+    report_size = int(conf["REPORT_SIZE"])
+    if report_size:
+        urls_data = heapq.nlargest(
+            report_size,
+            report_items,
+            key=lambda el: get_url_time_sum(el[1]),
+        )
+    else:
+        urls_data = sorted(
+            report_items,
+            key=lambda el: get_url_time_sum(el[1]),
+            reverse=True,
+        )
+
+    metrics_quantiles = [
+        (metric, get_metric_quantile(metric))
+        for metric in (get_report_percentiles(conf) if metrics is None else metrics)
+    ]
+    percentile_metrics = [metric for metric, q in metrics_quantiles if q is not None]
+    quantiles = [q for _, q in metrics_quantiles if q is not None]
+    measurments = [url_measurments for _, url_measurments in urls_data]
+    if all(isinstance(el, LatencySeries) for el in measurments) and (
+        use_numpy_backend(conf)
+    ):
+        urls_stats = get_series_stats(measurments, quantiles)
+    else:
+        urls_stats = [
+            get_url_stats(url_measurments, quantiles) for url_measurments in measurments
+        ]
+
+    time_bucket = str(conf.get("TIME_BUCKET") or "")
+    peak_windows = (
+        get_peak_windows(measurments, conf)
+        if time_bucket
+        else [None] * len(measurments)
+    )
+
+    report_data = []
+    for (key, _), url_stats, peak_window in zip(urls_data, urls_stats, peak_windows):
+        count, time_sum, time_avg, time_max, time_med, quantile_values = url_stats
+        report_line = dict(zip(key_fields, key if len(key_fields) > 1 else (key,)))
+        report_line.update(
+            {
+                "count": count,
+                "count_perc": round(count / total_measurments * 100, 3),
+                "time_sum": round(time_sum, 3),
+                "time_perc": round(time_sum / total_time_sum * 100, 3),
+                "time_avg": round(time_avg, 3),
+                "time_max": round(time_max, 3),
+                "time_med": round(time_med, 3),
+            }
+        )
+        report_line.update(
+            zip(percentile_metrics, (round(value, 3) for value in quantile_values))
+        )
+        report_line.update(get_peak_window_stats(peak_window, time_bucket))
+        if metrics is not None:
+            report_line = {
+                field: report_line[field] for field in (*key_fields, *metrics)
+            }
+        report_data.append(report_line)
+    logger_adapter.info(f"Report data has been prepared successfully.")
+    return report_data
+
+
+def prepare_report_data(
+    parsed_data: Generator, conf: Optional[dict] = None
+) -> List[dict]:
+    """
+    Return data prepared for the report with passed log file data.
+    :param parsed_data: parsed log file data generator (url, request_time)
+    :param conf: app configs
+    :return: list of a report lines.
+    """
+    conf = conf or config
+    return build_report_data(aggregate_parsed_data(parsed_data, conf), conf)
+
+
+def build_cubes_report_data(cubes_data: CubesData, conf: dict) -> Dict[str, List[dict]]:
+    """
+    Return report tables of GROUP_BY cubes with GROUP_BY_METRICS columns.
+    Values of keys of bytes lines are decoded here.
+    :param cubes_data: dict with aggregated data of cubes by cube names
+    :param conf: app configs
+    :return: dict with lists of report lines by cube names.
+    """
+    metrics = parse_metrics(conf.get("GROUP_BY_METRICS"))
+    cubes_report_data = {}
+    for cube in parse_group_by(conf.get("GROUP_BY")):
+        cube_name = get_cube_name(cube)
+        cube_data: Dict[Any, Any] = {}
+        for key, key_measurments in cubes_data.get(cube_name, {}).items():
+            merge_urls_data(
+                cube_data,
+                {decode_cube_key(key, conf["DATA_ENCODING"]): key_measurments},
+            )
+        cubes_report_data[cube_name] = build_report_data(cube_data, conf, cube, metrics)
+    return cubes_report_data
+
+
+def get_urls_summaries(
+    urls_data_dict: Dict[str, Any], conf: dict
+) -> Dict[str, LatencySummary]:
+    """
+    Return the aggregated data by urls as mergeable latency summaries.
+    :param urls_data_dict: dict with aggregated data by urls
+    :param conf: app configs
+    :return: dict with latency summaries by urls.
+    """
+    relative_accuracy = float(
+        conf.get("SUMMARY_RELATIVE_ACCURACY") or DEFAULT_RELATIVE_ACCURACY
+    )
+    return {
+        url: (
+            url_measurments
+            if isinstance(url_measurments, LatencySummary)
+            else LatencySummary.from_series(url_measurments.times, relative_accuracy)
+        )
+        for url, url_measurments in urls_data_dict.items()
+    }
+
+
+def get_report_path(report_date: datetime, conf: dict) -> str:
+    """
+    Return report path based on the report date and the REPORT_DIR config.
+    :param report_date: date of current report
+    :param conf: app configs
+    :return: path to report file.
+    """
+    report_fn = f"report-{datetime.strftime(report_date, '%Y.%m.%d')}.html"
+    return os.path.join(conf["REPORT_DIR"], report_fn)
+
+
+def get_cache_path(report_date: datetime, conf: dict) -> str:
+    """
+    Return path of the aggregated data cache, which is stored next to the report.
+    :param report_date: date of the report
+    :param conf: app configs
+    :return: path to cache file.
+    """
+    report_path = get_report_path(report_date, conf)
+    return f"{os.path.splitext(report_path)[0]}{AGGREGATE_CACHE_EXT}"
+
+
+def get_columns_cache_path(report_date: datetime, conf: dict) -> str:
+    """
+    Return path of the columnar cache of parsed lines, which is stored
+    next to the report.
+    :param report_date: date of the report
+    :param conf: app configs
+    :return: path to cache file.
+    """
+    report_path = get_report_path(report_date, conf)
+    return f"{os.path.splitext(report_path)[0]}{COLUMNS_CACHE_EXT}"
+
+
+def get_cube_report_path(report_date: datetime, cube_name: str, conf: dict) -> str:
+    """
+    Return path of the report table of the GROUP_BY cube.
+    :param report_date: date of the report
+    :param cube_name: name of the cube
+    :param conf: app configs
+    :return: path to report file.
+    """
+    cube_fn = cube_name.replace(CUBE_FIELDS_SEPARATOR, "-")
+    report_fn = f"report-{datetime.strftime(report_date, '%Y.%m.%d')}.by-{cube_fn}.html"
+    return os.path.join(conf["REPORT_DIR"], report_fn)
+
+
+def get_rollup_report_path(report_date: datetime, days: int, conf: dict) -> str:
+    """
+    Return path of the report for the several days ending with the report date.
+    :param report_date: last date of the report
+    :param days: amount of days
+    :param conf: app configs
+    :return: path to report file.
+    """
+    report_fn = (
+        f"report-rollup-{days}d-{datetime.strftime(report_date, '%Y.%m.%d')}.html"
+    )
+    return os.path.join(conf["REPORT_DIR"], report_fn)
+
+
+def get_live_report_path(report_date: datetime, conf: dict) -> str:
+    """
+    Return path of the intraday report of the live log.
+    :param report_date: date of the report
+    :param conf: app configs
+    :return: path to report file.
+    """
+    report_fn = f"report-{datetime.strftime(report_date, '%Y.%m.%d')}.live.html"
+    return os.path.join(conf["REPORT_DIR"], report_fn)
+
+
+def get_report_data_path(report_path: str, conf: dict) -> str:
+    """
+    Return path to the json sidecar of the report with its data.
+    :param report_path: path to report file
+    :param conf: app configs
+    :return: path string.
+    """
+    gzip_ext = ".gz" if conf.get("REPORT_DATA_GZIP") else ""
+    return f"{os.path.splitext(report_path)[0]}.json{gzip_ext}"
+
+
+def render_report(report_data: List[dict], conf: dict) -> str:
+    """
+    Return the report page with the report data inlined.
+    :param report_data: list of dicts with the data of report lines
+    :param conf: app configs
+    :return: report page.
+    """
+    with open(
+        "templates/report.html", "r", encoding=conf["DATA_ENCODING"]
+    ) as report_template:
+        return Template(report_template.read()).safe_substitute(
+            table_json=json.dumps(report_data)
+        )
+
+
+def create_report_file(
+    report_data: List[dict],
+    report_date: datetime,
+    conf: dict,
+    report_path: Optional[str] = None,
+) -> None:
+    """
+    Create report file with passed report data. With the sidecar REPORT_OUTPUT
+    the data is streamed into the json file next to the report, and the report
+    page loads it lazily.
+    :param report_data: list of dicts with the data of report lines
+    :param report_date: date of the report
+    :param conf: app configs
+    :param report_path: path to report file, by default it depends on the date
+    :return:
+    """
+    logger_adapter.info("Start report file creating...")
+    report_path = report_path or get_report_path(report_date, conf)
+    if conf.get("REPORT_OUTPUT") == REPORT_OUTPUT_SIDECAR:
+        data_path = get_report_data_path(report_path, conf)
+        write_report_data(report_data, data_path, conf["DATA_ENCODING"])
+        with open(
+            "templates/report_lazy.html", "r", encoding=conf["DATA_ENCODING"]
+        ) as report_template:
+            report_str = Template(report_template.read()).safe_substitute(
+                data_url=json.dumps(os.path.basename(data_path))
+            )
+    else:
+        report_str = render_report(report_data, conf)
+    with open(report_path, "w", encoding=conf["DATA_ENCODING"]) as report:
+        report.write(report_str)
+    logger_adapter.info(f"Finish report file {str(report_path)!r} creating...")
+
+
+def get_urls_data(
+    log_file_info: LastLogData, conf: dict, cubes_data: Optional[CubesData] = None
+) -> Dict[str, Any]:
+    """
+    Return the aggregated data by urls of the log file. If the AGGREGATE_CACHE
+    config is set, the data is loaded from the cache of the same version
+    of the log file or saved to the cache after parsing. If the COLUMNS_CACHE
+    config is set, the data is aggregated from the columnar cache of parsed
+    lines, which is written by the first (sequential) parsing. With
+    PROFILE_LINES only the first lines are parsed by one process without caches.
+    Caches are not used with TIME_BUCKET, as they don't keep time buckets.
+    GROUP_BY cubes are aggregated in the same pass only if the cubes_data
+    is passed, caches are not used then too.
+    :param log_file_info: named tuple (path_to_file, date_in_filename, file_extension)
+    :param conf: app configs
+    :param cubes_data: dict, which aggregated data of GROUP_BY cubes is put into
+    :return: dict with aggregated data by urls.
+    """
+    if cubes_data is None and conf.get("GROUP_BY"):
+        conf = dict(conf, GROUP_BY="")
+    profile_lines = int(conf.get("PROFILE_LINES") or 0)
+    no_caches = profile_lines or conf.get("TIME_BUCKET") or conf.get("GROUP_BY")
+    use_cache = conf.get("AGGREGATE_CACHE") and not no_caches
+    use_columns_cache = conf.get("COLUMNS_CACHE") and not no_caches
+    if use_cache or use_columns_cache:
+        source_info = get_source_info(log_file_info.path)
+    if use_cache:
+        cache_path = get_cache_path(log_file_info.date, conf)
+        relative_accuracy = float(
+            conf.get("SUMMARY_RELATIVE_ACCURACY") or DEFAULT_RELATIVE_ACCURACY
+        )
+        urls_data = load_aggregate_cache(cache_path, source_info, relative_accuracy)
+        if urls_data is not None:
+            logger_adapter.info(f"Aggregated data has been loaded from {cache_path!r}")
+            return urls_data
+
+    urls_data = None
+    columns_recorder = None
+    if use_columns_cache:
+        columns_cache_path = get_columns_cache_path(log_file_info.date, conf)
+        columns = load_columns_cache(columns_cache_path, source_info)
+        if columns is not None:
+            logger_adapter.info(
+                f"Parsed lines have been loaded from {columns_cache_path!r}"
+            )
+            urls_data = aggregate_columns(columns, conf)
+        else:
+            columns_recorder = ColumnsRecorder()
+
+    workers = 1 if profile_lines or columns_recorder else get_workers_cnt(conf)
+    if urls_data is None and workers > 1 and not log_file_info.ext:
+        urls_data = parse_log_data_parallel(log_file_info, conf, workers, cubes_data)
+    elif urls_data is None and workers > 1:
+        urls_data = parse_compressed_log_parallel(
+            log_file_info, conf, workers, cubes_data
+        )
+    if urls_data is None:
+        log_file_data: Iterable[bytes] = get_log_data_bytes(log_file_info, conf)
+        if profile_lines:
+            logger_adapter.info(f"Only the first {profile_lines} lines are parsed.")
+            log_file_data = islice(log_file_data, profile_lines)
+        # The size of the compressed data isn't known exactly (gzip keeps it
+        # modulo 2^32), so parse errors are checked early for plain files only
+        data_size = (
+            0
+            if profile_lines or log_file_info.ext
+            else get_log_data_size(log_file_info)
+        )
+        parsed_data: Iterable[Tuple[str, float]] = parse_log_data(
+            log_file_data, log_file_info.path, conf, data_size
+        )
+        if columns_recorder is not None:
+            parsed_data = columns_recorder.record(parsed_data)
+        urls_data = aggregate_parsed_data(parsed_data, conf, cubes_data)
+        if columns_recorder is not None:
+            save_columns_cache(
+                columns_cache_path, source_info, columns_recorder.get_columns()
+            )
+            logger_adapter.info(
+                f"Parsed lines have been saved to {columns_cache_path!r}"
+            )
+
+    if use_cache:
+        save_aggregate_cache(
+            cache_path, source_info, get_urls_summaries(urls_data, conf)
+        )
+        logger_adapter.info(f"Aggregated data has been saved to {cache_path!r}")
+    return urls_data
+
+
+def process_log_file(log_file_info: LastLogData, conf: dict) -> None:
+    """
+    Parse the log file and create its report and report tables of GROUP_BY
+    cubes, which are aggregated in the same pass. The processing status
+    and its duration are recorded in the LOG_CATALOG if it is set.
+    :param log_file_info: named tuple (path_to_file, date_in_filename, file_extension)
+    :param conf: app configs
+    :return:
+    """
+    catalog = None
+    if conf.get("LOG_CATALOG") and not conf.get("PROFILE_LINES"):
+        catalog = LogCatalog(str(conf["LOG_CATALOG"]))
+        catalog.mark_started(log_file_info.path)
+    try:
+        cubes_data: CubesData = {}
+        with run_stage("parse"):
+            urls_data = get_urls_data(log_file_info, conf, cubes_data)
+        run_metrics.add("bytes_read_compressed", os.path.getsize(log_file_info.path))
+        run_metrics.add(
+            "distinct_urls", len(urls_data) - (EVICTED_URLS_KEY in urls_data)
+        )
+        with run_stage("report_data"):
+            report_data = build_report_data(urls_data, conf)
+            cubes_report_data = build_cubes_report_data(cubes_data, conf)
+        if conf.get("PROFILE_LINES"):
+            logger_adapter.info("The report of the profiled lines isn't created.")
+            return
+        with run_stage("report_file"):
+            create_report_file(report_data, log_file_info.date, conf)
+            for cube_name, cube_report_data in cubes_report_data.items():
+                create_report_file(
+                    cube_report_data,
+                    log_file_info.date,
+                    conf,
+                    report_path=get_cube_report_path(
+                        log_file_info.date, cube_name, conf
+                    ),
+                )
+    except BaseException as e:
+        if catalog is not None:
+            catalog.mark_finished(log_file_info.path, repr(e))
+        raise
+    else:
+        if catalog is not None:
+            catalog.mark_finished(log_file_info.path)
+    finally:
+        if catalog is not None:
+            catalog.close()
+
+
+def create_rollup_report(conf: dict, days: int) -> None:
+    """
+    Create the report for the several days ending with the date of the last log.
+    Days are merged from the aggregated data caches, only days without
+    valid cache are parsed (and cached). Caches built with another
+    SUMMARY_RELATIVE_ACCURACY are stale: days are parsed again, days
+    without log files are skipped.
+    :param conf: app configs
+    :param days: amount of days
+    :return:
+    """
+    log_files_info = {
+        log_file_info.date: log_file_info for log_file_info in iter_conf_log_files(conf)
+    }
+    if not log_files_info:
+        raise FileExistsError(f"Log file hasn't been found!")
+    last_date = max(log_files_info)
+    logger_adapter.info(f"Start creating {days} days rollup report...")
+
+    day_conf = dict(conf, AGGREGATE_CACHE=True)
+    relative_accuracy = float(
+        conf.get("SUMMARY_RELATIVE_ACCURACY") or DEFAULT_RELATIVE_ACCURACY
+    )
+    urls_data: Dict[str, Any] = {}
+    for day in range(days):
+        report_date = last_date - timedelta(days=day)
+        log_file_info = log_files_info.get(report_date)
+        if log_file_info:
+            day_urls_data: Optional[Dict[str, Any]] = get_urls_data(
+                log_file_info, day_conf
+            )
+        else:
+            day_urls_data = load_aggregate_cache(
+                get_cache_path(report_date, conf), relative_accuracy=relative_accuracy
+            )
+        if day_urls_data is None:
+            logger_adapter.info(
+                f"Warning: there is no data for {report_date:%Y.%m.%d}, skipped."
+            )
+            continue
+        merge_urls_data(urls_data, get_urls_summaries(day_urls_data, conf))
+
+    report_data = build_report_data(urls_data, conf)
+    create_report_file(
+        report_data,
+        last_date,
+        conf,
+        report_path=get_rollup_report_path(last_date, days, conf),
+    )
+
+
+def parse_new_log_lines(
+    follower: LogFollower, urls_data: Dict[str, Any], conf: dict
+) -> int:
+    """
+    Parse lines appended to the live log and add them to the running
+    aggregated data by urls.
+    :param follower: follower of the live log
+    :param urls_data: dict with latency summaries by urls
+    :param conf: app configs
+    :return: amount of parsed lines.
+    """
+    relative_accuracy = float(
+        conf.get("SUMMARY_RELATIVE_ACCURACY") or DEFAULT_RELATIVE_ACCURACY
+    )
+    normalize_url = get_url_normalization(conf)
+    parse_stats: Dict[str, Any] = {}
+    # the checkpoint keeps latency summaries by urls only, so lines
+    # aren't bucketed and grouped by cubes
+    follow_conf = dict(conf, TIME_BUCKET="", GROUP_BY="")
+    for url, time in parse_log_lines(
+        follower.read_new_lines(),
+        follower.path,
+        follow_conf,
+        parse_stats,
+        fail_fast=False,
+    ):
+        if normalize_url is not None:
+            url = normalize_url(url)
+        add_url_measurement(urls_data, url, time, relative_accuracy)
+    return parse_stats["total_lines_cnt"]
+
+
+def follow_log(conf: dict) -> None:
+    """
+    Follow the live log file and regenerate its intraday report every
+    FOLLOW_INTERVAL seconds. Only appended bytes are parsed on each refresh,
+    the position and the aggregated data are persisted in the checkpoint,
+    so the run may be resumed. The data is reset at the start of a new day.
+    :param conf: app configs
+    :return:
+    """
+    log_path = str(
+        conf.get("FOLLOW_LOG_PATH")
+        or os.path.join(str(conf["LOG_DIR"]), FOLLOW_LOG_FILENAME)
+    )
+    checkpoint_path = os.path.join(conf["REPORT_DIR"], FOLLOW_CHECKPOINT_FILENAME)
+    interval = float(conf.get("FOLLOW_INTERVAL") or 0)
+    max_iterations = int(conf.get("FOLLOW_ITERATIONS") or 0)
+
+    follower = LogFollower(log_path)
+    urls_data: Dict[str, Any] = {}
+    report_date = datetime.combine(datetime.today(), datetime.min.time())
+    checkpoint = read_aggregate_cache(checkpoint_path)
+    if checkpoint and checkpoint[0].get("path") == log_path:
+        checkpoint_info, checkpoint_urls_data = checkpoint
+        follower = LogFollower(
+            log_path, checkpoint_info["inode"], checkpoint_info["offset"]
+        )
+        if checkpoint_info.get("date") == report_date.strftime("%Y%m%d"):
+            urls_data = dict(checkpoint_urls_data)
+    logger_adapter.info(f"Start following the log file {log_path!r}...")
+
+    iterations = 0
+    try:
+        while True:
+            current_date = datetime.combine(datetime.today(), datetime.min.time())
+            if current_date != report_date:
+                report_date, urls_data = current_date, {}
+            lines_cnt = parse_new_log_lines(follower, urls_data, conf)
+            checkpoint_info = dict(
+                follower.get_checkpoint(), date=report_date.strftime("%Y%m%d")
+            )
+            save_aggregate_cache(checkpoint_path, checkpoint_info, urls_data)
+            create_report_file(
+                build_report_data(urls_data, conf),
+                report_date,
+                conf,
+                report_path=get_live_report_path(report_date, conf),
+            )
+            logger_adapter.info(f"{lines_cnt} new lines of the live log parsed.")
+
+            iterations += 1
+            if max_iterations and iterations >= max_iterations:
+                break
+            sleep(interval)
+    finally:
+        follower.close()
+
+
+def compute_report_data(report_date: datetime, conf: dict) -> List[dict]:
+    """
+    Return report data of the date for the report service: the log file
+    of the date is aggregated (with caches, if they are set), the aggregated
+    data cache is used if there is no log file.
+    :param report_date: date of the report
+    :param conf: app configs
+    :return: list of report lines.
+    """
+    urls_data: Optional[Dict[str, Any]] = None
+    for log_file_info in iter_conf_log_files(conf):
+        if log_file_info.date == report_date:
+            urls_data = get_urls_data(log_file_info, conf)
+            break
+    else:
+        urls_data = load_aggregate_cache(get_cache_path(report_date, conf))
+    if urls_data is None:
+        raise FileNotFoundError(
+            f"Log file of {report_date:%Y.%m.%d} hasn't been found!"
+        )
+    return build_report_data(urls_data, conf)
+
+
+def serve_reports(conf: dict) -> None:
+    """
+    Serve reports by dates, json slices of their data, health and metrics
+    with the asyncio HTTP service on SERVE_HOST:SERVE_PORT. Report data
+    is computed in the pool of WORKERS processes, rendered reports and slices
+    are cached in memory up to SERVE_CACHE_SIZE bytes.
+    :param conf: app configs
+    :return:
+    """
+    host = str(conf.get("SERVE_HOST") or SERVE_HOST)
+    port = int(conf.get("SERVE_PORT") or SERVE_PORT)
+    with ProcessPoolExecutor(max_workers=get_workers_cnt(conf)) as executor:
+        service = ReportService(
+            partial(compute_report_data, conf=conf),
+            partial(render_report, conf=conf),
+            executor,
+            int(conf.get("SERVE_CACHE_SIZE") or SERVICE_CACHE_SIZE),
+        )
+        logger_adapter.info(f"Start serving reports on http://{host}:{port}/ ...")
+        asyncio.run(service.serve(host, port))
+
+
+def init_backfill_worker(gzip_semaphore: Any) -> None:
+    """
+    Set the semaphore, which limits simultaneous decompression of logs,
+    in the backfill worker process.
+    :param gzip_semaphore: multiprocessing semaphore
+    :return:
+    """
+    global backfill_gzip_semaphore
+    backfill_gzip_semaphore = gzip_semaphore
+
+
+def backfill_log_file(log_file_info: LastLogData, conf: dict) -> bool:
+    """
+    Create the report of the log file in the backfill worker process.
+    :param log_file_info: named tuple (path_to_file, date_in_filename, file_extension)
+    :param conf: app configs
+    :return: True if the report has been created.
+    """
+    try:
+        if log_file_info.ext and backfill_gzip_semaphore is not None:
+            with backfill_gzip_semaphore:
+                process_log_file(log_file_info, conf)
+        else:
+            process_log_file(log_file_info, conf)
+    except Exception as e:
+        logger_adapter.exception(
+            f"Error while processing file {log_file_info.path!r}: {e}"
+        )
+        return False
+    return True
+
+
+def backfill_reports(conf: dict) -> None:
+    """
+    Create reports for all log files without them with the pool of processes.
+    The largest files are scheduled first, amount of simultaneously
+    decompressed files is limited with the BACKFILL_GZIP_LIMIT config.
+    :param conf: app configs
+    :return:
+    """
+    log_files_info = search_unreported_log_files(conf)
+    if not log_files_info:
+        raise FileExistsError("There are no log files without reports!")
+
+    workers = min(get_workers_cnt(conf), len(log_files_info))
+    worker_conf = dict(conf, WORKERS=1)
+    gzip_limit = max(int(conf.get("BACKFILL_GZIP_LIMIT") or workers), 1)
+    gzip_semaphore = multiprocessing.BoundedSemaphore(gzip_limit)
+    logger_adapter.info(
+        f"Start backfill of {len(log_files_info)} log files with {workers} workers..."
+    )
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_backfill_worker,
+        initargs=(gzip_semaphore,),
+    ) as executor:
+        results = list(
+            executor.map(
+                backfill_log_file,
+                log_files_info,
+                [worker_conf] * len(log_files_info),
+            )
+        )
+
+    failed_paths = [
+        log_file_info.path
+        for log_file_info, result in zip(log_files_info, results)
+        if not result
+    ]
+    if failed_paths:
+        raise RuntimeError(f"Backfill has failed for files: {failed_paths!r}")
+    logger_adapter.info(f"Backfill of {len(log_files_info)} log files has finished.")
+
+
+@contextmanager
+def run_stage(name: str) -> Generator[None, None, None]:
+    """
+    Measure the stage of the run for metrics and profile it,
+    top allocation sites are logged after the stage.
+    :param name: name of the stage
+    :return:
+    """
+    with run_metrics.stage(name), stage_profiler.stage(name) as malloc_top:
+        yield
+    for line in malloc_top:
+        logger_adapter.info(line)
+
+
+def get_stage_profiler(conf: dict) -> StageProfiler:
+    """
+    Return the profiler of stages configured with PROFILE, PROFILE_FORMAT,
+    PROFILE_DIR and TRACE_MALLOC configs.
+    :param conf: app configs
+    :return: stage profiler.
+    """
+    profile_dir = str(conf.get("PROFILE_DIR") or conf["REPORT_DIR"])
+    if conf.get("PROFILE") or conf.get("TRACE_MALLOC"):
+        os.makedirs(profile_dir, exist_ok=True)
+    return StageProfiler(
+        str(conf.get("PROFILE") or ""),
+        str(conf.get("PROFILE_FORMAT") or PROFILE_FORMAT_PSTATS),
+        profile_dir,
+        int(conf.get("TRACE_MALLOC") or 0),
+    )
+
+
+def save_run_metrics(conf: dict, success: bool) -> None:
+    """
+    Save metrics of the run into the json history next to reports (METRICS)
+    and into the Prometheus textfile (METRICS_PROMETHEUS_PATH).
+    :param conf: app configs
+    :param success: the run has finished without errors
+    :return:
+    """
+    metrics_json = conf.get("METRICS")
+    prometheus_path = conf.get("METRICS_PROMETHEUS_PATH")
+    if not (metrics_json or prometheus_path):
+        return
+    metrics = run_metrics.to_dict(success)
+    try:
+        if metrics_json:
+            save_metrics_json(
+                metrics,
+                os.path.join(conf["REPORT_DIR"], METRICS_FILENAME),
+                int(conf.get("METRICS_HISTORY_SIZE") or METRICS_HISTORY_SIZE),
+            )
+        if prometheus_path:
+            save_prometheus_textfile(metrics, str(prometheus_path))
+    except OSError as e:
+        logger_adapter.error(f"Metrics of the run haven't been saved: {e}")
+
+
+def main(init_config) -> None:
+    """
+    Main method of the Log Analyzer.
+    :param init_config: app configs
+    :return:
+    """
+    global run_metrics, stage_profiler
+    run_metrics = RunMetrics()
+    conf = init_config
+    success = False
+    try:
+
+        conf = get_config(init_config)
+        stage_profiler = get_stage_profiler(conf)
+
+        logger_adapter.info("Log analyzer has been started...")
+        with run_stage("total"):
+            if conf.get("SERVE"):
+                serve_reports(conf)
+            elif conf.get("FOLLOW"):
+                follow_log(conf)
+            elif conf.get("ROLLUP_DAYS"):
+                create_rollup_report(conf, int(conf["ROLLUP_DAYS"]))
+            elif conf.get("BACKFILL"):
+                backfill_reports(conf)
+            else:
+                with run_stage("search"):
+                    log_file_info = search_log_file(conf)
+                process_log_file(log_file_info, conf)
+        success = True
         logger_adapter.info("Log analyzer has been successfully finished...")
     except RuntimeError as e:
         logger_adapter.error(f"Warning: {e}")
         sys.exit()
     except FileExistsError as e:
+        success = True
         logger_adapter.info(f"Warning: {e}")
     except KeyboardInterrupt as e:
         logger_adapter.exception(f"Process has been interrupted: {e}")
     except BaseException as e:
         logger_adapter.exception(f"Error: {e}")
+    finally:
+        stage_profiler.close()
+        save_run_metrics(conf, success)
 
 
 if __name__ == "__main__":  # pragma: no cover
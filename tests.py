@@ -2,17 +2,63 @@
 Tests for Log Analyzer app.
 """
 import argparse
+import asyncio
+import bz2
 import datetime
+import gzip
+import io
 import json
 import logging
+import lzma
 import os
+import pstats
 import re
 import shutil
+import statistics
+import socket
 import tempfile
 import unittest
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import accumulate
+from logging.handlers import QueueHandler
+from typing import Callable, List, Tuple
 from unittest import TestCase, mock
-from utils.logging_utils import get_logger_adapter, get_extra_data
+from utils.aggregate_cache import load_aggregate_cache
+from utils.columns_cache import load_columns_cache
+from utils.group_by import parse_metrics
+from utils.heavy_hitters import SpaceSaving
+from utils.latency_series import LatencySeries
+from utils.latency_summary import LatencySummary
+from utils.log_catalog import LogCatalog
+from utils.log_codecs import CODECS, get_stream_segments, iter_decompressed_streams
+from utils.log_follower import LogFollower
+from utils.log_format import compile_log_format
+from utils.log_readers import (
+    iter_block_lines,
+    iter_gzip_blocks,
+    iter_threaded_blocks,
+)
+from utils.logging_utils import (
+    get_logger_adapter,
+    get_extra_data,
+    set_queue_logging,
+    stop_queue_logging,
+)
+from utils.numpy_backend import (
+    get_series_stats,
+    group_times_by_ids,
+    is_numpy_available,
+)
+from utils.report_service import LRUCache, ReportService
+from utils.time_buckets import (
+    BucketedSeries,
+    BucketedSummary,
+    format_time_bucket,
+    get_time_bucket,
+    get_time_bucket_size,
+)
+from utils.url_normalizer import get_url_normalizer
 
 with mock.patch(
     "argparse.ArgumentParser.parse_args",
@@ -21,7 +67,19 @@ with mock.patch(
     "utils.logging_utils.get_logger_adapter",
     return_value=get_logger_adapter(__name__, {}),
 ):
-    from create_test_logs import main as create_test_logs_main, create_log_file
+    from create_test_logs import (
+        main as create_test_logs_main,
+        create_log_file,
+        create_logs_fast,
+    )
+    from benchmarks import (
+        STAGES,
+        benchmark_dataset,
+        compare_results,
+        get_dataset,
+        import_log_analyzer,
+        main as benchmarks_main,
+    )
     from config import get_config
 
     from log_analyzer import (
@@ -33,10 +91,43 @@ with mock.patch(
         main as log_analyzer_main,
         parse_log_data,
         prepare_report_data,
+        build_report_data,
+        build_cubes_report_data,
+        compute_report_data,
+        render_report,
+        get_log_shards,
+        LogShard,
+        parse_log_shard,
+        merge_parse_stats,
+        parse_log_data_parallel,
+        get_log_data_bytes,
+        search_unreported_log_files,
+        backfill_reports,
+        process_log_file,
+        create_rollup_report,
+        get_cache_path,
+        get_columns_cache_path,
+        follow_log,
+        get_live_report_path,
+        aggregate_parsed_data,
+        merge_urls_data,
+        EVICTED_URLS_KEY,
+        parse_compressed_log_parallel,
+        parse_log_segment,
+        LogSegment,
+        parse_log_lines,
+        create_report_file,
+        get_url_stats,
     )
 
 
 TEST_STR = "test str\n" * 4
+# the running sum of the times gives the average 0.516
+AVG_TIMES = [0.129, 0.287, 0.805, 0.727, 0.772, 0.934, 0.275, 0.105, 0.446, 0.685]
+STREAM_COMPRESSORS: Tuple[Tuple[str, Callable[[bytes], bytes]], ...] = (
+    (".bz2", bz2.compress),
+    (".xz", lzma.compress),
+)
 
 
 def remove_tmpdir(dir_name: str) -> None:  # pragma: no cover
@@ -170,15 +261,15 @@ def generate_log_files(
     """
     test_string_list = get_str_list_fixture()
     log_files_info = [
-        ("nginx-access-ui.log-20220828.bz2", "", test_string_list),
+        ("nginx-access-ui.log-20220828.zip", "", test_string_list),
         ("nginx-access-ui.log-20220829.gz", "", test_string_list),
-        ("nginx-access-ui.log-20220830.bz2", "", test_string_list),
+        ("nginx-access-ui.log-20220830.zip", "", test_string_list),
         (f"nginx-access-ui.log-20220831", ext, test_string_list),
         ("nginx-access-ui.log-20220901.tar", "", test_string_list),
         ("nginx-access-ui.log-20220902.tar", "", test_string_list),
-        ("nginx-access-ui.log-20220903.bz2", "", test_string_list),
+        ("nginx-access-ui.log-20220903.zip", "", test_string_list),
         ("nginx-access-ui.log-20220904.tar", "", test_string_list),
-        ("nginx-access-ui.log-20220905.bz2", "", test_string_list),
+        ("nginx-access-ui.log-20220905.zip", "", test_string_list),
         ("nginx-access-ui.log-20220906.tar", "", test_string_list),
     ]
     for fn, f_ext, records in log_files_info:
@@ -271,6 +362,50 @@ class TestLogAnalyzer(TestCase):  # pragma: no cover
         generate_report(self.conf, self.encoding, log_file_info_fixture)
         self.assertRaises(FileExistsError, search_log_file, self.conf)
 
+    def test_search_log_file_catalog(self) -> None:
+        """
+        Test last unprocessed log file searching with the log catalog, which
+        is rescanned only after changes of the log dir, checking of changes
+        of unprocessed files and recording of the processing status.
+        :return:
+        """
+        log_text, _, _ = get_log_file_text_fixture()
+        create_log_file("nginx-access-ui.log-20220701", "", [log_text], self.conf)
+        os.utime(self.log_dir, ns=(0, 0))
+        self.conf["LOG_CATALOG"] = os.path.join(self.base_dir, "catalog.sqlite")
+        first_log_file_info = search_log_file(self.conf)
+        self.assertEqual(first_log_file_info.date, datetime.datetime(2022, 7, 1))
+
+        with open(first_log_file_info.path, "a", encoding=self.encoding) as f:
+            f.write(log_text)
+        with mock.patch("os.scandir", side_effect=AssertionError):
+            self.assertEqual(search_log_file(self.conf), first_log_file_info)
+        with LogCatalog(str(self.conf["LOG_CATALOG"])) as catalog:
+            self.assertEqual(
+                catalog.connection.execute(
+                    "SELECT size FROM log_files WHERE path = ?",
+                    (first_log_file_info.path,),
+                ).fetchone()[0],
+                os.path.getsize(first_log_file_info.path),
+            )
+
+        create_log_file("nginx-access-ui.log-20220702", ".gz", [log_text], self.conf)
+        log_file_info = search_log_file(self.conf)
+        self.assertEqual(log_file_info.date, datetime.datetime(2022, 7, 2))
+        self.assertEqual(log_file_info.ext, ".gz")
+
+        process_log_file(log_file_info, self.conf)
+        with LogCatalog(str(self.conf["LOG_CATALOG"])) as catalog:
+            status = catalog.get_status(log_file_info.path)
+            self.assertEqual(len(catalog.get_log_files(self.log_dir)), 2)
+        assert status is not None
+        self.assertEqual(status["status"], "done")
+        self.assertGreaterEqual(status["duration_seconds"], 0)
+        self.assertEqual(search_log_file(self.conf), first_log_file_info)
+
+        process_log_file(first_log_file_info, self.conf)
+        self.assertRaises(FileExistsError, search_log_file, self.conf)
+
     def test_get_log_data(self) -> None:
         """
         Test getting last log file data.
@@ -305,6 +440,178 @@ class TestLogAnalyzer(TestCase):  # pragma: no cover
         for line, fixt_line in zip(log_file_data, res_fixture):
             self.assertEqual(line, fixt_line)
 
+    def test_get_log_data_bytes(self) -> None:
+        """
+        Test getting undecoded records of plain and gzip log files.
+        :return:
+        """
+        res_fixture = [line.encode() for line in get_str_list_fixture()]
+        for ext, gzip_threaded in (("", True), (".gz", True), (".gz", False)):
+            self.conf["GZIP_THREADED"] = gzip_threaded
+            log_file_info_fixture = generate_log_files(self.conf, self.log_dir, ext)
+            log_file_data = get_log_data_bytes(log_file_info_fixture, self.conf)
+            self.assertEqual(list(log_file_data), res_fixture)
+            for fn in os.listdir(self.log_dir):
+                os.remove(os.path.join(self.log_dir, fn))
+
+    def test_iter_block_lines(self) -> None:
+        """
+        Test splitting lines of the file read by small blocks.
+        :return:
+        """
+        content = b"first line\nsecond\n\nlast without break"
+        lines = list(iter_block_lines(io.BytesIO(content), block_size=4))
+        self.assertEqual(lines, content.splitlines(keepends=True))
+
+    def test_iter_threaded_gzip_blocks(self) -> None:
+        """
+        Test decompression of multi-member gzip data on the background thread.
+        :return:
+        """
+        content = b"".join(f"line {i}\n".encode() for i in range(10000))
+        compressed = gzip.compress(content[:1000]) + gzip.compress(content[1000:])
+        wait_stats: dict = {}
+        blocks = iter_threaded_blocks(
+            iter_gzip_blocks(io.BytesIO(compressed), read_size=512), 2, wait_stats
+        )
+        self.assertEqual(b"".join(blocks), content)
+        self.assertEqual(set(wait_stats), {"producer_wait", "consumer_wait"})
+
+        blocks = iter_threaded_blocks(iter_gzip_blocks(io.BytesIO(compressed[:-10])))
+        self.assertRaises(EOFError, list, blocks)
+
+    def test_parse_log_data_bytes(self) -> None:
+        """
+        Test parsing of bytes lines, bad bytes of url are replaced.
+        :return:
+        """
+        log_text, result_fixture, _ = get_log_file_text_fixture()
+        records = [line.encode() for line in log_text.split("\n")]
+        records.append(
+            b'1.1.1.1 -  - [-] "GET /bad\xff HTTP/1.1" 200 1 "-" "-" "-" "-" "-" 0.5'
+        )
+        result = dict(parse_log_data(iter(records), "test_file_path", self.conf))
+        result_fixture["/bad\ufffd"] = 0.5
+        self.assertEqual(result, result_fixture)
+
+    def test_parse_compressed_log_parallel(self) -> None:
+        """
+        Test parsing of multi-stream compressed logs with the pool of workers,
+        streams aren't aligned with lines.
+        :return:
+        """
+        log_text, _, report_data_fxt = get_log_file_text_fixture()
+        content = log_text.encode()
+        for ext, compress in STREAM_COMPRESSORS:
+            path = os.path.join(self.log_dir, f"nginx-access-ui.log-20220701{ext}")
+            with open(path, "wb") as f:
+                for start, end in ((0, 100), (100, 350), (350, len(content))):
+                    f.write(compress(content[start:end]))
+            log_file_info = search_log_file(self.conf)
+            self.assertEqual(log_file_info.ext, ext)
+            urls_data = parse_compressed_log_parallel(log_file_info, self.conf, 3)
+            self.assertIsNotNone(urls_data)
+            if urls_data is not None:
+                self.assertEqual(
+                    build_report_data(urls_data, self.conf), report_data_fxt
+                )
+            log_file_data = get_log_data_bytes(log_file_info, self.conf)
+            self.assertEqual(b"".join(log_file_data), content)
+            os.remove(path)
+
+        path = os.path.join(self.log_dir, "nginx-access-ui.log-20220701.bz2")
+        with open(path, "wb") as f:
+            f.write(bz2.compress(content))
+        log_file_info = search_log_file(self.conf)
+        self.assertIsNone(parse_compressed_log_parallel(log_file_info, self.conf, 3))
+
+    def test_iter_decompressed_streams(self) -> None:
+        """
+        Test decompression of consecutive streams by chunks, which aren't
+        aligned with streams, and of the truncated last stream.
+        :return:
+        """
+        parts = [b"one\ntwo\n" * 10, b"three\n", b"four\nfive\n" * 5]
+        for ext, compress in STREAM_COMPRESSORS:
+            data = b"".join(compress(part) for part in parts)
+            get_decompressor = CODECS[ext].get_decompressor
+            for chunk_size in (7, len(data)):
+                blocks = iter_decompressed_streams(data, get_decompressor, chunk_size)
+                self.assertEqual(b"".join(blocks), b"".join(parts))
+            with self.assertRaises(EOFError):
+                list(iter_decompressed_streams(data[:-5], get_decompressor, 7))
+
+        codec = CODECS[".bz2"]
+        path = os.path.join(self.log_dir, "nginx-access-ui.log-20220701.bz2")
+        with open(path, "wb"):
+            pass
+        self.assertEqual(get_stream_segments(path, codec, 3), [(0, 0)])
+        with open(path, "wb") as f:
+            f.write(b"garbage" + bz2.compress(parts[0]))
+        self.assertEqual(
+            get_stream_segments(path, codec, 3), [(0, 7 + len(bz2.compress(parts[0])))]
+        )
+
+    def test_parse_log_segment(self) -> None:
+        """
+        Test the segment worker in the process of the test: first and last
+        partial lines of ranges of streams are returned unparsed, the rest
+        lines are aggregated.
+        :return:
+        """
+        log_text, _, report_data_fxt = get_log_file_text_fixture()
+        content = log_text.encode()
+        path = os.path.join(self.log_dir, "nginx-access-ui.log-20220701.bz2")
+        bounds = (0, 500, 900, len(content))
+        streams = [
+            bz2.compress(content[start:end])
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+        with open(path, "wb") as f:
+            f.write(b"".join(streams))
+        offsets = list(accumulate([0] + [len(stream) for stream in streams]))
+        segment_results = [
+            parse_log_segment(LogSegment(path, ".bz2", start, end, self.conf))
+            for start, end in zip(offsets[:-1], offsets[1:])
+        ]
+        for segment_result, start, end in zip(segment_results, bounds[:-1], bounds[1:]):
+            segment_content = content[start:end]
+            head_end = segment_content.index(b"\n") + 1
+            self.assertEqual(segment_result.head, segment_content[:head_end])
+            self.assertEqual(
+                segment_result.tail,
+                segment_content[segment_content.rindex(b"\n") + 1 :],
+            )
+
+        urls_data: dict = {}
+        for segment_result in segment_results:
+            merge_urls_data(urls_data, segment_result.urls_data)
+        joined_lines = [
+            segment_results[0].head,
+            segment_results[0].tail + segment_results[1].head,
+            segment_results[1].tail + segment_results[2].head,
+        ]
+        merge_urls_data(
+            urls_data,
+            aggregate_parsed_data(
+                parse_log_data(iter(joined_lines), path, self.conf), self.conf
+            ),
+        )
+        self.assertEqual(build_report_data(urls_data, self.conf), report_data_fxt)
+
+        with open(path, "wb") as f:
+            f.write(bz2.compress(content[:100]))
+        segment_result = parse_log_segment(
+            LogSegment(path, ".bz2", 0, os.path.getsize(path), self.conf)
+        )
+        self.assertEqual((segment_result.urls_data, segment_result.tail), ({}, None))
+
+        with open(path, "wb") as f:
+            f.write(bz2.compress(content[:500]))
+            f.write(bz2.compress(content[500:])[:-5])
+        log_file_info = search_log_file(self.conf)
+        self.assertIsNone(parse_compressed_log_parallel(log_file_info, self.conf, 3))
+
     def test_get_log_data_no_log_data(self) -> None:
         """
         Test getting log data with no log files.
@@ -336,6 +643,107 @@ class TestLogAnalyzer(TestCase):  # pragma: no cover
         res_gen = parse_log_data(records, "test_file_path", self.conf)
         self.assertRaises(RuntimeError, next, res_gen)
 
+    def test_parse_log_data_fail_fast(self) -> None:
+        """
+        Test aborting of parsing, as soon as the errors limit can't be met.
+        :return:
+        """
+        consumed_lines = []
+
+        def get_records():
+            for i in range(10000):
+                consumed_lines.append(i)
+                yield f"not valid line {i:05}\n"
+
+        self.conf["PARSE_ERROR_MIN_SAMPLE"] = 100
+        data_size = 10000 * len("not valid line 00000\n")
+        res_gen = parse_log_data(get_records(), "test_file_path", self.conf, data_size)
+        self.assertRaises(RuntimeError, next, res_gen)
+        self.assertEqual(len(consumed_lines), 2001)
+
+    def test_parse_log_data_fail_fast_bad_prefix(self) -> None:
+        """
+        Test parsing of the file with the bad prefix and the valid share of errors.
+        :return:
+        """
+        log_text, _, _ = get_log_file_text_fixture()
+        log_lines = [
+            f"{line.strip()}\n" for line in log_text.split("\n") if line.strip()
+        ]
+        lines = [f"bad line {i}\n" for i in range(1000)] + log_lines * 1000
+        self.conf["PARSE_ERROR_MIN_SAMPLE"] = 100
+        data_size = sum(len(line) for line in lines)
+        parsed_data = list(
+            parse_log_data(iter(lines), "test_file_path", self.conf, data_size)
+        )
+        self.assertEqual(len(parsed_data), len(lines) - 1000)
+
+    def test_parse_errors_sampled_logging(self) -> None:
+        """
+        Test logging of the sample of parse errors and errors counters.
+        :return:
+        """
+        records = (f"not valid line {i}\n" for i in range(2500))
+        self.conf.update({"PARSE_ERROR_LOG_FIRST": 3, "PARSE_ERROR_LOG_EVERY": 1000})
+        parse_stats: dict = {}
+        with mock.patch("log_analyzer.logger_adapter") as logger_adapter_mock:
+            parsed_data = list(
+                parse_log_lines(
+                    records, "test_file_path", self.conf, parse_stats, fail_fast=False
+                )
+            )
+        self.assertEqual(parsed_data, [])
+        self.assertEqual(logger_adapter_mock.error.call_count, 5)
+        self.assertIn("#2000", logger_adapter_mock.error.call_args[0][0])
+        self.assertEqual(
+            parse_stats,
+            {
+                "total_lines_cnt": 2500,
+                "errors_cnt": 2500,
+                "bytes_cnt": sum(len(f"not valid line {i}\n") for i in range(2500)),
+                "errors_by_kind": {"no_match": 2500},
+            },
+        )
+
+    def test_compile_log_format(self) -> None:
+        """
+        Test compiling of the custom log format into the line parser.
+        :return:
+        """
+        log_format = '$remote_addr [$time_local] "$request" $status $request_time'
+        pattern = compile_log_format(log_format, ("url", "status", "request_time"))
+        srch_result = pattern.match(
+            '1.2.3.4 [29/Jun/2017:03:50:22 +0300] "GET /api/1?a=b HTTP/1.1" 404 0.5\n'
+        )
+        self.assertIsNotNone(srch_result)
+        if srch_result is not None:
+            self.assertEqual(
+                srch_result.group("url", "status", "request_time"),
+                ("/api/1?a=b", "404", "0.5"),
+            )
+            self.assertNotIn("remote_addr", srch_result.groupdict())
+        self.assertIsNone(pattern.match('1.2.3.4 [-] "-" 404 0.5'))
+        self.assertRaises(ValueError, compile_log_format, log_format, ("user",))
+        pattern = compile_log_format(
+            log_format, ("url",), prefix_groups=(("time_local", "time_bucket", 17),)
+        )
+        srch_result = pattern.match(
+            '1.2.3.4 [29/Jun/2017:03:50:22 +0300] "GET /api/1?a=b HTTP/1.1" 404 0.5\n'
+        )
+        assert srch_result is not None
+        self.assertEqual(srch_result.group("time_bucket"), "29/Jun/2017:03:50")
+
+    def test_parse_log_data_custom_format(self) -> None:
+        """
+        Test parsing log file data with the LOG_FORMAT config.
+        :return:
+        """
+        self.conf["LOG_FORMAT"] = '$request_time "$request"'
+        lines = ['0.25 "GET /a HTTP/1.1"\n', '1.5 "POST /b HTTP/1.0"\n']
+        records = (line for line in lines)
+        result = list(parse_log_data(records, "test_file_path", self.conf))
+        self.assertEqual(result, [("/a", 0.25), ("/b", 1.5)])
+
     def test_prepare_report_data(self) -> None:
         """
         Test preparing report data.
@@ -344,9 +752,1002 @@ class TestLogAnalyzer(TestCase):  # pragma: no cover
         log_text, _, report_data_fxt = get_log_file_text_fixture()
         records = (line for line in log_text.split("\n"))
         parsed_data = parse_log_data(records, "test_file_path", self.conf)
-        report_data = prepare_report_data(parsed_data)
+        report_data = prepare_report_data(parsed_data, self.conf)
         self.assertEqual(report_data, report_data_fxt)
 
+    @unittest.skipUnless(is_numpy_available(), "numpy is not installed")
+    def test_prepare_report_data_numpy(self) -> None:
+        """
+        Test the NumPy aggregation backend gives the same report data.
+        :return:
+        """
+        parsed_data = [
+            (f"/api/{i % 7 * i % 5}", round((i * 37 % 101) / 97, 3))
+            for i in range(1, 200)
+        ]
+        parsed_data.extend(("/api/avg", time) for time in AVG_TIMES)
+        report_data = {}
+        self.conf["REPORT_PERCENTILES"] = "90,95,99.9"
+        for backend in ("python", "numpy"):
+            self.conf["AGGREGATION_BACKEND"] = backend
+            report_data[backend] = prepare_report_data(
+                (el for el in parsed_data), self.conf
+            )
+        self.assertEqual(report_data["numpy"], report_data["python"])
+        self.assertEqual(
+            list(report_data["numpy"][0])[-4:],
+            ["time_med", "time_p90", "time_p95", "time_p99.9"],
+        )
+        self.assertEqual(
+            [
+                list(times)
+                for times in group_times_by_ids([1, 0, 1], [0.1, 0.2, 0.3], 3)
+            ],
+            [[0.2], [0.1, 0.3], []],
+        )
+        series_list = [
+            LatencySeries.from_series([0.3, 0.1, 0.2, 0.4]),
+            LatencySeries.from_series([0.5]),
+        ]
+        self.assertEqual(
+            get_series_stats(series_list, (0.9,)),
+            [get_url_stats(series, (0.9,)) for series in series_list],
+        )
+        self.assertEqual(get_series_stats([]), [])
+
+    def test_prepare_report_data_time_bucket(self) -> None:
+        """
+        Test preparing report data with peak windows of time buckets.
+        :return:
+        """
+        log_line = (
+            '1.196.116.32 -  - [29/Jun/2017:{} +0300] "GET {} HTTP/1.1" 200 927 "-" '
+            '"-" "-" "1498697422-2190034393-4708-9752759" "dc7161be3" {}'
+        )
+        log_lines = [
+            log_line.format("03:50:22", "/api/v2/banner/1", 0.5),
+            log_line.format("03:50:59", "/api/v2/banner/1", 0.25),
+            log_line.format("03:51:01", "/api/v2/banner/1", 1.0),
+            log_line.format("03:51:30", "/api/v2/slot/2", 0.125),
+            log_line.format("04:10:00", "/api/v2/banner/1", 0.5),
+            log_line.format("03:50:30", "/api/v2/banner/1", 0.125),
+        ]
+        self.assertEqual(
+            format_time_bucket(get_time_bucket(b"29/Jun/2017:03", 3600), 3600),
+            "2017-06-29 03:00",
+        )
+        expected_peaks = {
+            "minute": [
+                ("/api/v2/banner/1", "2017-06-29 03:51", 1, 1.0),
+                ("/api/v2/slot/2", "2017-06-29 03:51", 1, 0.125),
+            ],
+            "hour": [
+                ("/api/v2/banner/1", "2017-06-29 03:00", 4, 1.875),
+                ("/api/v2/slot/2", "2017-06-29 03:00", 1, 0.125),
+            ],
+        }
+        for aggregation_mode, backend in (
+            ("exact", "python"),
+            ("exact", "auto"),
+            ("streaming", "auto"),
+        ):
+            for time_bucket, peaks in expected_peaks.items():
+                self.conf["AGGREGATION_MODE"] = aggregation_mode
+                self.conf["AGGREGATION_BACKEND"] = backend
+                self.conf["TIME_BUCKET"] = time_bucket
+                parsed_data = parse_log_data(
+                    (line for line in log_lines), "test_file_path", self.conf
+                )
+                report_data = prepare_report_data(parsed_data, self.conf)
+                self.assertEqual(
+                    [
+                        (
+                            line["url"],
+                            line["peak_window"],
+                            line["peak_count"],
+                            line["peak_time_sum"],
+                        )
+                        for line in report_data
+                    ],
+                    peaks,
+                )
+
+    def test_bucketed_series_merge(self) -> None:
+        """
+        Test stats by buckets and peak windows of merged series
+        and summaries of request times.
+        :return:
+        """
+        self.assertRaises(ValueError, get_time_bucket_size, "second")
+        series_classes: Tuple[type, ...] = (BucketedSeries, BucketedSummary)
+        for series_class in series_classes:
+            series = series_class()
+            self.assertIsNone(series.get_peak_window())
+            other = series_class()
+            for value, bucket in ((0.5, 1), (0.25, 1), (1.0, 2)):
+                series.add(value, bucket)
+            for value, bucket in ((0.75, 1), (0.125, 3)):
+                other.add(value, bucket)
+            self.assertEqual(series.get_peak_window(), (2, 1, 1.0))
+            self.assertIs(series.merge(other), series)
+            self.assertEqual(
+                series.get_bucket_stats(),
+                {1: [3, 1.5], 2: [1, 1.0], 3: [1, 0.125]},
+            )
+            self.assertEqual(series.get_peak_window(), (1, 3, 1.5))
+            series.add(0.5, 3)
+            self.assertEqual(series.get_bucket_stats()[3], [2, 0.625])
+
+    def test_get_log_shards(self) -> None:
+        """
+        Test splitting log file into line-aligned byte ranges.
+        :return:
+        """
+        log_text, _, _ = get_log_file_text_fixture()
+        with open(self.log_file_path, "w", encoding=self.encoding) as f:
+            f.write(log_text)
+        shards = get_log_shards(self.log_file_path, 3)
+        self.assertEqual(shards[0][0], 0)
+        self.assertEqual(shards[-1][1], os.path.getsize(self.log_file_path))
+        with open(self.log_file_path, "rb") as fb:
+            content = fb.read()
+        for start, end in shards:
+            self.assertTrue(start == 0 or content[start - 1 : start] == b"\n")
+            self.assertLess(start, end)
+
+    def test_parse_log_shard(self) -> None:
+        """
+        Test the shard worker in the process of the test: partials of shards
+        are merged into the aggregated data of the whole file, parse errors
+        are counted by shards without the errors limit.
+        :return:
+        """
+        log_text, _, report_data_fxt = get_log_file_text_fixture()
+        with open(self.log_file_path, "w", encoding=self.encoding) as f:
+            f.write(log_text)
+            f.writelines(get_str_list_fixture())
+        urls_data: dict = {}
+        parse_stats: dict = {}
+        shards = get_log_shards(self.log_file_path, 3)
+        self.assertEqual(len(shards), 3)
+        for start, end in shards:
+            shard_result = parse_log_shard(
+                LogShard(self.log_file_path, start, end, self.conf)
+            )
+            merge_urls_data(urls_data, shard_result.urls_data)
+            merge_parse_stats(parse_stats, shard_result.parse_stats)
+            self.assertEqual(shard_result.cubes_data, {})
+        self.assertEqual(build_report_data(urls_data, self.conf), report_data_fxt)
+        with open(self.log_file_path, "rb") as fb:
+            self.assertEqual(parse_stats["total_lines_cnt"], fb.read().count(b"\n"))
+        self.assertGreater(parse_stats["errors_cnt"], 0)
+
+    def test_parse_log_data_parallel(self) -> None:
+        """
+        Test parsing log file with the pool of workers.
+        :return:
+        """
+        log_text, _, report_data_fxt = get_log_file_text_fixture()
+        with open(self.log_file_path, "w", encoding=self.encoding) as f:
+            f.write(log_text)
+        log_file_info = LastLogData(self.log_file_path, None, "")
+        urls_data = parse_log_data_parallel(log_file_info, self.conf, 3)
+        self.assertEqual(build_report_data(urls_data, self.conf), report_data_fxt)
+
+        with open(self.log_file_path, "a", encoding=self.encoding) as f:
+            f.writelines(get_str_list_fixture())
+        self.assertRaises(
+            RuntimeError, parse_log_data_parallel, log_file_info, self.conf, 3
+        )
+
+    def test_parse_log_data_group_by(self) -> None:
+        """
+        Test aggregating GROUP_BY cubes in the same pass as urls.
+        :return:
+        """
+        log_text, _, report_data_fxt = get_log_file_text_fixture()
+        with open(self.log_file_path, "w", encoding=self.encoding) as f:
+            f.write(log_text)
+        self.conf["GROUP_BY"] = "status;$status,http_X_RB_USER"
+        self.conf["GROUP_BY_METRICS"] = "count,time_sum,time_max,time_p50"
+        expected_report_data = {
+            "status": [
+                {
+                    "status": "200",
+                    "count": 5,
+                    "time_sum": 1.572,
+                    "time_max": 0.704,
+                    # estimate of 0.199 within SUMMARY_RELATIVE_ACCURACY
+                    "time_p50": 0.2,
+                }
+            ],
+            "status,http_X_RB_USER": [
+                {"status": "200", "http_X_RB_USER": user, "time_sum": time_sum}
+                for user, time_sum in (
+                    ("2a828197ae235b0b3cb", 0.704),
+                    ("dc7161be3", 0.39),
+                    ("712e90144abee9", 0.199),
+                    ("89f7f1be37d", 0.146),
+                    ("-", 0.133),
+                )
+            ],
+        }
+
+        cubes_data: dict = {}
+        records = (line for line in log_text.split("\n"))
+        parsed_data = parse_log_data(records, "test_file_path", self.conf)
+        urls_data = aggregate_parsed_data(parsed_data, self.conf, cubes_data)
+        self.assertEqual(build_report_data(urls_data, self.conf), report_data_fxt)
+        self.assertIsInstance(cubes_data["status"]["200"], LatencySummary)
+        cubes_report_data = build_cubes_report_data(cubes_data, self.conf)
+        cubes_report_data["status,http_X_RB_USER"] = [
+            {field: line[field] for field in ("status", "http_X_RB_USER", "time_sum")}
+            for line in cubes_report_data["status,http_X_RB_USER"]
+        ]
+        self.assertEqual(cubes_report_data, expected_report_data)
+
+        cubes_data = {}
+        log_file_info = LastLogData(self.log_file_path, None, "")
+        urls_data = parse_log_data_parallel(log_file_info, self.conf, 3, cubes_data)
+        self.assertEqual(build_report_data(urls_data, self.conf), report_data_fxt)
+        self.assertEqual(
+            build_cubes_report_data(cubes_data, self.conf)["status"],
+            expected_report_data["status"],
+        )
+        self.assertRaises(ValueError, parse_metrics, "time_p101")
+
+    def test_parse_log_data_parallel_errors_limit(self) -> None:
+        """
+        Test the errors limit gives the same verdict for sequential and sharded
+        parsing, when the block of errors is at the start of a shard.
+        :return:
+        """
+        log_text, _, _ = get_log_file_text_fixture()
+        log_lines = [
+            f"{line.strip()}\n" for line in log_text.split("\n") if line.strip()
+        ]
+        self.conf["PARSE_ERROR_MIN_SAMPLE"] = 20
+        log_file_info = LastLogData(self.log_file_path, None, "")
+        for bad_lines_cnt, is_valid in ((100, True), (400, False)):
+            with open(self.log_file_path, "w", encoding=self.encoding) as f:
+                f.writelines(log_lines * 100)
+                f.writelines(f"bad line {i}\n" for i in range(bad_lines_cnt))
+                f.writelines(log_lines * 100)
+            verdicts = []
+            for parse in (
+                lambda: list(
+                    parse_log_data(
+                        get_log_data(log_file_info, self.conf),
+                        self.log_file_path,
+                        self.conf,
+                    )
+                ),
+                lambda: parse_log_data_parallel(log_file_info, self.conf, 4),
+            ):
+                try:
+                    parse()
+                except RuntimeError:
+                    verdicts.append(False)
+                else:
+                    verdicts.append(True)
+            self.assertEqual(verdicts, [is_valid, is_valid])
+
+    def test_prepare_report_data_streaming(self) -> None:
+        """
+        Test preparing report data with the streaming summaries.
+        :return:
+        """
+        log_text, _, report_data_fxt = get_log_file_text_fixture()
+        records = (line for line in log_text.split("\n"))
+        self.conf["AGGREGATION_MODE"] = "streaming"
+        parsed_data = parse_log_data(records, "test_file_path", self.conf)
+        report_data = prepare_report_data(parsed_data, self.conf)
+        self.assertEqual(report_data, report_data_fxt)
+
+    def test_space_saving(self) -> None:
+        """
+        Test error guarantees of the Space-Saving heavy hitters.
+        :return:
+        """
+        stream = [(f"/heavy/{i}", 10.0) for i in range(3)] * 20
+        stream += [(f"/light/{i}", 1.0) for i in range(500)]
+        stream.sort(key=lambda el: hash(el[0]) % 7)
+        heavy_hitters = SpaceSaving(10)
+        for key, weight in stream:
+            heavy_hitters.add(key, weight)
+        total_weight = sum(weight for _, weight in stream)
+        self.assertEqual(len(heavy_hitters.estimates), 10)
+        for i in range(3):
+            key = f"/heavy/{i}"
+            self.assertIn(key, heavy_hitters.estimates)
+            self.assertGreaterEqual(heavy_hitters.estimates[key], 200.0)
+            self.assertLessEqual(heavy_hitters.errors[key], total_weight / 10)
+
+    def test_prepare_report_data_heavy_hitters(self) -> None:
+        """
+        Test preparing report data with the bounded amount of tracked urls
+        and the limited report size.
+        :return:
+        """
+        log_text, _, report_data_fxt = get_log_file_text_fixture()
+        records = (line for line in log_text.split("\n"))
+        parsed_data = parse_log_data(records, "test_file_path", self.conf)
+        self.conf["HEAVY_HITTERS"] = 3
+        urls_data = aggregate_parsed_data(parsed_data, self.conf)
+        self.assertEqual(len(urls_data), 4)
+        self.assertIn(EVICTED_URLS_KEY, urls_data)
+        self.conf["REPORT_SIZE"] = 2
+        report_data = build_report_data(urls_data, self.conf)
+        self.assertEqual(
+            [row["url"] for row in report_data],
+            [row["url"] for row in report_data_fxt[:2]],
+        )
+
+    def test_prepare_report_data_heavy_hitters_totals(self) -> None:
+        """
+        Test percentages of heavy hitters are computed of all requests
+        of the stream, also with merged partials of shards.
+        :return:
+        """
+        parsed_data = [(f"/heavy/{i % 3}", 1.0 + i % 3) for i in range(300)]
+        parsed_data += [(f"/light/{i}", 0.01) for i in range(500)]
+        for aggregation_mode in ("exact", "streaming"):
+            self.conf["AGGREGATION_MODE"] = aggregation_mode
+            self.conf["HEAVY_HITTERS"] = 0
+            full_report_data = build_report_data(
+                aggregate_parsed_data(iter(parsed_data), self.conf), self.conf
+            )
+            self.conf["HEAVY_HITTERS"] = 5
+            urls_data = aggregate_parsed_data(iter(parsed_data), self.conf)
+            shards_urls_data: dict = {}
+            for shard_data in (parsed_data[::2], parsed_data[1::2]):
+                merge_urls_data(
+                    shards_urls_data, aggregate_parsed_data(iter(shard_data), self.conf)
+                )
+            for heavy_urls_data in (urls_data, shards_urls_data):
+                report_data = build_report_data(heavy_urls_data, self.conf)
+                self.assertEqual(report_data[:3], full_report_data[:3])
+                self.assertNotIn(EVICTED_URLS_KEY, [row["url"] for row in report_data])
+
+    def test_url_normalizer(self) -> None:
+        """
+        Test normalization of urls into templates.
+        :return:
+        """
+        normalize_url = get_url_normalizer(
+            rules=[(r"/slot/\{id\}/groups", "/slot/{slot}/groups")], cache_size=2
+        )
+        self.assertEqual(normalize_url("/slot/{id}/groups"), "/slot/{slot}/groups")
+        normalize_url = get_url_normalizer()
+        for url, template in (
+            ("/api/v2/banner/25019354", "/api/v2/banner/{id}"),
+            (
+                "/api/1/photogenic_banners/list/?server_name=WIN7RB4",
+                "/api/{id}/photogenic_banners/list/",
+            ),
+            ("/export/6ba7b810-9dad-11d1-80b4-00c04fd430c8.csv", "/export/{uuid}.csv"),
+            ("/static/dc7161be3a/app.js", "/static/{hex}/app.js"),
+            ("/api/v2/banner/deadbeefcafe/info", "/api/v2/banner/deadbeefcafe/info"),
+            ("/api/v2/v1234", "/api/v2/v1234"),
+        ):
+            self.assertEqual(normalize_url(url), template)
+        normalize_url("/api/v2/banner/25019354")
+        self.assertEqual(normalize_url.cache_info().hits, 1)  # type: ignore
+
+    def test_prepare_report_data_url_normalize(self) -> None:
+        """
+        Test preparing report data with normalized urls.
+        :return:
+        """
+        log_text, _, _ = get_log_file_text_fixture()
+        records = (line for line in log_text.split("\n"))
+        self.conf["URL_NORMALIZE"] = True
+        parsed_data = parse_log_data(records, "test_file_path", self.conf)
+        report_data = prepare_report_data(parsed_data, self.conf)
+        self.assertEqual(report_data[0]["url"], "/api/v2/slot/{id}/groups")
+        self.assertEqual(report_data[1]["url"], "/api/v2/banner/{id}")
+        self.assertEqual(report_data[1]["count"], 2)
+        self.assertEqual(report_data[1]["time_max"], 0.39)
+
+    def test_latency_summary(self) -> None:
+        """
+        Test accuracy of the streaming latency summary and its merging.
+        :return:
+        """
+        series = [i / 1000 for i in range(1, 10001)]
+        summary, other_summary = LatencySummary(), LatencySummary()
+        for time in series[::2]:
+            summary.add(time)
+        for time in series[1::2]:
+            other_summary.add(time)
+        summary.merge(other_summary)
+        self.assertEqual(summary.count, len(series))
+        self.assertAlmostEqual(summary.time_sum, sum(series))
+        self.assertEqual(summary.time_max, max(series))
+        for q in (0.1, 0.5, 0.9, 0.99):
+            expected = series[int(q * (len(series) - 1))]
+            self.assertLessEqual(
+                abs(summary.quantile(q) - expected), expected * 0.01 + 1e-9
+            )
+        self.assertRaises(ValueError, LatencySummary().quantile, 0.5)
+        self.assertRaises(ValueError, summary.merge, LatencySummary(0.05))
+        self.assertEqual(LatencySummary.from_series([0.0, 0.0, 0.5]).median(), 0.0)
+
+        with mock.patch("utils.latency_summary.MAX_BUCKETS", 4):
+            wide_summary = LatencySummary.from_series([2**i for i in range(8)])
+            self.assertEqual(len(wide_summary.buckets), 4)
+            wide_summary.merge(LatencySummary.from_series([0.5, 0.25, 0.125]))
+            self.assertEqual(len(wide_summary.buckets), 4)
+        self.assertEqual(wide_summary.count, 11)
+        self.assertEqual(wide_summary.time_min, 0.125)
+        self.assertLessEqual(abs(wide_summary.quantile(1.0) - 128), 128 * 0.01)
+        self.assertLessEqual(abs(wide_summary.quantile(0.9) - 64), 64 * 0.01)
+
+    def test_latency_series(self) -> None:
+        """
+        Test the exact latency series and its merging.
+        :return:
+        """
+        series = LatencySeries.from_series([0.3, 0.1])
+        other_series = LatencySeries()
+        other_series.add(0.2)
+        series.merge(other_series)
+        self.assertEqual(series.times.typecode, "d")
+        self.assertEqual(list(series.times), [0.3, 0.1, 0.2])
+        self.assertEqual(series.count, 3)
+        self.assertAlmostEqual(series.time_sum, 0.6)
+        self.assertEqual(series.time_max, 0.3)
+        self.assertEqual(series.median(), 0.2)
+        self.assertEqual(series.quantiles((0.5, 0.0, 1.0)), [0.2, 0.1, 0.3])
+        self.assertAlmostEqual(series.quantile(0.75), 0.25)
+        self.assertEqual(
+            LatencySeries.from_series(AVG_TIMES).mean(), statistics.mean(AVG_TIMES)
+        )
+        self.assertEqual(
+            LatencySeries.from_series([float("inf"), 0.1]).mean(), float("inf")
+        )
+        report_data = prepare_report_data(
+            (("/api/avg", time) for time in AVG_TIMES), self.conf
+        )
+        self.assertEqual(report_data[0]["time_avg"], 0.517)
+
+    def test_create_report_file_sidecar(self) -> None:
+        """
+        Test creating of the lazy report with the gzip json sidecar.
+        :return:
+        """
+        _, _, report_data_fxt = get_log_file_text_fixture()
+        self.conf.update({"REPORT_OUTPUT": "sidecar", "REPORT_DATA_GZIP": True})
+        report_path = os.path.join(self.rep_dir, "report-2017.06.30.html")
+        create_report_file(
+            report_data_fxt, datetime.datetime.now(), self.conf, report_path
+        )
+
+        with open(report_path, encoding=self.encoding) as f:
+            report_text = f.read()
+        self.assertIn('var dataUrl = "report-2017.06.30.json.gz";', report_text)
+        self.assertNotIn("/api/v2/banner/25019354", report_text)
+        with gzip.open(
+            os.path.join(self.rep_dir, "report-2017.06.30.json.gz"), "rt"
+        ) as f:
+            report_json = json.load(f)
+        columns = report_json["columns"]
+        self.assertEqual(
+            [dict(zip(columns, row)) for row in report_json["rows"]], report_data_fxt
+        )
+        self.assertEqual(set(report_json["orders"]), set(columns))
+        self.assertEqual(report_json["orders"]["time_sum"], [4, 3, 2, 1, 0])
+        self.assertEqual(report_json["orders"]["url"], [4, 2, 1, 3, 0])
+
+    def test_backfill_reports(self) -> None:
+        """
+        Test creating reports for all log files without them.
+        :return:
+        """
+        log_text, _, _ = get_log_file_text_fixture()
+        for fn, ext, multiplier in (
+            ("nginx-access-ui.log-20220701", "", 1),
+            ("nginx-access-ui.log-20220702", ".gz", 3),
+            ("nginx-access-ui.log-20220703", "", 2),
+            ("nginx-access-ui.log-20220704", "", 1),
+        ):
+            create_log_file(fn, ext, [log_text * multiplier], self.conf)
+        generate_report(
+            self.conf, self.encoding, LastLogData("", datetime.datetime(2022, 7, 4), "")
+        )
+
+        log_files_info = search_unreported_log_files(self.conf)
+        self.assertEqual(
+            [os.path.basename(log_file_info.path) for log_file_info in log_files_info],
+            [
+                "nginx-access-ui.log-20220702.gz",
+                "nginx-access-ui.log-20220703",
+                "nginx-access-ui.log-20220701",
+            ],
+        )
+
+        self.conf["WORKERS"] = 2
+        backfill_reports(self.conf)
+        self.assertEqual(
+            sorted(os.listdir(self.rep_dir)),
+            [
+                "report-2022.07.01.html",
+                "report-2022.07.02.html",
+                "report-2022.07.03.html",
+                "report-2022.07.04.html",
+            ],
+        )
+        self.assertRaises(FileExistsError, backfill_reports, self.conf)
+
+    def test_aggregate_cache(self) -> None:
+        """
+        Test the report is rebuilt from the aggregated data cache without parsing.
+        :return:
+        """
+        log_text, _, report_data_fxt = get_log_file_text_fixture()
+        create_log_file("nginx-access-ui.log-20220701", "", [log_text], self.conf)
+        log_file_info = search_log_file(self.conf)
+        self.conf["AGGREGATE_CACHE"] = True
+        process_log_file(log_file_info, self.conf)
+        self.assertTrue(os.path.isfile(get_cache_path(log_file_info.date, self.conf)))
+
+        os.remove(get_report_path(log_file_info.date, self.conf))
+        with mock.patch(
+            "log_analyzer.parse_log_data", side_effect=AssertionError
+        ), mock.patch("log_analyzer.create_report_file") as create_report_mock:
+            process_log_file(log_file_info, self.conf)
+        self.assertEqual(create_report_mock.call_args[0][0], report_data_fxt)
+
+        with open(log_file_info.path, "a", encoding=self.encoding) as f:
+            f.write(log_text)
+        with mock.patch("log_analyzer.create_report_file") as create_report_mock:
+            process_log_file(log_file_info, self.conf)
+        self.assertEqual(create_report_mock.call_args[0][0][0]["count"], 2)
+
+    def test_columns_cache(self) -> None:
+        """
+        Test the report is rebuilt from the columnar cache of parsed lines
+        without parsing and the cache is ignored after the log is changed.
+        :return:
+        """
+        log_text, _, report_data_fxt = get_log_file_text_fixture()
+        create_log_file("nginx-access-ui.log-20220701", "", [log_text], self.conf)
+        log_file_info = search_log_file(self.conf)
+        self.conf["COLUMNS_CACHE"] = True
+        process_log_file(log_file_info, self.conf)
+        cache_path = get_columns_cache_path(log_file_info.date, self.conf)
+        columns = load_columns_cache(cache_path)
+        assert columns is not None
+        self.assertEqual(
+            len(columns.url_ids), sum(row["count"] for row in report_data_fxt)
+        )
+
+        os.remove(get_report_path(log_file_info.date, self.conf))
+        with mock.patch(
+            "log_analyzer.parse_log_data", side_effect=AssertionError
+        ), mock.patch("log_analyzer.create_report_file") as create_report_mock:
+            process_log_file(log_file_info, self.conf)
+        self.assertEqual(create_report_mock.call_args[0][0], report_data_fxt)
+
+        with open(log_file_info.path, "a", encoding=self.encoding) as f:
+            f.write(log_text)
+        with mock.patch("log_analyzer.create_report_file") as create_report_mock:
+            process_log_file(log_file_info, self.conf)
+        self.assertEqual(create_report_mock.call_args[0][0][0]["count"], 2)
+
+        self.conf["AGGREGATION_MODE"] = "streaming"
+        with mock.patch(
+            "log_analyzer.parse_log_data", side_effect=AssertionError
+        ), mock.patch("log_analyzer.create_report_file") as create_report_mock:
+            process_log_file(log_file_info, self.conf)
+        self.assertEqual(create_report_mock.call_args[0][0][0]["count"], 2)
+
+        with open(cache_path, "r+b") as f:
+            f.truncate(os.path.getsize(cache_path) - 8)
+        self.assertIsNone(load_columns_cache(cache_path))
+        for content in (b"LACOLS", b"not a columns cache"):
+            with open(cache_path, "wb") as f:
+                f.write(content)
+            self.assertIsNone(load_columns_cache(cache_path))
+
+    def test_columns_cache_report(self) -> None:
+        """
+        Test the report rebuilt from the columnar cache is the same as the report
+        of the parsed log.
+        :return:
+        """
+        log_line = (
+            '1.196.116.32 -  - [29/Jun/2017:03:50:22 +0300] "GET /api/{} HTTP/1.1" '
+            '200 927 "-" "-" "-" "-" "-" {:.3f}\n'
+        )
+        log_text = "".join(
+            log_line.format(i % 7, (i * 7919 % 10007) / 1000) for i in range(5000)
+        )
+        create_log_file("nginx-access-ui.log-20220701", "", [log_text], self.conf)
+        log_file_info = search_log_file(self.conf)
+        self.conf["COLUMNS_CACHE"] = True
+        with mock.patch("log_analyzer.create_report_file") as create_report_mock:
+            process_log_file(log_file_info, self.conf)
+        report_data = create_report_mock.call_args[0][0]
+        self.assertEqual(len(report_data), 7)
+        with mock.patch(
+            "log_analyzer.parse_log_data", side_effect=AssertionError
+        ), mock.patch("log_analyzer.create_report_file") as create_report_mock:
+            process_log_file(log_file_info, self.conf)
+        self.assertEqual(create_report_mock.call_args[0][0], report_data)
+
+    def test_create_rollup_report(self) -> None:
+        """
+        Test creating the report for several days from cached and parsed days.
+        :return:
+        """
+        log_text, _, _ = get_log_file_text_fixture()
+        for day in range(1, 4):
+            create_log_file(
+                f"nginx-access-ui.log-2022070{day}", "", [log_text], self.conf
+            )
+        self.conf["AGGREGATE_CACHE"] = True
+        process_log_file(search_log_file(self.conf), self.conf)
+        with mock.patch("log_analyzer.create_report_file") as create_report_mock:
+            create_rollup_report(self.conf, 7)
+        report_data = create_report_mock.call_args[0][0]
+        self.assertEqual(report_data[0]["url"], "/api/v2/slot/4705/groups")
+        self.assertEqual(report_data[0]["count"], 3)
+        self.assertEqual(report_data[0]["time_sum"], 2.112)
+        self.assertEqual(report_data[0]["time_med"], 0.704)
+        for day in range(1, 4):
+            report_date = datetime.datetime(2022, 7, day)
+            self.assertTrue(os.path.isfile(get_cache_path(report_date, self.conf)))
+
+        # caches of another accuracy are stale: days with logs are parsed
+        # again, the day with the cache only is skipped
+        create_log_file("nginx-access-ui.log-20220704", "", [log_text], self.conf)
+        shutil.copy(
+            get_cache_path(datetime.datetime(2022, 7, 1), self.conf),
+            get_cache_path(datetime.datetime(2022, 6, 30), self.conf),
+        )
+        self.conf["SUMMARY_RELATIVE_ACCURACY"] = 0.05
+        with mock.patch("log_analyzer.create_report_file") as create_report_mock:
+            create_rollup_report(self.conf, 7)
+        report_data = create_report_mock.call_args[0][0]
+        self.assertEqual(report_data[0]["count"], 4)
+        self.assertEqual(report_data[0]["time_sum"], 2.816)
+        for day in range(1, 5):
+            urls_summaries = load_aggregate_cache(
+                get_cache_path(datetime.datetime(2022, 7, day), self.conf),
+                relative_accuracy=0.05,
+            )
+            self.assertIsNotNone(urls_summaries)
+        self.assertIsNone(
+            load_aggregate_cache(
+                get_cache_path(datetime.datetime(2022, 6, 30), self.conf),
+                relative_accuracy=0.05,
+            )
+        )
+
+    def test_report_service(self) -> None:
+        """
+        Test the report service: coalescing of computations, ETags, json slices,
+        errors, health and metrics endpoints and the HTTP round trip.
+        :return:
+        """
+        log_text, _, report_data_fxt = get_log_file_text_fixture()
+        create_log_file("nginx-access-ui.log-20220701", "", [log_text], self.conf)
+        executor = ThreadPoolExecutor(2)
+        self.addCleanup(executor.shutdown)
+        service = ReportService(
+            partial(compute_report_data, conf=self.conf),
+            partial(render_report, conf=self.conf),
+            executor,
+        )
+
+        async def request_http(port: int, target: str) -> bytes:
+            """
+            Return the raw HTTP response of the service.
+            :param port: port of the service
+            :param target: request target
+            :return: response bytes.
+            """
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {target} HTTP/1.1\r\nConnection: close\r\n\r\n".encode())
+            response = await reader.read()
+            writer.close()
+            return response
+
+        async def run_requests() -> list:
+            """
+            Return responses of the service to the test requests.
+            :return: list of responses.
+            """
+            slices = await asyncio.gather(
+                *[
+                    service.handle(
+                        "GET", "/reports/2022.07.01/data?sort=url&limit=2", {}
+                    )
+                    for _ in range(3)
+                ]
+            )
+            self.assertEqual(service.counters["computations"], 1)
+            page = await service.handle("GET", "/reports/2022.07.01", {})
+            not_modified = await service.handle(
+                "GET", "/reports/2022.07.01", {"if-none-match": page.headers["ETag"]}
+            )
+            errors = [
+                await service.handle("GET", target, {})
+                for target in (
+                    "/reports/2022.07.02",
+                    "/reports/2022.07.01/data?sort=foo",
+                    "/foo",
+                )
+            ]
+            server = await asyncio.start_server(
+                service.handle_connection, "127.0.0.1", 0
+            )
+            port = server.sockets[0].getsockname()[1]
+            health = await request_http(port, "/health")
+            server.close()
+            await server.wait_closed()
+            metrics = await service.handle("GET", "/metrics", {})
+            return [slices, page, not_modified, errors, health, metrics]
+
+        slices, page, not_modified, errors, health, metrics = asyncio.run(
+            run_requests()
+        )
+        expected_slice = sorted(report_data_fxt, key=lambda row: row["url"])[::-1][:2]
+        for response in slices:
+            self.assertEqual(response.status, 200)
+            self.assertEqual(json.loads(response.body), expected_slice)
+        self.assertEqual(page.status, 200)
+        self.assertIn(json.dumps(report_data_fxt).encode(), page.body)
+        self.assertEqual((not_modified.status, not_modified.body), (304, b""))
+        self.assertEqual([response.status for response in errors], [404, 400, 404])
+        self.assertTrue(health.startswith(b"HTTP/1.1 200 OK\r\n"))
+        self.assertIn(b'"status": "ok"', health)
+        self.assertIn(b"log_analyzer_service_requests_total 10", metrics.body)
+
+    def test_report_service_sort_columns(self) -> None:
+        """
+        Test that json slices are sortable by all columns of report lines,
+        including columns of percentiles and peak windows.
+        :return:
+        """
+        report_data = [
+            {"url": "/a", "time_p99": 0.5, "peak_time_sum": 2.0},
+            {"url": "/b", "time_p99": 1.5, "peak_time_sum": 1.0},
+        ]
+        executor = ThreadPoolExecutor(1)
+        self.addCleanup(executor.shutdown)
+        service = ReportService(
+            lambda report_date: report_data,
+            partial(render_report, conf=self.conf),
+            executor,
+        )
+
+        async def run_requests() -> list:
+            """
+            Return responses of the service to the test requests.
+            :return: list of responses.
+            """
+            return [
+                await service.handle("GET", f"/reports/2022.07.01/data?{query}", {})
+                for query in (
+                    "sort=time_p99",
+                    "sort=peak_time_sum",
+                    "sort=time_med",
+                )
+            ]
+
+        by_percentile, by_peak, unknown = asyncio.run(run_requests())
+        self.assertEqual(
+            [row["url"] for row in json.loads(by_percentile.body)], ["/b", "/a"]
+        )
+        self.assertEqual([row["url"] for row in json.loads(by_peak.body)], ["/a", "/b"])
+        self.assertEqual(unknown.status, 400)
+
+        cache = LRUCache(10)
+        cache.put("a", "a", 6)
+        cache.put("b", "b", 4)
+        cache.get("a")
+        cache.put("c", "c", 3)
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.size), ("a", None, 9))
+
+    def test_report_service_errors(self) -> None:
+        """
+        Test responses of the report service to invalid requests, errors
+        of handlers and closed connections.
+        :return:
+        """
+        executor = ThreadPoolExecutor(1)
+        self.addCleanup(executor.shutdown)
+        service = ReportService(
+            lambda report_date: [{"url": "/a", "count": 1}],
+            partial(render_report, conf=self.conf),
+            executor,
+        )
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+
+        async def request_raw(data: bytes) -> bytes:
+            """
+            Return the raw HTTP responses of the service to the sent data.
+            :param data: data sent to the service
+            :return: responses bytes.
+            """
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(data)
+            writer.write_eof()
+            response = await reader.read()
+            writer.close()
+            return response
+
+        async def run_requests() -> list:
+            """
+            Return responses of the service to the test requests.
+            :return: list of responses.
+            """
+            responses: list = [
+                (await service.handle(method, target, {})).status
+                for method, target in (
+                    ("POST", "/reports/2022.07.01"),
+                    ("GET", "/reports/2022.07.01/foo"),
+                    ("GET", "/reports/2022.07.32"),
+                    ("GET", "/reports/2022.07.01/data?order=up"),
+                )
+            ]
+            server_task = asyncio.ensure_future(service.serve("127.0.0.1", port))
+            for _ in range(100):
+                try:
+                    await request_raw(b"")
+                    break
+                except ConnectionError:
+                    await asyncio.sleep(0.01)
+            responses.append(
+                await request_raw(b"HEAD /health HTTP/1.1\r\n\r\nBAD\r\n\r\n")
+            )
+            responses.append(await request_raw(b"GET /" + b"a" * 9000 + b"\r\n"))
+            with mock.patch.object(service, "handle", side_effect=RuntimeError):
+                responses.append(await request_raw(b"GET /health HTTP/1.0\r\n\r\n"))
+            server_task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await server_task
+            return responses
+
+        *statuses, head_and_bad, too_long, error = asyncio.run(run_requests())
+        self.assertEqual(statuses, [405, 404, 400, 400])
+        head, bad = head_and_bad.split(b"\r\n\r\n", 1)
+        self.assertTrue(head.startswith(b"HTTP/1.1 200 OK\r\n"))
+        self.assertIn(b"Connection: keep-alive", head)
+        self.assertTrue(bad.startswith(b"HTTP/1.1 400 "))
+        self.assertEqual(too_long, b"")
+        self.assertTrue(error.startswith(b"HTTP/1.1 500 "))
+
+        cache = LRUCache(10)
+        cache.put("a", "a", 6)
+        cache.put("a", "aa", 8)
+        cache.put("b", "b", 11)
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.size), ("aa", None, 8))
+
+    def test_log_follower(self) -> None:
+        """
+        Test reading of appended lines with rotation and truncation of the log.
+        :return:
+        """
+        with open(self.log_file_path, "wb") as f:
+            f.write(b"one\ntwo\nthr")
+        follower = LogFollower(self.log_file_path)
+        self.assertEqual(list(follower.read_new_lines()), [b"one\n", b"two\n"])
+        with open(self.log_file_path, "ab") as f:
+            f.write(b"ee\n")
+        self.assertEqual(list(follower.read_new_lines()), [b"three\n"])
+
+        checkpoint = follower.get_checkpoint()
+        follower.close()
+        follower = LogFollower(
+            self.log_file_path, checkpoint["inode"], checkpoint["offset"]
+        )
+        with open(self.log_file_path, "ab") as f:
+            f.write(b"four\n")
+        self.assertEqual(list(follower.read_new_lines()), [b"four\n"])
+        with open(self.log_file_path, "ab") as f:
+            f.write(b"four\n")
+        os.rename(self.log_file_path, f"{self.log_file_path}-rotated")
+        with open(self.log_file_path, "wb") as f:
+            f.write(b"five\n")
+        self.assertEqual(list(follower.read_new_lines()), [b"four\n", b"five\n"])
+
+        with open(self.log_file_path, "wb") as f:
+            f.write(b"six\n")
+        self.assertEqual(list(follower.read_new_lines()), [b"six\n"])
+        follower.close()
+
+    def test_log_follower_restart_rotation(self) -> None:
+        """
+        Test resuming from the checkpoint after the rotation of the log,
+        the rest of the rotated file is read before the new file.
+        :return:
+        """
+        with open(self.log_file_path, "wb") as f:
+            f.write(b"one\ntwo\n")
+        follower = LogFollower(self.log_file_path)
+        self.assertEqual(list(follower.read_new_lines()), [b"one\n", b"two\n"])
+        checkpoint = follower.get_checkpoint()
+        follower.close()
+
+        with open(self.log_file_path, "ab") as f:
+            f.write(b"three\n")
+        os.rename(self.log_file_path, f"{self.log_file_path}.1")
+        with open(self.log_file_path, "wb") as f:
+            f.write(b"four\n")
+        follower = LogFollower(
+            self.log_file_path, checkpoint["inode"], checkpoint["offset"]
+        )
+        self.assertEqual(list(follower.read_new_lines()), [b"three\n", b"four\n"])
+        self.assertEqual(
+            follower.get_checkpoint()["inode"], os.stat(self.log_file_path).st_ino
+        )
+        checkpoint = follower.get_checkpoint()
+        follower.close()
+
+        os.rename(self.log_file_path, f"{self.log_file_path}.2")
+        with open(self.log_file_path, "wb") as f:
+            f.write(b"five\n")
+        os.remove(f"{self.log_file_path}.2")
+        follower = LogFollower(
+            self.log_file_path, checkpoint["inode"], checkpoint["offset"]
+        )
+        self.assertEqual(list(follower.read_new_lines()), [b"five\n"])
+        follower.close()
+
+    def test_log_follower_missing_log(self) -> None:
+        """
+        Test following of the log, which is missing or rotated
+        without the new file yet.
+        :return:
+        """
+        follower = LogFollower(self.log_file_path)
+        self.assertEqual(list(follower.read_new_lines()), [])
+        self.assertIsNone(follower.get_checkpoint()["inode"])
+
+        with open(self.log_file_path, "wb") as f:
+            f.write(b"one\n")
+        self.assertEqual(list(follower.read_new_lines()), [b"one\n"])
+        with open(self.log_file_path, "ab") as f:
+            f.write(b"two\n")
+        os.rename(self.log_file_path, f"{self.log_file_path}.1")
+        self.assertEqual(list(follower.read_new_lines()), [b"two\n"])
+        checkpoint = follower.get_checkpoint()
+        follower.close()
+
+        with open(f"{self.log_file_path}.1", "ab") as f:
+            f.write(b"three\n")
+        follower = LogFollower(
+            self.log_file_path, checkpoint["inode"], checkpoint["offset"]
+        )
+        self.assertEqual(list(follower.read_new_lines()), [b"three\n"])
+        follower.close()
+
+    def test_follow_log(self) -> None:
+        """
+        Test following of the live log with the resuming from the checkpoint.
+        :return:
+        """
+        log_text, _, _ = get_log_file_text_fixture()
+        self.conf["FOLLOW_LOG_PATH"] = self.log_file_path
+        self.conf["FOLLOW_ITERATIONS"] = 1
+        with open(self.log_file_path, "w", encoding=self.encoding) as f:
+            f.write(log_text)
+        follow_log(self.conf)
+        with open(self.log_file_path, "a", encoding=self.encoding) as f:
+            f.write(log_text)
+        with mock.patch("log_analyzer.create_report_file") as create_report_mock:
+            follow_log(self.conf)
+        report_data = create_report_mock.call_args[0][0]
+        self.assertEqual(report_data[0]["url"], "/api/v2/slot/4705/groups")
+        self.assertEqual(report_data[0]["count"], 2)
+        report_date = datetime.datetime.combine(datetime.date.today(), datetime.time())
+        self.assertTrue(os.path.isfile(get_live_report_path(report_date, self.conf)))
+
     def test_main(self) -> None:
         """
         Test main method of the Log Analyzer.
@@ -368,12 +1769,256 @@ class TestLogAnalyzer(TestCase):  # pragma: no cover
                         rep_filenames.append(name)
             self.assertEqual(len(rep_filenames), 1)
 
+    def test_main_metrics(self) -> None:
+        """
+        Test saving of the run metrics into the json history
+        and the Prometheus textfile.
+        :return:
+        """
+        log_text, _, _ = get_log_file_text_fixture()
+        create_log_file("nginx-access-ui.log-20170630", ".gz", [log_text], self.conf)
+        prometheus_path = os.path.join(self.base_dir, "log_analyzer.prom")
+        self.conf.update(
+            {
+                "METRICS": True,
+                "METRICS_HISTORY_SIZE": 2,
+                "METRICS_PROMETHEUS_PATH": prometheus_path,
+            }
+        )
+        with mock.patch(
+            "argparse.ArgumentParser.parse_args",
+            return_value=argparse.Namespace(conf=self.config_file_path),
+        ):
+            log_analyzer_main(self.conf)
+            with open(prometheus_path) as f:
+                prometheus_text = f.read()
+            with open(os.path.join(self.rep_dir, "metrics.json")) as f:
+                first_run = json.load(f)["last"]
+            for _ in range(2):
+                log_analyzer_main(self.conf)
+
+        self.assertTrue(first_run["success"])
+        self.assertEqual(
+            set(first_run["stages"]),
+            {"total", "search", "parse", "report_data", "report_file"},
+        )
+        self.assertEqual(first_run["counters"]["lines_read"], 6)
+        self.assertEqual(first_run["counters"]["lines_parsed"], 5)
+        self.assertEqual(first_run["counters"]["parse_errors"], 1)
+        self.assertEqual(first_run["counters"]["distinct_urls"], 5)
+        self.assertEqual(
+            first_run["counters"]["bytes_read_uncompressed"], len(log_text)
+        )
+        self.assertGreater(first_run["peak_rss_bytes"], 0)
+        with open(os.path.join(self.rep_dir, "metrics.json")) as f:
+            metrics = json.load(f)
+        self.assertEqual(len(metrics["history"]), 2)
+        self.assertEqual(metrics["history"][1], metrics["last"])
+        self.assertEqual(set(metrics["last"]["stages"]), {"total", "search"})
+
+        self.assertIn("# TYPE log_analyzer_stage_wall_seconds gauge", prometheus_text)
+        self.assertIn(
+            'log_analyzer_stage_cpu_seconds{stage="search"} ', prometheus_text
+        )
+        self.assertIn("log_analyzer_last_run_success 1\n", prometheus_text)
+
+    def test_main_profile(self) -> None:
+        """
+        Test profiling of stages of the first lines and of the whole pipeline.
+        :return:
+        """
+        log_text, _, _ = get_log_file_text_fixture()
+        create_log_file("nginx-access-ui.log-20170630", "", [log_text], self.conf)
+        profile_dir = os.path.join(self.base_dir, "profile")
+        self.conf.update(
+            {
+                "PROFILE": "stages",
+                "PROFILE_FORMAT": "callgrind",
+                "PROFILE_DIR": profile_dir,
+                "PROFILE_LINES": 3,
+                "TRACE_MALLOC": 5,
+            }
+        )
+        with mock.patch(
+            "argparse.ArgumentParser.parse_args",
+            return_value=argparse.Namespace(conf=self.config_file_path),
+        ):
+            log_analyzer_main(self.conf)
+            self.assertEqual(os.listdir(self.rep_dir), [])
+            self.assertEqual(
+                set(os.listdir(profile_dir)),
+                {
+                    f"{prefix}{stage}{ext}"
+                    for stage in ("search", "parse", "report_data")
+                    for prefix, ext in (
+                        ("callgrind.out.", ""),
+                        ("tracemalloc-", ".txt"),
+                    )
+                }
+                | {"tracemalloc-total.txt"},
+            )
+            with open(os.path.join(profile_dir, "callgrind.out.parse")) as f:
+                self.assertIn("fn=parse_log_lines:", f.read())
+            with open(os.path.join(profile_dir, "tracemalloc-parse.txt")) as f:
+                self.assertTrue(f.readline().startswith("Stage parse: traced memory"))
+
+            self.conf.update({"PROFILE": "pipeline", "PROFILE_FORMAT": "pstats"})
+            self.conf.update({"PROFILE_LINES": 0, "TRACE_MALLOC": 0})
+            log_analyzer_main(self.conf)
+        self.assertTrue(
+            os.path.isfile(get_report_path(datetime.datetime(2017, 6, 30), self.conf))
+        )
+        stats = pstats.Stats(os.path.join(profile_dir, "profile-total.pstats"))
+        self.assertTrue(
+            any(func[2] == "create_report_file" for func in stats.stats)  # type: ignore
+        )
+
+    def test_create_logs_fast(self) -> None:
+        """
+        Test deterministic generation of log files by the fast generator.
+        :return:
+        """
+        files_data = []
+        for _ in range(2):
+            for fn in os.listdir(self.log_dir):
+                os.remove(os.path.join(self.log_dir, fn))
+            create_logs_fast(self.conf, 3, 25000, seed=7, workers=2)
+            files_data.append(
+                {
+                    fn: open(os.path.join(self.log_dir, fn), "rb").read()
+                    for fn in os.listdir(self.log_dir)
+                }
+            )
+        self.assertEqual(len(files_data[0]), 3)
+        self.assertEqual(files_data[0], files_data[1])
+
+        log_file_info = search_log_file(self.conf)
+        lines = list(get_log_data_bytes(log_file_info, self.conf))
+        self.assertEqual(len(lines), 25000)
+        timestamps = [
+            datetime.datetime.strptime(
+                line.split(b"[")[1].split(b"]")[0].decode(), "%d/%b/%Y:%H:%M:%S %z"
+            )
+            for line in lines
+        ]
+        self.assertEqual(timestamps, sorted(timestamps))
+        parsed_data = list(parse_log_data(lines, log_file_info.path, self.conf))
+        self.assertEqual(len(parsed_data), 25000)
+        urls_cnt: dict = {}
+        for url, _ in parsed_data:
+            urls_cnt[url] = urls_cnt.get(url, 0) + 1
+        self.assertGreater(max(urls_cnt.values()), 25000 / len(urls_cnt) * 10)
+
+    def test_benchmarks(self) -> None:
+        """
+        Test benchmarks of stages on the generated dataset
+        and the comparison with the baseline.
+        :return:
+        """
+        self.conf["BENCHMARK_DIR"] = os.path.join(self.base_dir, "benchmarks")
+        dataset = get_dataset(2000, 1, self.conf)
+        self.assertEqual(get_dataset(2000, 1, self.conf), dataset)
+        with open(os.path.join(dataset.log_dir, os.listdir(dataset.log_dir)[0])) as f:
+            self.assertIsNotNone(
+                re.search(r'"GET /api/v2/\w+/\d+ HTTP/1.1" \d+', f.read())
+            )
+
+        results = {
+            "2000": benchmark_dataset(
+                import_log_analyzer(self.config_file_path), dataset, self.conf
+            )
+        }
+        self.assertEqual(tuple(results["2000"]), STAGES)
+        self.assertAlmostEqual(
+            sum(result["share"] for result in results["2000"].values()), 1, places=2
+        )
+        self.assertIsNone(results["2000"]["search_log_file"]["lines_per_sec"])
+        self.assertGreater(results["2000"]["get_log_data"]["peak_memory"], 0)
+
+        baseline = json.loads(json.dumps(results))
+        self.assertEqual(compare_results(results, baseline, 0.1), [])
+        baseline["2000"]["get_log_data_gz"]["seconds"] /= 10
+        regressions = compare_results(results, baseline, 0.1)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("get_log_data_gz on 2000 lines"))
+
+    def test_benchmarks_main(self) -> None:
+        """
+        Test main method of the benchmarks: the table of results, saving
+        of the baseline and the exit on regressions against it.
+        :return:
+        """
+        baseline_path = os.path.join(self.base_dir, "baseline.json")
+        init_config = {
+            "BENCHMARK_DIR": os.path.join(self.base_dir, "benchmarks"),
+            "DATA_ENCODING": "UTF-8",
+        }
+        params = argparse.Namespace(
+            sizes=[500],
+            seed=1,
+            repeat=1,
+            no_memory=True,
+            baseline=None,
+            save_baseline=baseline_path,
+            tolerance=0.1,
+            conf=self.config_file_path,
+        )
+        stdout = io.StringIO()
+        with mock.patch(
+            "argparse.ArgumentParser.parse_args", return_value=params
+        ), mock.patch("sys.stdout", stdout):
+            benchmarks_main(dict(init_config))
+        rows = stdout.getvalue().splitlines()
+        self.assertEqual(rows[0].split()[:3], ["lines", "stage", "seconds"])
+        self.assertEqual([row.split()[1] for row in rows[1:]], list(STAGES))
+        self.assertTrue(all(row.split()[-1] == "-" for row in rows[1:]))
+        with open(baseline_path, encoding="UTF-8") as f:
+            self.assertEqual(tuple(json.load(f)["500"]), STAGES)
+
+        params.baseline, params.save_baseline, params.tolerance = (
+            baseline_path,
+            None,
+            -1,
+        )
+        stdout = io.StringIO()
+        with mock.patch(
+            "argparse.ArgumentParser.parse_args", return_value=params
+        ), mock.patch("sys.stdout", stdout), self.assertRaises(SystemExit):
+            benchmarks_main(dict(init_config))
+        self.assertIn("Regressions:", stdout.getvalue())
+        self.assertRegex(stdout.getvalue(), r"\n +500 +search_log_file .* \d+\.\d\dx\n")
+
     def test_get_logger_adapter(self):
         """TODO"""
         logger_adapter = get_logger_adapter(__name__, {})
         self.assertIsInstance(logger_adapter, logging.LoggerAdapter)
         self.assertEqual(logger_adapter.extra, get_extra_data())
 
+    def test_set_queue_logging(self) -> None:
+        """
+        Test writing of log records by the queue listener thread.
+        :return:
+        """
+        root_logger = logging.getLogger()
+        root_handlers = root_logger.handlers[:]
+        stream = io.StringIO()
+        for handler in root_handlers:
+            root_logger.removeHandler(handler)
+        root_logger.addHandler(logging.StreamHandler(stream))
+        try:
+            queue_listener = set_queue_logging()
+            self.assertIs(set_queue_logging(), queue_listener)
+            self.assertIsInstance(root_logger.handlers[0], QueueHandler)
+            logging.getLogger(__name__).warning("queued record")
+            stop_queue_logging()
+            self.assertEqual(stream.getvalue(), "queued record\n")
+        finally:
+            stop_queue_logging()
+            for handler in root_logger.handlers[:]:
+                root_logger.removeHandler(handler)
+            for handler in root_handlers:
+                root_logger.addHandler(handler)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,105 @@
+"""
+Persistent cache of per-url aggregates of the log file.
+"""
+
+import gzip
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+from utils.latency_summary import LatencySummary
+
+AGGREGATE_CACHE_VERSION = 1
+
+
+def get_source_info(path: str) -> dict:
+    """
+    Return the key of the cache: path, size and mtime of the source log file.
+    :param path: path to the log file
+    :return: dict with source file info.
+    """
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def save_aggregate_cache(
+    cache_path: str, source_info: dict, urls_summaries: Dict[str, LatencySummary]
+) -> None:
+    """
+    Save summaries of urls into the gzip json cache file atomically.
+    :param cache_path: path to the cache file
+    :param source_info: info of the source log file
+    :param urls_summaries: dict with latency summaries by urls
+    :return:
+    """
+    tmp_path = f"{cache_path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="UTF-8") as f:
+        json.dump(
+            {
+                "version": AGGREGATE_CACHE_VERSION,
+                "source": source_info,
+                "urls": {
+                    url: summary.to_dict() for url, summary in urls_summaries.items()
+                },
+            },
+            f,
+            separators=(",", ":"),
+        )
+    os.replace(tmp_path, cache_path)
+
+
+def read_aggregate_cache(
+    cache_path: str,
+) -> Optional[Tuple[dict, Dict[str, LatencySummary]]]:
+    """
+    Read the cache file with its source info.
+    :param cache_path: path to the cache file
+    :return: tuple (source_info, dict with latency summaries by urls)
+    or None if there is no readable cache.
+    """
+    if not os.path.isfile(cache_path):
+        return None
+    try:
+        with gzip.open(cache_path, "rt", encoding="UTF-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cache.get("version") != AGGREGATE_CACHE_VERSION:
+        return None
+    urls_summaries = {
+        url: LatencySummary.from_dict(state) for url, state in cache["urls"].items()
+    }
+    return cache.get("source"), urls_summaries
+
+
+def load_aggregate_cache(
+    cache_path: str,
+    source_info: Optional[dict] = None,
+    relative_accuracy: Optional[float] = None,
+) -> Optional[Dict[str, LatencySummary]]:
+    """
+    Load summaries of urls from the cache file.
+    :param cache_path: path to the cache file
+    :param source_info: info of the source log file, the cache is ignored
+    if it has been built from another version of the file
+    :param relative_accuracy: relative accuracy of summaries, the cache
+    is ignored if it has been built with another accuracy, as such summaries
+    can't be merged with the current ones
+    :return: dict with latency summaries by urls or None if there is no valid cache.
+    """
+    cache = read_aggregate_cache(cache_path)
+    if cache is None:
+        return None
+    cache_source_info, urls_summaries = cache
+    if source_info is not None and cache_source_info != source_info:
+        return None
+    if relative_accuracy is not None and any(
+        summary.relative_accuracy != relative_accuracy
+        for summary in urls_summaries.values()
+    ):
+        return None
+    return urls_summaries
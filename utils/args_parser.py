@@ -38,6 +38,88 @@ def get_args_log_analyzer(path_to_conf: str) -> Namespace:
                 "default": path_to_conf,
             },
         },
+        {
+            "names": ("--workers", "-w"),
+            "kwargs": {
+                "help": "Amount of processes for parsing uncompressed log "
+                "(0 - the number of CPUs)",
+                "required": False,
+                "type": int,
+            },
+        },
+        {
+            "names": ("--backfill",),
+            "kwargs": {
+                "help": "Create reports for all log files without them",
+                "required": False,
+                "action": "store_true",
+                "default": None,
+            },
+        },
+        {
+            "names": ("--rollup",),
+            "kwargs": {
+                "help": "Create the report for the amount of days ending with "
+                "the last log date (from cached aggregated data)",
+                "required": False,
+                "type": int,
+            },
+        },
+        {
+            "names": ("--follow",),
+            "kwargs": {
+                "help": "Follow the live log and regenerate its intraday report",
+                "required": False,
+                "action": "store_true",
+                "default": None,
+            },
+        },
+        {
+            "names": ("--serve",),
+            "kwargs": {
+                "help": "Serve reports, json slices of their data, health "
+                "and metrics with the HTTP service",
+                "required": False,
+                "action": "store_true",
+                "default": None,
+            },
+        },
+        {
+            "names": ("--profile",),
+            "kwargs": {
+                "help": "Profile the whole pipeline or each stage with cProfile",
+                "required": False,
+                "choices": ("pipeline", "stages"),
+            },
+        },
+        {
+            "names": ("--profile-format",),
+            "kwargs": {
+                "help": "Format of profiles (default: 'pstats')",
+                "required": False,
+                "choices": ("pstats", "callgrind"),
+            },
+        },
+        {
+            "names": ("--profile-lines",),
+            "kwargs": {
+                "help": "Parse only the first lines of the log for profiling "
+                "(the report isn't created)",
+                "required": False,
+                "type": int,
+            },
+        },
+        {
+            "names": ("--trace-malloc",),
+            "kwargs": {
+                "help": "Take tracemalloc snapshots at boundaries of stages "
+                "and save the amount of top allocation sites (default: 10)",
+                "required": False,
+                "type": int,
+                "nargs": "?",
+                "const": 10,
+            },
+        },
     ]
     args = get_parsed_args(args_params)
     return args
@@ -0,0 +1,215 @@
+"""
+Columnar cache of the parsed log: interned urls table, url ids and request
+times arrays, which are mapped into memory on reads.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import deque, namedtuple
+from typing import Any, Dict, Generator, Iterable, List, Optional, Tuple
+
+COLUMNS_CACHE_MAGIC = b"LACOLS1\n"
+COLUMNS_CACHE_VERSION = 2
+HEADER_PREFIX = struct.Struct("<8sI")
+# typecodes are literals in memoryview casts of load_columns_cache
+URL_ID_TYPECODE = "I"
+TIME_TYPECODE = "d"
+RUN_START_TYPECODE = "q"
+
+ParsedColumns = namedtuple("ParsedColumns", "urls, url_ids, times")
+
+
+def align(offset: int, size: int) -> int:
+    """
+    Return the offset rounded up to the multiple of the size.
+    :param offset: offset in bytes
+    :param size: alignment in bytes
+    :return: aligned offset.
+    """
+    return (offset + size - 1) // size * size
+
+
+class ColumnsRecorder:
+    """
+    Recorder of parsed lines into columns: urls are interned into the table,
+    lines are stored as uint32 url ids and float64 request times, so reports
+    rebuilt from the cache are the same as reports of the parsed log.
+    """
+
+    __slots__ = ("urls", "url_ids", "times", "_url_ids_by_url")
+
+    def __init__(self) -> None:
+        """
+        Init empty columns.
+        """
+        self.urls: List[str] = []
+        self.url_ids = array(URL_ID_TYPECODE)
+        self.times: "array[float]" = array(TIME_TYPECODE)
+        self._url_ids_by_url: Dict[str, int] = {}
+
+    def record(
+        self, parsed_data: Iterable[Tuple[Any, ...]]
+    ) -> Generator[Tuple[str, float], None, None]:
+        """
+        Record parsed lines passing through.
+        :param parsed_data: parsed log file data (url, request_time)
+        :return: generator of the same parsed data.
+        """
+        url_ids_by_url = self._url_ids_by_url
+        urls = self.urls
+        append_url_id = self.url_ids.append
+        append_time = self.times.append
+        for url, time in parsed_data:
+            url_id = url_ids_by_url.get(url)
+            if url_id is None:
+                url_id = url_ids_by_url[url] = len(urls)
+                urls.append(url)
+            append_url_id(url_id)
+            append_time(time)
+            yield url, time
+
+    def add_lines(self, parsed_data: Iterable[Tuple[Any, ...]]) -> None:
+        """
+        Record all parsed lines.
+        :param parsed_data: parsed log file data (url, request_time)
+        :return:
+        """
+        deque(self.record(parsed_data), maxlen=0)
+
+    def add_keyed_lines(
+        self, parsed_data: Iterable[Tuple[Any, ...]]
+    ) -> Tuple[List[Any], "array[int]"]:
+        """
+        Record all parsed lines with keys (e.g. time bucket keys), which
+        change rarely, so keys are kept by runs of lines instead of by lines.
+        :param parsed_data: parsed log file data (url, request_time, key)
+        :return: tuple (keys of runs, indexes of the first lines of runs).
+        """
+        run_keys: List[Any] = []
+        run_starts = array(RUN_START_TYPECODE)
+        url_ids_by_url = self._url_ids_by_url
+        urls = self.urls
+        url_ids = self.url_ids
+        append_url_id = url_ids.append
+        append_time = self.times.append
+        last_key: Any = object()
+        for url, time, key in parsed_data:
+            if key != last_key:
+                last_key = key
+                run_keys.append(key)
+                run_starts.append(len(url_ids))
+            url_id = url_ids_by_url.get(url)
+            if url_id is None:
+                url_id = url_ids_by_url[url] = len(urls)
+                urls.append(url)
+            append_url_id(url_id)
+            append_time(time)
+        return run_keys, run_starts
+
+    def get_columns(self) -> ParsedColumns:
+        """
+        Return recorded columns.
+        :return: named tuple (urls, url_ids, times).
+        """
+        return ParsedColumns(self.urls, self.url_ids, self.times)
+
+
+def save_columns_cache(
+    cache_path: str, source_info: dict, columns: ParsedColumns
+) -> None:
+    """
+    Save columns into the cache file atomically. The file consists of
+    the magic, the json header, the urls table (joined with line breaks)
+    and aligned arrays of url ids and request times.
+    :param cache_path: path to the cache file
+    :param source_info: info of the source log file
+    :param columns: named tuple (urls, url_ids, times)
+    :return:
+    """
+    urls_blob = "\n".join(columns.urls).encode("UTF-8")
+    header = json.dumps(
+        {
+            "version": COLUMNS_CACHE_VERSION,
+            "byteorder": sys.byteorder,
+            "source": source_info,
+            "urls_cnt": len(columns.urls),
+            "urls_size": len(urls_blob),
+            "lines_cnt": len(columns.url_ids),
+        }
+    ).encode("UTF-8")
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER_PREFIX.pack(COLUMNS_CACHE_MAGIC, len(header)))
+        f.write(header)
+        f.write(b"\0" * (align(f.tell(), 8) - f.tell()))
+        f.write(urls_blob)
+        f.write(b"\0" * (align(f.tell(), 8) - f.tell()))
+        columns.url_ids.tofile(f)
+        f.write(b"\0" * (align(f.tell(), 8) - f.tell()))
+        columns.times.tofile(f)
+    os.replace(tmp_path, cache_path)
+
+
+def load_columns_cache(
+    cache_path: str, source_info: Optional[dict] = None
+) -> Optional[ParsedColumns]:
+    """
+    Load columns from the cache file, arrays are memoryviews of the file
+    mapped into memory.
+    :param cache_path: path to the cache file
+    :param source_info: info of the source log file, the cache is ignored
+    if it has been built from another version of the file
+    :return: named tuple (urls, url_ids, times) or None if there is no valid cache.
+    """
+    if not os.path.isfile(cache_path) or not os.path.getsize(cache_path):
+        return None
+    with open(cache_path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, header_size = HEADER_PREFIX.unpack_from(mm)
+        if magic != COLUMNS_CACHE_MAGIC:
+            raise ValueError("Not a columns cache")
+        header_end = HEADER_PREFIX.size + header_size
+        header = json.loads(mm[HEADER_PREFIX.size : header_end].decode("UTF-8"))
+    except (struct.error, ValueError):
+        mm.close()
+        return None
+    if (
+        header.get("version") != COLUMNS_CACHE_VERSION
+        or header.get("byteorder") != sys.byteorder
+        or (source_info is not None and header.get("source") != source_info)
+    ):
+        mm.close()
+        return None
+
+    urls_start = align(header_end, 8)
+    url_ids_start = align(urls_start + header["urls_size"], 8)
+    lines_cnt = header["lines_cnt"]
+    url_ids_size = lines_cnt * array(URL_ID_TYPECODE).itemsize
+    times_start = align(url_ids_start + url_ids_size, 8)
+    times_size = lines_cnt * array(TIME_TYPECODE).itemsize
+    if times_start + times_size > len(mm):
+        mm.close()
+        return None
+    urls = mm[urls_start : urls_start + header["urls_size"]].decode("UTF-8")
+    view = memoryview(mm)
+    return ParsedColumns(
+        urls.split("\n") if header["urls_cnt"] else [],
+        view[url_ids_start : url_ids_start + url_ids_size].cast("I"),
+        view[times_start : times_start + times_size].cast("d"),
+    )
+
+
+def iter_columns(columns: ParsedColumns) -> Generator[Tuple[str, float], None, None]:
+    """
+    Return parsed lines of the columns.
+    :param columns: named tuple (urls, url_ids, times)
+    :return: generator with url string and request time float number.
+    """
+    urls = columns.urls
+    for url_id, time in zip(columns.url_ids, columns.times):
+        yield urls[url_id], time
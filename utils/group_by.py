@@ -0,0 +1,155 @@
+"""
+Group-by cubes of parsed log lines: request times are aggregated by values
+of log format variables (e.g. status, http_X_RB_USER) in the same pass
+as by urls, each cube gets its own report table.
+"""
+
+import re
+from operator import itemgetter
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Tuple
+
+CUBES_SEPARATOR = ";"
+CUBE_FIELDS_SEPARATOR = ","
+REPORT_METRICS = (
+    "count",
+    "count_perc",
+    "time_sum",
+    "time_perc",
+    "time_avg",
+    "time_max",
+    "time_med",
+)
+PERCENTILE_METRIC_PATTERN = re.compile(r"time_p(\d+(?:\.\d+)?)")
+
+Cube = Tuple[str, ...]
+CubesData = Dict[str, Dict[Any, Any]]
+
+
+def parse_group_by(group_by: Any) -> List[Cube]:
+    """
+    Return cubes of the GROUP_BY config: the list of cubes, each cube is
+    the list of fields or the string of fields separated with ",",
+    or the string of cubes separated with ";", e.g. "status;status,http_X_RB_USER".
+    :param group_by: value of the GROUP_BY config
+    :return: list of distinct cubes (tuples of fields).
+    """
+    if not group_by:
+        return []
+    if isinstance(group_by, str):
+        group_by = group_by.split(CUBES_SEPARATOR)
+    cubes: List[Cube] = []
+    for cube in group_by:
+        fields = cube.split(CUBE_FIELDS_SEPARATOR) if isinstance(cube, str) else cube
+        cube_fields = tuple(
+            field.strip().lstrip("$") for field in fields if field.strip()
+        )
+        if not cube_fields:
+            raise ValueError(f"Empty cube in group by: {group_by!r}")
+        if cube_fields not in cubes:
+            cubes.append(cube_fields)
+    return cubes
+
+
+def get_cube_name(cube: Cube) -> str:
+    """
+    Return the name of the cube.
+    :param cube: tuple of fields
+    :return: fields separated with ",".
+    """
+    return CUBE_FIELDS_SEPARATOR.join(cube)
+
+
+def get_group_fields(cubes: Iterable[Cube]) -> Tuple[str, ...]:
+    """
+    Return distinct fields of cubes, which are captured from log lines.
+    :param cubes: list of cubes
+    :return: tuple of fields in the order of cubes.
+    """
+    group_fields: List[str] = []
+    for cube in cubes:
+        group_fields.extend(field for field in cube if field not in group_fields)
+    return tuple(group_fields)
+
+
+def get_metric_quantile(metric: str) -> Optional[float]:
+    """
+    Return the quantile of the percentile metric, e.g. 0.95 of "time_p95".
+    :param metric: name of the metric
+    :return: quantile in [0, 1] or None if the metric isn't a percentile.
+    """
+    match = PERCENTILE_METRIC_PATTERN.fullmatch(metric)
+    if match is None or float(match.group(1)) > 100:
+        return None
+    return float(match.group(1)) / 100
+
+
+def parse_metrics(metrics: Any) -> Tuple[str, ...]:
+    """
+    Return metrics of report tables of cubes: columns of the url report
+    (count, count_perc, time_sum, time_perc, time_avg, time_max, time_med)
+    and percentiles of request times (time_p90, time_p99.9 etc.).
+    :param metrics: list of metrics or the string of metrics separated with ","
+    :return: tuple of metrics, all columns of the url report by default.
+    """
+    if not metrics:
+        return REPORT_METRICS
+    if isinstance(metrics, str):
+        metrics = metrics.split(",")
+    metrics = tuple(metric.strip() for metric in metrics if metric.strip())
+    for metric in metrics:
+        if metric not in REPORT_METRICS and get_metric_quantile(metric) is None:
+            raise ValueError(f"Unknown group by metric: {metric!r}")
+    return metrics
+
+
+def aggregate_cubes(
+    parsed_data: Iterable[Tuple[Any, ...]],
+    cubes: List[Cube],
+    cubes_data: CubesData,
+    new_record: Callable[[], Any],
+) -> Generator[Tuple[Any, ...], None, None]:
+    """
+    Add request times of parsed lines to aggregated data of cubes
+    and return lines without group values, so they are aggregated by urls
+    in the same pass. Keys of single field cubes are values, keys of other
+    cubes are tuples of values.
+    :param parsed_data: parsed lines with the tuple of values
+    of the group fields (see get_group_fields) at the end
+    :param cubes: list of cubes
+    :param cubes_data: dict with aggregated data by keys by cube names
+    :param new_record: factory of the aggregated data of the key
+    (LatencySummary, so the memory is bounded by the amount of keys)
+    :return: generator of parsed lines without group values.
+    """
+    group_fields = get_group_fields(cubes)
+    cube_keys = [
+        (
+            cubes_data.setdefault(get_cube_name(cube), {}),
+            itemgetter(*(group_fields.index(field) for field in cube)),
+        )
+        for cube in cubes
+    ]
+    for parsed_line in parsed_data:
+        group_values = parsed_line[-1]
+        time = parsed_line[1]
+        for cube_data, get_key in cube_keys:
+            key = get_key(group_values)
+            record = cube_data.get(key)
+            if record is None:
+                record = cube_data[key] = new_record()
+            record.add(time)
+        yield parsed_line[:-1]
+
+
+def decode_cube_key(key: Any, encoding: str) -> Any:
+    """
+    Return the key of the cube with decoded values of bytes lines.
+    :param key: value or tuple of values (str or bytes)
+    :param encoding: encoding of bytes lines
+    :return: value or tuple of values of str.
+    """
+    if isinstance(key, tuple):
+        return tuple(decode_cube_key(value, encoding) for value in key)
+    if isinstance(key, bytes):
+        return key.decode(encoding, errors="replace")
+    return key
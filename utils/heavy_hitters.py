@@ -0,0 +1,74 @@
+"""
+Bounded tracking of the heaviest keys of the weighted stream.
+"""
+
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+
+class SpaceSaving:
+    """
+    Weighted Space-Saving algorithm (Metwally et al.), that tracks
+    at most ``capacity`` keys with the largest sum of weights.
+
+    When the table is full, the key with the minimal estimate is evicted,
+    and the new key inherits its estimate as the error. Guarantees, where
+    W is the total weight of the stream and M is the capacity:
+    * the estimate of the key overestimates its true sum by at most its
+      error, which is not greater than W / M;
+    * every key with the true sum greater than W / M is tracked.
+    """
+
+    __slots__ = ("capacity", "estimates", "errors", "_heap")
+
+    def __init__(self, capacity: int):
+        """
+        Init empty table of the heavy hitters.
+        :param capacity: max amount of tracked keys
+        """
+        if capacity <= 0:
+            raise ValueError("Capacity should be positive")
+        self.capacity = capacity
+        self.estimates: Dict[str, float] = {}
+        self.errors: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+
+    def add(self, key: str, weight: float) -> Optional[str]:
+        """
+        Add the weight of the key to the table.
+        :param key: key of the stream item
+        :param weight: non-negative weight of the item
+        :return: evicted key or None.
+        """
+        estimates = self.estimates
+        if key in estimates:
+            estimates[key] += weight
+            return None
+        if len(estimates) < self.capacity:
+            estimates[key] = weight
+            self.errors[key] = 0.0
+            heapq.heappush(self._heap, (weight, key))
+            return None
+
+        min_estimate, evicted_key = self._pop_min()
+        del estimates[evicted_key]
+        del self.errors[evicted_key]
+        estimates[key] = min_estimate + weight
+        self.errors[key] = min_estimate
+        heapq.heappush(self._heap, (min_estimate + weight, key))
+        return evicted_key
+
+    def _pop_min(self) -> Tuple[float, str]:
+        """
+        Pop the tracked key with the minimal estimate. Heap items are lower
+        bounds of the estimates (they only grow), stale items are pushed back
+        with the actual estimate until the actual minimum is on the top.
+        :return: tuple (estimate, key).
+        """
+        heap = self._heap
+        while True:
+            estimate, key = heapq.heappop(heap)
+            actual_estimate = self.estimates[key]
+            if actual_estimate == estimate:
+                return estimate, key
+            heapq.heappush(heap, (actual_estimate, key))
@@ -0,0 +1,178 @@
+"""
+Exact series of request times stored in a compact array.
+"""
+
+import math
+from array import array
+from itertools import chain
+from statistics import median
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+SERIES_TYPECODE = "d"
+# floats are integer amounts of 2 ** -1074 (the min subnormal float)
+EXACT_SCALE = 1074
+
+
+def get_quantile_rank(q: float, count: int) -> Tuple[int, int, float]:
+    """
+    Return closest ranks of the q-quantile in the sorted series
+    and the weight of the upper one.
+    :param q: quantile in [0, 1]
+    :param count: amount of values
+    :return: tuple (lower rank, upper rank, weight of the upper rank).
+    """
+    rank = q * (count - 1)
+    low = int(rank)
+    return low, min(low + 1, count - 1), rank - low
+
+
+def get_sorted_quantile(sorted_times: Sequence[float], q: float) -> float:
+    """
+    Return the q-quantile of sorted request times, linearly interpolated
+    between the closest ranks, so the 0.5-quantile equals the median.
+    :param sorted_times: sorted request times
+    :param q: quantile in [0, 1]
+    :return: request time.
+    """
+    low, high, weight = get_quantile_rank(q, len(sorted_times))
+    return sorted_times[low] * (1 - weight) + sorted_times[high] * weight
+
+
+def get_scaled_int(value: float) -> int:
+    """
+    Return the finite float as the integer amount of 2 ** -EXACT_SCALE.
+    :param value: finite float
+    :return: integer.
+    """
+    numerator, denominator = value.as_integer_ratio()
+    return numerator << (EXACT_SCALE + 1 - denominator.bit_length())
+
+
+def get_exact_mean(times: Sequence[float]) -> float:
+    """
+    Return the mean of request times rounded once from the exact sum,
+    so it is equal to statistics.mean. The exact sum is kept as float parts:
+    each part is the rest of the sum after the previous ones by math.fsum
+    (the first part is the sum), parts are added until the mean is the same
+    at both bounds of the rounding error of the last part. Sums of parts
+    are exact integers of scaled floats, their division is correctly rounded.
+    :param times: non-empty request times
+    :return: mean request time.
+    """
+    count = len(times)
+    scaled_count = count << EXACT_SCALE
+    scaled_sum = 0
+    parts: List[float] = []
+    while True:
+        rest = math.fsum(chain(times, [-part for part in parts]))
+        if not math.isfinite(rest):
+            return rest / count
+        if not rest:
+            return scaled_sum / scaled_count
+        scaled_sum += get_scaled_int(rest)
+        # the exact rest is within half of the ulp of the rounded one
+        half_ulp = 1 << max(math.frexp(rest)[1] - 54 + EXACT_SCALE, 0)
+        mean = (scaled_sum - half_ulp) / scaled_count
+        if mean == (scaled_sum + half_ulp) / scaled_count:
+            return mean
+        parts.append(rest)
+
+
+class LatencySeries:
+    """
+    Series of request times of the url for the exact aggregation.
+
+    Times are stored unboxed in array('d') (8 bytes per sample instead of
+    a float object and a list slot), the sum is tracked on the fly.
+    The interface is shared with LatencySummary, so aggregated data
+    of both modes is handled the same way.
+    """
+
+    __slots__ = ("times", "time_sum")
+
+    def __init__(self, times: Optional["array[float]"] = None):
+        """
+        Init the series.
+        :param times: array of request times, which is taken without copying
+        """
+        self.times: "array[float]" = array(SERIES_TYPECODE) if times is None else times
+        self.time_sum = sum(self.times) if times is not None else 0.0
+
+    @property
+    def count(self) -> int:
+        """
+        Return amount of request times.
+        :return: amount of request times.
+        """
+        return len(self.times)
+
+    @property
+    def time_max(self) -> float:
+        """
+        Return the max request time.
+        :return: max request time.
+        """
+        return max(self.times)
+
+    def add(self, value: float) -> None:
+        """
+        Add request time to the series.
+        :param value: request time
+        :return:
+        """
+        self.times.append(value)
+        self.time_sum += value
+
+    def merge(self, other: "LatencySeries") -> "LatencySeries":
+        """
+        Merge the other series into this one.
+        :param other: other series
+        :return: this series.
+        """
+        self.times.extend(other.times)
+        self.time_sum += other.time_sum
+        return self
+
+    def mean(self) -> float:
+        """
+        Return the exact mean of request times (see get_exact_mean).
+        :return: mean request time.
+        """
+        return get_exact_mean(self.times)
+
+    def median(self) -> float:
+        """
+        Return the median of request times.
+        :return: median request time.
+        """
+        return median(self.times)
+
+    def quantile(self, q: float) -> float:
+        """
+        Return the q-quantile of request times.
+        :param q: quantile in [0, 1]
+        :return: request time.
+        """
+        return self.quantiles((q,))[0]
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        """
+        Return quantiles of request times with one sort of the series
+        for all of them (see get_sorted_quantile). The series isn't partitioned
+        by a quickselect, in pure Python it is slower than the C sort.
+        :param qs: quantiles in [0, 1]
+        :return: list of request times.
+        """
+        if not self.times:
+            raise ValueError("Series is empty")
+        sorted_times = sorted(self.times)
+        return [get_sorted_quantile(sorted_times, q) for q in qs]
+
+    @classmethod
+    def from_series(cls, series: Iterable[float]) -> "LatencySeries":
+        """
+        Return the series of the request times.
+        :param series: request times
+        :return: latency series.
+        """
+        return cls(array(SERIES_TYPECODE, series))
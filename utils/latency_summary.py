@@ -0,0 +1,195 @@
+"""
+Bounded-memory streaming summary of request times.
+"""
+
+import math
+from typing import Dict, Iterable, List, Sequence
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+MAX_BUCKETS = 2048
+MIN_TRACKABLE_VALUE = 1e-9
+
+
+class LatencySummary:
+    """
+    Mergeable streaming summary of request times of the url.
+
+    Count, sum, min and max are tracked exactly. Quantiles are estimated
+    with log-scale buckets (as in DDSketch): the estimate of the q-quantile
+    is within ``relative_accuracy`` of the sample value at rank q * (n - 1),
+    i.e. 1% for the default accuracy. The amount of buckets is limited by
+    MAX_BUCKETS (~760 buckets cover 1ms..1h with 1% accuracy), the lowest
+    buckets are collapsed when the limit is reached, so only the lowest
+    quantiles may lose the accuracy.
+    """
+
+    __slots__ = (
+        "relative_accuracy",
+        "count",
+        "time_sum",
+        "time_min",
+        "time_max",
+        "zero_count",
+        "buckets",
+        "_gamma",
+        "_gamma_log",
+    )
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        """
+        Init empty summary.
+        :param relative_accuracy: relative error bound of quantiles estimation
+        """
+        self.relative_accuracy = relative_accuracy
+        self.count = 0
+        self.time_sum = 0.0
+        self.time_min = math.inf
+        self.time_max = -math.inf
+        self.zero_count = 0
+        self.buckets: Dict[int, int] = {}
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._gamma_log = math.log(self._gamma)
+
+    def add(self, value: float) -> None:
+        """
+        Add request time to the summary.
+        :param value: request time
+        :return:
+        """
+        self.count += 1
+        self.time_sum += value
+        if value < self.time_min:
+            self.time_min = value
+        if value > self.time_max:
+            self.time_max = value
+        if value < MIN_TRACKABLE_VALUE:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._gamma_log)
+        buckets = self.buckets
+        if key in buckets:
+            buckets[key] += 1
+        else:
+            buckets[key] = 1
+            if len(buckets) > MAX_BUCKETS:
+                self._collapse()
+
+    def merge(self, other: "LatencySummary") -> "LatencySummary":
+        """
+        Merge the other summary with the same accuracy into this one.
+        :param other: other summary
+        :return: this summary.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Can't merge summaries with different accuracy")
+        self.count += other.count
+        self.time_sum += other.time_sum
+        self.time_min = min(self.time_min, other.time_min)
+        self.time_max = max(self.time_max, other.time_max)
+        self.zero_count += other.zero_count
+        buckets = self.buckets
+        for key, cnt in other.buckets.items():
+            buckets[key] = buckets.get(key, 0) + cnt
+        if len(buckets) > MAX_BUCKETS:
+            self._collapse()
+        return self
+
+    def quantile(self, q: float) -> float:
+        """
+        Return estimation of the q-quantile of request times.
+        :param q: quantile in [0, 1]
+        :return: estimated request time.
+        """
+        if not self.count:
+            raise ValueError("Summary is empty")
+        rank = q * (self.count - 1)
+        cumulative = self.zero_count
+        if cumulative > rank:
+            return max(self.time_min, 0.0)
+        for key in sorted(self.buckets):
+            cumulative += self.buckets[key]
+            if cumulative > rank:
+                value = 2 * self._gamma**key / (self._gamma + 1)
+                return min(max(value, self.time_min), self.time_max)
+        return self.time_max
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        """
+        Return estimations of quantiles of request times.
+        :param qs: quantiles in [0, 1]
+        :return: list of estimated request times.
+        """
+        return [self.quantile(q) for q in qs]
+
+    def mean(self) -> float:
+        """
+        Return the mean of request times by the tracked sum.
+        :return: mean request time.
+        """
+        return self.time_sum / self.count
+
+    def median(self) -> float:
+        """
+        Return estimation of the median of request times.
+        :return: estimated median request time.
+        """
+        return self.quantile(0.5)
+
+    def to_dict(self) -> dict:
+        """
+        Return the state of the summary, that may be dumped to json.
+        :return: dict with the summary state.
+        """
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "count": self.count,
+            "time_sum": self.time_sum,
+            "time_min": self.time_min,
+            "time_max": self.time_max,
+            "zero_count": self.zero_count,
+            "buckets": self.buckets,
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "LatencySummary":
+        """
+        Return the summary restored from the state.
+        :param state: dict with the summary state
+        :return: latency summary.
+        """
+        summary = cls(state["relative_accuracy"])
+        summary.count = state["count"]
+        summary.time_sum = state["time_sum"]
+        summary.time_min = state["time_min"]
+        summary.time_max = state["time_max"]
+        summary.zero_count = state["zero_count"]
+        summary.buckets = {int(key): cnt for key, cnt in state["buckets"].items()}
+        return summary
+
+    @classmethod
+    def from_series(
+        cls,
+        series: Iterable[float],
+        relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+    ) -> "LatencySummary":
+        """
+        Return the summary of the request times.
+        :param series: request times
+        :param relative_accuracy: relative error bound of quantiles estimation
+        :return: latency summary.
+        """
+        summary = cls(relative_accuracy)
+        for value in series:
+            summary.add(value)
+        return summary
+
+    def _collapse(self) -> None:
+        """
+        Collapse the lowest buckets to keep MAX_BUCKETS of them.
+        :return:
+        """
+        keys = sorted(self.buckets)
+        excess = keys[: len(keys) - MAX_BUCKETS]
+        target = keys[len(excess)]
+        for key in excess:
+            self.buckets[target] += self.buckets.pop(key)
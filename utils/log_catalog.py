@@ -0,0 +1,276 @@
+"""
+Persistent SQLite catalog of log files, which is refreshed incrementally.
+"""
+
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+STATUS_NEW = "new"
+STATUS_PROCESSING = "processing"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+CATALOG_TIMEOUT = 30.0
+DATE_FORMAT = "%Y-%m-%d"
+# mtime of the dir isn't trusted until it is older than the granularity
+# of mtimes (e.g. 2 seconds of FAT, cached attributes of NFS), as new files
+# may be added in the same tick after the scan
+DIR_MTIME_GRANULARITY_NS = 2 * 10**9
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS log_dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS log_files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    date TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'new',
+    started_at REAL,
+    finished_at REAL,
+    duration_seconds REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS log_files_dir_date ON log_files (dir, date);
+CREATE INDEX IF NOT EXISTS log_files_dir_date_pending
+    ON log_files (dir, date, ext, path, status) WHERE status != 'done';
+"""
+
+LogFileName = Tuple[datetime, str]
+CatalogRow = Tuple[str, datetime, str]
+
+
+class LogCatalog:
+    """
+    Catalog of log files of directories: path, date from the name, codec
+    extension, size, mtime and the processing status with its duration.
+
+    The directory is rescanned only when its mtime has changed (files
+    are added, removed or renamed), only files which aren't processed yet
+    are checked for changes of size and mtime on each refresh, so finding
+    of log files is an indexed query instead of listing and matching
+    of all names on every run.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open the catalog, the database is created if it doesn't exist.
+        :param path: path to the SQLite database
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=CATALOG_TIMEOUT)
+        with self.connection:
+            self.connection.executescript(CATALOG_SCHEMA)
+
+    def __enter__(self) -> "LogCatalog":
+        """
+        Return the catalog for the with statement.
+        :return: log catalog.
+        """
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """
+        Close the catalog at the end of the with statement.
+        :return:
+        """
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the database connection.
+        :return:
+        """
+        self.connection.close()
+
+    def refresh(
+        self, log_dir: str, parse_name: Callable[[str], Optional[LogFileName]]
+    ) -> bool:
+        """
+        Rescan the directory if its mtime differs from the catalogued one,
+        otherwise only check files which aren't processed yet.
+        New and changed files get the new status, removed files are deleted.
+        :param log_dir: path to the dir with logs
+        :param parse_name: function returning (date, ext) of the log file name
+        or None if the name doesn't match
+        :return: True if the directory has been rescanned.
+        """
+        log_dir = os.path.abspath(log_dir)
+        dir_mtime_ns = os.stat(log_dir).st_mtime_ns
+        row = self.connection.execute(
+            "SELECT mtime_ns FROM log_dirs WHERE path = ?", (log_dir,)
+        ).fetchone()
+        if row is not None and row[0] == dir_mtime_ns:
+            self.refresh_pending(log_dir)
+            return False
+
+        files = []
+        with os.scandir(log_dir) as entries:
+            for entry in entries:
+                log_file_name = parse_name(entry.name)
+                if log_file_name is None or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                log_date, ext = log_file_name
+                files.append(
+                    (
+                        os.path.join(log_dir, entry.name),
+                        log_dir,
+                        log_date.strftime(DATE_FORMAT),
+                        ext,
+                        stat.st_size,
+                        stat.st_mtime_ns,
+                    )
+                )
+
+        catalogued = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in self.connection.execute(
+                "SELECT path, size, mtime_ns FROM log_files WHERE dir = ?",
+                (log_dir,),
+            )
+        }
+        scanned_paths = {file[0] for file in files}
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM log_files WHERE path = ?",
+                ((path,) for path in catalogued if path not in scanned_paths),
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO log_files "
+                "(path, dir, date, ext, size, mtime_ns) VALUES (?, ?, ?, ?, ?, ?)",
+                (file for file in files if catalogued.get(file[0]) != file[4:]),
+            )
+            if time.time_ns() - dir_mtime_ns < DIR_MTIME_GRANULARITY_NS:
+                dir_mtime_ns = -1
+            self.connection.execute(
+                "INSERT OR REPLACE INTO log_dirs (path, mtime_ns) VALUES (?, ?)",
+                (log_dir, dir_mtime_ns),
+            )
+        return True
+
+    def refresh_pending(self, log_dir: str) -> None:
+        """
+        Check size and mtime of catalogued files of the directory, which
+        aren't processed yet: changed files get the new status, removed files
+        are deleted.
+        :param log_dir: absolute path to the dir with logs
+        :return:
+        """
+        changed = []
+        removed = []
+        for path, size, mtime_ns in self.connection.execute(
+            "SELECT path, size, mtime_ns FROM log_files "
+            "WHERE dir = ? AND status != 'done'",
+            (log_dir,),
+        ).fetchall():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                removed.append((path,))
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                changed.append((STATUS_NEW, stat.st_size, stat.st_mtime_ns, path))
+        if not changed and not removed:
+            return
+        with self.connection:
+            self.connection.executemany("DELETE FROM log_files WHERE path = ?", removed)
+            self.connection.executemany(
+                "UPDATE log_files SET status = ?, size = ?, mtime_ns = ? "
+                "WHERE path = ?",
+                changed,
+            )
+
+    def get_log_files(self, log_dir: str) -> List[CatalogRow]:
+        """
+        Return catalogued log files of the directory.
+        :param log_dir: path to the dir with logs
+        :return: list of tuples (path, date, ext).
+        """
+        return [
+            (path, datetime.strptime(log_date, DATE_FORMAT), ext)
+            for path, log_date, ext in self.connection.execute(
+                "SELECT path, date, ext FROM log_files WHERE dir = ?",
+                (os.path.abspath(log_dir),),
+            )
+        ]
+
+    def get_last_log_file(self, log_dir: str) -> Optional[CatalogRow]:
+        """
+        Return the log file of the directory with the latest date, which
+        isn't processed yet (new, failed or interrupted while processing).
+        :param log_dir: path to the dir with logs
+        :return: tuple (path, date, ext) or None if there are no such log files.
+        """
+        row = self.connection.execute(
+            "SELECT path, date, ext FROM log_files "
+            "WHERE dir = ? AND status != 'done' ORDER BY date DESC LIMIT 1",
+            (os.path.abspath(log_dir),),
+        ).fetchone()
+        if row is None:
+            return None
+        path, log_date, ext = row
+        return path, datetime.strptime(log_date, DATE_FORMAT), ext
+
+    def get_status(self, path: str) -> Optional[dict]:
+        """
+        Return the processing status of the log file.
+        :param path: path to the log file
+        :return: dict with status, started_at, finished_at, duration_seconds
+        and error or None if the file isn't catalogued.
+        """
+        row = self.connection.execute(
+            "SELECT status, started_at, finished_at, duration_seconds, error "
+            "FROM log_files WHERE path = ?",
+            (os.path.abspath(path),),
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(
+            zip(
+                ("status", "started_at", "finished_at", "duration_seconds", "error"),
+                row,
+            )
+        )
+
+    def mark_started(self, path: str) -> None:
+        """
+        Set the processing status of the log file.
+        :param path: path to the log file
+        :return:
+        """
+        with self.connection:
+            self.connection.execute(
+                "UPDATE log_files SET status = ?, started_at = ?, "
+                "finished_at = NULL, duration_seconds = NULL, error = NULL "
+                "WHERE path = ?",
+                (STATUS_PROCESSING, time.time(), os.path.abspath(path)),
+            )
+
+    def mark_finished(self, path: str, error: Optional[str] = None) -> None:
+        """
+        Set the done (or failed, if there is the error) status of the log file
+        with the duration of processing.
+        :param path: path to the log file
+        :param error: error message
+        :return:
+        """
+        finished_at = time.time()
+        with self.connection:
+            self.connection.execute(
+                "UPDATE log_files SET status = ?, finished_at = ?, "
+                "duration_seconds = ? - started_at, error = ? WHERE path = ?",
+                (
+                    STATUS_FAILED if error is not None else STATUS_DONE,
+                    finished_at,
+                    finished_at,
+                    error,
+                    os.path.abspath(path),
+                ),
+            )
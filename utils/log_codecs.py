@@ -0,0 +1,158 @@
+"""
+Registry of compression codecs of log files.
+"""
+
+import bz2
+import gzip
+import lzma
+import mmap
+import os
+import re
+import zlib
+from collections import namedtuple
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+STREAM_CHUNK_SIZE = 1 << 18
+
+LogCodec = namedtuple("LogCodec", "ext, open_file, get_decompressor, stream_magic")
+
+CODECS: Dict[str, LogCodec] = {}
+
+
+def register_codec(codec: LogCodec) -> None:
+    """
+    Add the codec to the registry.
+    The codec is a named tuple with fields:
+    * ext - extension of log files, e.g. ".bz2";
+    * open_file - function (path, mode) returning binary file object;
+    * get_decompressor - function returning the decompressor object with
+      decompress(data), eof and unused_data, as bz2.BZ2Decompressor;
+    * stream_magic - regex (bytes) of the start of an independently decodable
+      stream, or None if streams of the codec can't be split.
+    :param codec: log codec
+    :return:
+    """
+    CODECS[codec.ext] = codec
+
+
+register_codec(
+    LogCodec(
+        ext=".gz",
+        open_file=gzip.open,
+        get_decompressor=lambda: zlib.decompressobj(16 + zlib.MAX_WBITS),
+        stream_magic=None,
+    )
+)
+register_codec(
+    LogCodec(
+        ext=".bz2",
+        open_file=bz2.open,
+        get_decompressor=bz2.BZ2Decompressor,
+        stream_magic=re.compile(rb"BZh[1-9]1AY&SY"),
+    )
+)
+register_codec(
+    LogCodec(
+        ext=".xz",
+        open_file=lzma.open,
+        get_decompressor=lzma.LZMADecompressor,
+        stream_magic=re.compile(rb"\xfd7zXZ\x00"),
+    )
+)
+if zstandard is not None:  # pragma: no cover
+    register_codec(
+        LogCodec(
+            ext=".zst",
+            open_file=zstandard.open,
+            get_decompressor=lambda: zstandard.ZstdDecompressor().decompressobj(),
+            stream_magic=re.compile(rb"\x28\xb5\x2f\xfd"),
+        )
+    )
+
+
+def get_codec(ext: str) -> Optional[LogCodec]:
+    """
+    Return the codec of the log file extension.
+    :param ext: extension of the log file, "" for uncompressed logs
+    :return: log codec or None for uncompressed logs.
+    """
+    if not ext:
+        return None
+    return CODECS[ext]
+
+
+def get_codecs_ext_pattern() -> str:
+    """
+    Return the regex of extensions of the registered codecs
+    (including empty extension of uncompressed logs).
+    :return: regex string.
+    """
+    return "|".join([re.escape(ext) for ext in sorted(CODECS)] + [""])
+
+
+def get_stream_segments(
+    path: str, codec: LogCodec, segments_cnt: int
+) -> List[Tuple[int, int]]:
+    """
+    Split the compressed file into byte ranges at the starts of independent
+    streams (bz2 streams, xz streams, zstd frames), ranges have close sizes.
+    Starts are found by magic bytes, so some of them may be false ones,
+    which is detected by the decompression of the ranges.
+    :param path: path to the compressed file
+    :param codec: log codec with stream_magic
+    :param segments_cnt: desired amount of ranges
+    :return: list of (start, end) byte offsets.
+    """
+    if not os.path.getsize(path):
+        return [(0, 0)]
+    with open(path, "rb") as fb:
+        with mmap.mmap(fb.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            offsets = [match.start() for match in codec.stream_magic.finditer(mm)]
+    if not offsets or offsets[0] != 0:
+        return [(0, size)]
+
+    bounds = [0]
+    step = size / max(segments_cnt, 1)
+    for offset in offsets[1:]:
+        if offset >= step * len(bounds):
+            bounds.append(offset)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def iter_decompressed_streams(
+    data: bytes,
+    get_decompressor: Callable[[], Any],
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> Generator[bytes, None, None]:
+    """
+    Return decompressed blocks of the consecutive complete streams.
+    :param data: compressed data
+    :param get_decompressor: function returning new decompressor object
+    :param chunk_size: size of compressed chunks passed to the decompressor
+    :return: generator of decompressed data blocks.
+    """
+    view = memoryview(data)
+    decompressor = get_decompressor()
+    stream_started = False
+    for pos in range(0, len(data), chunk_size):
+        chunk = bytes(view[pos : pos + chunk_size])
+        while chunk:
+            stream_started = True
+            block = decompressor.decompress(chunk)
+            if block:
+                yield block
+            if decompressor.eof:
+                chunk = decompressor.unused_data
+                decompressor = get_decompressor()
+                stream_started = False
+            else:
+                chunk = b""
+    if stream_started:
+        raise EOFError("Compressed data ended before the end-of-stream marker")
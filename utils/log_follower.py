@@ -0,0 +1,135 @@
+"""
+Incremental reading of the live (appended) log file.
+"""
+
+import os
+from typing import BinaryIO, Generator, Optional
+
+from utils.log_readers import iter_block_lines
+
+
+class LogFollower:
+    """
+    Reader of the lines appended to the log file since the last read.
+
+    The position is the inode of the file and the byte offset after the
+    last complete line, so it may be persisted and restored. The rest of the
+    rotated file is read before switching to the new file at the same path,
+    the truncated file is read from the beginning. If the log has been rotated
+    while the follower was stopped, the rest of the rotated file is read from
+    the restored offset, if it is found next to the log (e.g. access.log.1).
+    """
+
+    def __init__(self, path: str, inode: Optional[int] = None, offset: int = 0):
+        """
+        Init follower of the log file.
+        :param path: path to the live log file
+        :param inode: inode of the file from the checkpoint
+        :param offset: offset of the first unread line from the checkpoint
+        """
+        self.path = path
+        self.inode = inode
+        self.offset = offset
+        self._fb: Optional[BinaryIO] = None
+
+    def read_new_lines(self) -> Generator[bytes, None, None]:
+        """
+        Return complete lines appended since the last read.
+        :return: generator of lines (with line breaks).
+        """
+        if self._fb is None and not self._open():
+            return
+        yield from self._read_complete_lines()
+
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return
+        if inode != self.inode:
+            self.close()
+            self.inode = None
+            self.offset = 0
+            if self._open():
+                yield from self._read_complete_lines()
+
+    def get_checkpoint(self) -> dict:
+        """
+        Return the position of the follower.
+        :return: dict with path, inode and offset.
+        """
+        return {"path": self.path, "inode": self.inode, "offset": self.offset}
+
+    def close(self) -> None:
+        """
+        Close the followed file.
+        :return:
+        """
+        if self._fb is not None:
+            self._fb.close()
+            self._fb = None
+
+    def _open(self) -> bool:
+        """
+        Open the file at the path, the offset is reset for another inode.
+        The rotated file with the restored inode is opened instead,
+        so its rest is read before the file at the path.
+        :return: True if the file has been opened.
+        """
+        if self.inode is not None and self._open_rotated():
+            return True
+        try:
+            self._fb = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        inode = os.fstat(self._fb.fileno()).st_ino
+        if inode != self.inode:
+            self.inode = inode
+            self.offset = 0
+        return True
+
+    def _open_rotated(self) -> bool:
+        """
+        Open the rotated file with the inode of the follower, it is searched
+        among files next to the log with names starting with the log name,
+        if the file at the path has another inode.
+        :return: True if the rotated file has been opened.
+        """
+        try:
+            if os.stat(self.path).st_ino == self.inode:
+                return False
+        except FileNotFoundError:
+            pass
+        log_dir, log_name = os.path.split(self.path)
+        with os.scandir(log_dir or ".") as entries:
+            rotated_paths = [
+                entry.path
+                for entry in entries
+                if entry.name != log_name
+                and entry.name.startswith(log_name)
+                and entry.inode() == self.inode
+            ]
+        for rotated_path in rotated_paths:
+            try:
+                fb = open(rotated_path, "rb")
+            except FileNotFoundError:
+                continue
+            if os.fstat(fb.fileno()).st_ino == self.inode:
+                self._fb = fb
+                return True
+            fb.close()
+        return False
+
+    def _read_complete_lines(self) -> Generator[bytes, None, None]:
+        """
+        Return complete lines of the opened file after the offset.
+        :return: generator of lines (with line breaks).
+        """
+        fb = self._fb
+        if fb is None:
+            return
+        if os.fstat(fb.fileno()).st_size < self.offset:
+            self.offset = 0
+        fb.seek(self.offset)
+        for line in iter_block_lines(fb, partial_tail=False):
+            self.offset += len(line)
+            yield line
@@ -0,0 +1,95 @@
+"""
+Compiling of nginx log_format definitions into log line parsers.
+"""
+
+import re
+from functools import lru_cache
+from typing import Pattern, Tuple
+
+LOG_FORMAT_UI_SHORT = (
+    "$remote_addr  $remote_user $http_x_real_ip [$time_local] "
+    '"$request" $status $body_bytes_sent "$http_referer" '
+    '"$http_user_agent" "$http_x_forwarded_for" "$http_X_REQUEST_ID" '
+    '"$http_X_RB_USER" $request_time'
+)
+
+URL_FIELD = "url"
+REQUEST_FIELD = "request"
+
+VARIABLE_PATTERN = re.compile(r"\$(\w+)")
+
+
+def get_variable_pattern(next_literal: str) -> str:
+    """
+    Return regex of the variable value, which is limited
+    by the first char of the next literal of the format.
+    :param next_literal: literal that follows the variable in the format
+    :return: regex string without backtracking.
+    """
+    if not next_literal:
+        return r"\S*"
+    if next_literal[0].isspace():
+        return r"\S*"
+    return f"[^{re.escape(next_literal[0])}]*"
+
+
+def get_literal_pattern(literal: str) -> str:
+    """
+    Return regex of the literal part of the format.
+    Runs of whitespaces match any amount of whitespaces.
+    :param literal: literal part of the format
+    :return: regex string.
+    """
+    return "".join(
+        r"\s+" if part.isspace() else re.escape(part)
+        for part in re.split(r"(\s+)", literal)
+        if part
+    )
+
+
+@lru_cache(maxsize=None)
+def compile_log_format(
+    log_format: str,
+    fields: Tuple[str, ...],
+    binary: bool = False,
+    prefix_groups: Tuple[Tuple[str, str, int], ...] = (),
+) -> Pattern:
+    """
+    Compile nginx log_format definition into the regex, that captures
+    only the passed fields. Values are matched by position with negated
+    char classes, so there are no backtracking `.*` patterns.
+    The "url" pseudo field is extracted from the "$request" variable.
+    :param log_format: nginx log_format string
+    :param fields: names of variables (without "$") to capture
+    :param binary: compile the pattern for bytes lines
+    :param prefix_groups: triples (variable, group name, size), the prefix
+    of the size of the variable value is captured by the group of the name
+    (shorter values don't match)
+    :return: compiled regex pattern with named groups of the fields.
+    """
+    variables = VARIABLE_PATTERN.findall(log_format)
+    literals = VARIABLE_PATTERN.split(log_format)[::2]
+    for field in (*fields, *(variable for variable, _, _ in prefix_groups)):
+        if field == URL_FIELD and REQUEST_FIELD in variables:
+            continue
+        if field not in variables:
+            raise ValueError(f"There is no ${field} variable in log format")
+
+    prefixes = {variable: (name, size) for variable, name, size in prefix_groups}
+    pattern_parts = [r"\s*", get_literal_pattern(literals[0])]
+    for variable, next_literal in zip(variables, literals[1:]):
+        value_pattern = get_variable_pattern(next_literal)
+        if variable == REQUEST_FIELD and URL_FIELD in fields:
+            value_pattern = rf"[^\s\"]+ (?P<{URL_FIELD}>[^\s\"]*) [^\"]*"
+        if variable in prefixes:
+            # the value pattern is the char class with "*"
+            name, size = prefixes[variable]
+            value_pattern = f"(?P<{name}>{value_pattern[:-1]}{{{size}}}){value_pattern}"
+        if variable in fields:
+            value_pattern = f"(?P<{variable}>{value_pattern})"
+        pattern_parts.append(value_pattern)
+        pattern_parts.append(get_literal_pattern(next_literal))
+    pattern_parts.append(r"\s*$")
+
+    pattern = "".join(pattern_parts)
+    return re.compile(pattern.encode() if binary else pattern)
@@ -0,0 +1,194 @@
+"""
+Block-oriented readers of log files, which yield lines as bytes.
+"""
+
+import mmap
+import os
+import queue
+import threading
+import zlib
+from time import perf_counter
+from typing import Any, BinaryIO, Dict, Generator, Iterable, Optional, Union
+
+READ_BLOCK_SIZE = 1 << 20
+DECOMPRESSED_BLOCK_SIZE = 4 << 20
+BLOCKS_QUEUE_SIZE = 8
+QUEUE_POLL_TIMEOUT = 0.1
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+BLOCKS_END = object()
+
+Buffer = Union[bytes, mmap.mmap]
+
+
+def iter_buffer_lines(
+    buffer: Buffer, start: int = 0, end: Optional[int] = None
+) -> Generator[bytes, None, None]:
+    """
+    Return lines of the buffer in the [start, end) range split with find.
+    :param buffer: bytes or mmap with the log data
+    :param start: offset of the first line
+    :param end: end offset, the end of buffer by default
+    :return: generator of lines (with line breaks).
+    """
+    end = len(buffer) if end is None else end
+    find = buffer.find
+    pos = start
+    while pos < end:
+        line_end = find(b"\n", pos, end)
+        if line_end == -1:
+            yield buffer[pos:end]
+            return
+        line_end += 1
+        yield buffer[pos:line_end]
+        pos = line_end
+
+
+def iter_blocks_lines(
+    blocks: Iterable[bytes], partial_tail: bool = True
+) -> Generator[bytes, None, None]:
+    """
+    Return lines of the data split into blocks.
+    :param blocks: iterable of data blocks
+    :param partial_tail: yield the last line without the line break
+    :return: generator of lines (with line breaks).
+    """
+    tail = b""
+    for block in blocks:
+        if tail:
+            block = tail + block
+        last_line_end = block.rfind(b"\n") + 1
+        if last_line_end:
+            yield from iter_buffer_lines(block, 0, last_line_end)
+        tail = block[last_line_end:]
+    if tail and partial_tail:
+        yield tail
+
+
+def iter_block_lines(
+    fb: BinaryIO, block_size: int = READ_BLOCK_SIZE, partial_tail: bool = True
+) -> Generator[bytes, None, None]:
+    """
+    Return lines of the binary file read by large blocks.
+    :param fb: binary file object
+    :param block_size: size of read blocks
+    :param partial_tail: yield the last line without the line break
+    :return: generator of lines (with line breaks).
+    """
+    blocks = iter(lambda: fb.read(block_size), b"")
+    yield from iter_blocks_lines(blocks, partial_tail)
+
+
+def iter_gzip_blocks(
+    fb: BinaryIO, read_size: int = READ_BLOCK_SIZE
+) -> Generator[bytes, None, None]:
+    """
+    Return decompressed blocks of the gzip file (multi-member files too).
+    Size of blocks is limited with DECOMPRESSED_BLOCK_SIZE.
+    :param fb: binary gzip file object
+    :param read_size: size of compressed read blocks
+    :return: generator of decompressed data blocks.
+    """
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    member_started = False
+    for data in iter(lambda: fb.read(read_size), b""):
+        member_started = True
+        while True:
+            block = decompressor.decompress(data, DECOMPRESSED_BLOCK_SIZE)
+            if block:
+                yield block
+            if decompressor.eof:
+                data = decompressor.unused_data
+                decompressor = zlib.decompressobj(GZIP_WBITS)
+                member_started = bool(data)
+                if not data:
+                    break
+            else:
+                data = decompressor.unconsumed_tail
+                if not data and len(block) < DECOMPRESSED_BLOCK_SIZE:
+                    break
+    if member_started:
+        raise EOFError("Compressed file ended before the end-of-stream marker")
+
+
+def iter_threaded_blocks(
+    blocks: Iterable[bytes],
+    queue_size: int = BLOCKS_QUEUE_SIZE,
+    wait_stats: Optional[Dict[str, float]] = None,
+) -> Generator[bytes, None, None]:
+    """
+    Return blocks produced on the background thread and passed through
+    the bounded queue, so producing (e.g. zlib decompression, that releases
+    the GIL) overlaps with consuming of the blocks.
+    :param blocks: iterable of data blocks, iterated on the background thread
+    :param queue_size: max amount of blocks in the queue
+    :param wait_stats: dict for seconds spent in waiting by the producer
+    (producer_wait) and by the consumer (consumer_wait)
+    :return: generator of data blocks.
+    """
+    waits: Dict[str, float] = {} if wait_stats is None else wait_stats
+    waits.setdefault("producer_wait", 0.0)
+    waits.setdefault("consumer_wait", 0.0)
+    blocks_queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+    stopped = threading.Event()
+
+    def put(item: Any) -> None:
+        """
+        Put the item into the queue unless the consumer has stopped.
+        :param item: data block, end marker or exception
+        :return:
+        """
+        started_at = perf_counter()
+        while not stopped.is_set():
+            try:
+                blocks_queue.put(item, timeout=QUEUE_POLL_TIMEOUT)
+                break
+            except queue.Full:
+                continue
+        waits["producer_wait"] += perf_counter() - started_at
+
+    def produce() -> None:
+        """
+        Iterate the blocks on the background thread.
+        :return:
+        """
+        try:
+            for block in blocks:
+                if stopped.is_set():
+                    return
+                put(block)
+            put(BLOCKS_END)
+        except BaseException as e:
+            put(e)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            started_at = perf_counter()
+            item = blocks_queue.get()
+            waits["consumer_wait"] += perf_counter() - started_at
+            if item is BLOCKS_END:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        producer.join()
+
+
+def iter_mmap_lines(
+    path: str, start: int = 0, end: Optional[int] = None
+) -> Generator[bytes, None, None]:
+    """
+    Return lines of the uncompressed file mapped into memory.
+    :param path: path to the file
+    :param start: offset of the first line
+    :param end: end offset, the end of file by default
+    :return: generator of lines (with line breaks).
+    """
+    with open(path, "rb") as fb:
+        if not os.fstat(fb.fileno()).st_size:
+            return
+        with mmap.mmap(fb.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from iter_buffer_lines(mm, start, end)
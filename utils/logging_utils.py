@@ -1,11 +1,17 @@
 """
 Module for logging
 """
+import atexit
 import getpass
 import logging
+import multiprocessing
 import os
 import socket
 from logging import LoggerAdapter
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+queue_listener: Optional[QueueListener] = None
 
 
 def get_extra_data() -> dict:
@@ -37,5 +43,42 @@ def get_logger_adapter(name: str, conf: dict) -> LoggerAdapter:
         datefmt="%Y.%m.%d %H:%M:%S",
         level=conf.get("LOG_LEVEL") or "DEBUG",
     )
+    if conf.get("LOG_QUEUE"):
+        set_queue_logging()
     logger = logging.getLogger(name)
     return LoggerAdapter(logger, get_extra_data())
+
+
+def set_queue_logging() -> QueueListener:
+    """
+    Move handlers of the root logger to the listener thread, the root logger
+    only puts records into the queue, so the formatting and writing of
+    records don't block the parsing. The queue is shared with the forked
+    worker processes. The listener is stopped (and the queue is flushed)
+    at exit.
+    :return: queue listener.
+    """
+    global queue_listener
+    if queue_listener is not None:
+        return queue_listener
+    root_logger = logging.getLogger()
+    log_queue: multiprocessing.Queue = multiprocessing.Queue(-1)
+    handlers = root_logger.handlers[:]
+    for handler in handlers:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(QueueHandler(log_queue))
+    queue_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    queue_listener.start()
+    atexit.register(stop_queue_logging)
+    return queue_listener
+
+
+def stop_queue_logging() -> None:
+    """
+    Stop the queue listener, the queued records are written before.
+    :return:
+    """
+    global queue_listener
+    if queue_listener is not None:
+        queue_listener.stop()
+        queue_listener = None
@@ -0,0 +1,196 @@
+"""
+Structured metrics of the run: time of stages, counters and peak memory.
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Generator, List, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore
+
+METRICS_HISTORY_SIZE = 100
+METRICS_PREFIX = "log_analyzer"
+
+COUNTERS_HELP = {
+    "lines_read": "Lines read from the log.",
+    "lines_parsed": "Lines parsed successfully.",
+    "parse_errors": "Lines with parse errors.",
+    "bytes_read_compressed": "Bytes of the log file on the disk.",
+    "bytes_read_uncompressed": "Bytes of the log lines.",
+    "distinct_urls": "Distinct urls of the report.",
+}
+
+
+def get_peak_rss() -> Optional[int]:
+    """
+    Return peak resident set size of the process and its finished children.
+    :return: bytes or None, if it isn't available on the platform.
+    """
+    if resource is None:  # pragma: no cover
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return scale * max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+class RunMetrics:
+    """
+    Metrics of the run: wall and CPU time of stages (accumulated,
+    if the stage runs several times) and counters.
+    """
+
+    __slots__ = ("started_at", "stages", "counters")
+
+    def __init__(self) -> None:
+        """
+        Init empty metrics of the run started now.
+        """
+        self.started_at = time.time()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Generator[None, None, None]:
+        """
+        Measure wall and CPU time of the code block as the stage.
+        :param name: name of the stage
+        :return:
+        """
+        wall_started_at = time.perf_counter()
+        cpu_started_at = time.process_time()
+        try:
+            yield
+        finally:
+            stage = self.stages.setdefault(
+                name, {"wall_seconds": 0.0, "cpu_seconds": 0.0}
+            )
+            stage["wall_seconds"] += time.perf_counter() - wall_started_at
+            stage["cpu_seconds"] += time.process_time() - cpu_started_at
+
+    def add(self, name: str, value: float) -> None:
+        """
+        Add the value to the counter.
+        :param name: name of the counter
+        :param value: value to add
+        :return:
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self, success: bool = True) -> dict:
+        """
+        Return the metrics as a json serializable dict.
+        :param success: the run has finished without errors
+        :return: dict with metrics.
+        """
+        return {
+            "started_at": round(self.started_at, 3),
+            "finished_at": round(time.time(), 3),
+            "success": success,
+            "stages": {
+                name: {key: round(value, 6) for key, value in stage.items()}
+                for name, stage in self.stages.items()
+            },
+            "counters": dict(self.counters),
+            "peak_rss_bytes": get_peak_rss(),
+        }
+
+
+def save_metrics_json(
+    metrics: dict, path: str, history_size: int = METRICS_HISTORY_SIZE
+) -> None:
+    """
+    Append metrics of the run to the json document with the rolling history
+    of runs (the oldest runs are dropped) atomically.
+    :param metrics: dict with metrics of the run
+    :param path: path to the json file
+    :param history_size: max amount of runs in the history
+    :return:
+    """
+    history: List[dict] = []
+    if os.path.isfile(path):
+        try:
+            with open(path, "r", encoding="UTF-8") as f:
+                history = json.load(f).get("history", [])
+        except (OSError, ValueError, AttributeError):
+            history = []
+    history = (history + [metrics])[-max(history_size, 1) :]
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="UTF-8") as f:
+        json.dump({"last": metrics, "history": history}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def format_prometheus_metrics(metrics: dict, prefix: str = METRICS_PREFIX) -> str:
+    """
+    Return metrics of the run in the Prometheus text exposition format.
+    :param metrics: dict with metrics of the run
+    :param prefix: prefix of metric names
+    :return: text.
+    """
+    lines = []
+
+    def add_metric(name: str, help_text: str, samples: Dict[str, float]) -> None:
+        """
+        Add the gauge with samples by label strings.
+        :param name: metric name without the prefix
+        :param help_text: description of the metric
+        :param samples: dict with values by labels
+        :return:
+        """
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} gauge")
+        for labels, value in samples.items():
+            lines.append(f"{prefix}_{name}{labels} {value}")
+
+    stages = metrics["stages"]
+    for key, help_text in (
+        ("wall_seconds", "Wall time of the stage of the last run."),
+        ("cpu_seconds", "CPU time of the stage of the last run."),
+    ):
+        add_metric(
+            f"stage_{key}",
+            help_text,
+            {f'{{stage="{name}"}}': stage[key] for name, stage in stages.items()},
+        )
+    for name, value in metrics["counters"].items():
+        add_metric(name, COUNTERS_HELP.get(name, f"Counter {name}."), {"": value})
+    if metrics.get("peak_rss_bytes") is not None:
+        add_metric(
+            "peak_rss_bytes",
+            "Peak resident set size of the last run.",
+            {"": metrics["peak_rss_bytes"]},
+        )
+    add_metric(
+        "last_run_success",
+        "The last run has finished without errors.",
+        {"": int(metrics["success"])},
+    )
+    add_metric(
+        "last_run_timestamp_seconds",
+        "Finish time of the last run.",
+        {"": metrics["finished_at"]},
+    )
+    return "\n".join(lines) + "\n"
+
+
+def save_prometheus_textfile(metrics: dict, path: str) -> None:
+    """
+    Write metrics of the run into the textfile of the node exporter
+    textfile collector atomically.
+    :param metrics: dict with metrics of the run
+    :param path: path to the .prom file
+    :return:
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="UTF-8") as f:
+        f.write(format_prometheus_metrics(metrics))
+    os.replace(tmp_path, path)
@@ -0,0 +1,225 @@
+"""
+Optional NumPy backend of the exact aggregation: grouping of request times
+by url ids and statistics of the series with vectorized operations.
+"""
+
+from array import array
+from typing import Any, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore
+
+from utils.latency_series import get_quantile_rank
+
+SeriesStats = Tuple[int, float, float, float, float, Tuple[float, ...]]
+
+
+def is_numpy_available() -> bool:
+    """
+    Check if NumPy is installed.
+    :return: bool.
+    """
+    return np is not None
+
+
+def group_times_by_ids(
+    url_ids: Sequence[int], times: Sequence[float], urls_cnt: int
+) -> List["array[float]"]:
+    """
+    Return request times grouped by url ids with one stable argsort,
+    the order of times of each url is kept.
+    :param url_ids: url id of each line
+    :param times: request time of each line
+    :param urls_cnt: amount of urls
+    :return: list of arrays of request times (float64) by url ids.
+    """
+    ids = np.asarray(url_ids, dtype=np.intp)
+    order = np.argsort(ids, kind="stable")
+    sorted_times = np.asarray(times, dtype=np.float64)[order]
+    ends = np.cumsum(np.bincount(ids, minlength=urls_cnt))
+    groups = []
+    start = 0
+    for end in ends.tolist():
+        group: "array[float]" = array("d")
+        group.frombytes(sorted_times[start:end].tobytes())
+        groups.append(group)
+        start = end
+    return groups
+
+
+def group_bucketed_times_by_ids(
+    url_ids: Sequence[int],
+    times: Sequence[float],
+    run_buckets: Sequence[int],
+    run_starts: Sequence[int],
+    urls_cnt: int,
+) -> List[Tuple["array[float]", "array[int]", "array[int]"]]:
+    """
+    Return request times grouped by url ids (see group_times_by_ids)
+    with runs of bucket numbers of each group.
+    :param url_ids: url id of each line
+    :param times: request time of each line
+    :param run_buckets: bucket number of each run of lines
+    :param run_starts: index of the first line of each run
+    :param urls_cnt: amount of urls
+    :return: list of tuples (request times (float64), bucket numbers of runs
+    (uint32), indexes of the first request times of runs (int64)) by url ids.
+    """
+    ids = np.asarray(url_ids, dtype=np.intp)
+    if not len(ids):
+        return []
+    order = np.argsort(ids, kind="stable")
+    sorted_ids = ids[order]
+    sorted_times = np.asarray(times, dtype=np.float64)[order]
+    starts = np.asarray(run_starts, dtype=np.int64)
+    line_buckets = np.asarray(run_buckets, dtype=np.uint32)[
+        np.searchsorted(starts, order, side="right") - 1
+    ]
+    # runs of grouped lines start at changes of the url or the bucket
+    is_run_start = np.empty(len(ids), dtype=bool)
+    is_run_start[0] = True
+    is_run_start[1:] = (sorted_ids[1:] != sorted_ids[:-1]) | (
+        line_buckets[1:] != line_buckets[:-1]
+    )
+    grouped_run_starts = np.flatnonzero(is_run_start)
+    counts = np.bincount(ids, minlength=urls_cnt)
+    ends = np.cumsum(counts)
+    group_starts = ends - counts
+    grouped_run_buckets = line_buckets[grouped_run_starts]
+    grouped_run_offsets = (
+        grouped_run_starts - group_starts[sorted_ids[grouped_run_starts]]
+    ).astype(np.int64)
+    run_ends = np.searchsorted(grouped_run_starts, ends).tolist()
+    groups = []
+    start = 0
+    run_start = 0
+    for end, run_end in zip(ends.tolist(), run_ends):
+        group: "array[float]" = array("d")
+        group.frombytes(sorted_times[start:end].tobytes())
+        group_buckets: "array[int]" = array("I")
+        group_buckets.frombytes(grouped_run_buckets[run_start:run_end].tobytes())
+        group_offsets: "array[int]" = array("q")
+        group_offsets.frombytes(grouped_run_offsets[run_start:run_end].tobytes())
+        groups.append((group, group_buckets, group_offsets))
+        start = end
+        run_start = run_end
+    return groups
+
+
+def get_series_stats(
+    series_list: Sequence[Any], quantiles: Sequence[float] = ()
+) -> List[SeriesStats]:
+    """
+    Return statistics of the non-empty exact series of request times
+    (LatencySeries). Counts, sums (the running sums of the series) and max
+    values of all series are computed at once, max values come from
+    one np.maximum.reduceat of the concatenated series. Averages are exact
+    means of the series (see get_exact_mean).
+    Each series is partitioned once with np.partition at ranks of the median
+    and quantiles instead of sorting, values are interpolated
+    as in get_sorted_quantile, so the results are equal to the python ones.
+    :param series_list: list of non-empty series
+    :param quantiles: quantiles in [0, 1]
+    :return: list of tuples (count, time_sum, time_avg, time_max, time_med,
+    tuple of quantiles).
+    """
+    if not series_list:
+        return []
+    series_cnt = len(series_list)
+    times_list = [
+        np.frombuffer(series.times, dtype=np.float64) for series in series_list
+    ]
+    counts = np.fromiter(map(len, times_list), dtype=np.int64, count=series_cnt)
+    time_sums = np.fromiter(
+        (series.time_sum for series in series_list), dtype=np.float64, count=series_cnt
+    )
+    time_avgs = [series.mean() for series in series_list]
+    time_maxes = np.maximum.reduceat(
+        np.concatenate(times_list), np.cumsum(counts) - counts
+    )
+
+    all_quantiles = (0.5, *quantiles)
+    series_quantiles = []
+    for series_times, count in zip(times_list, counts.tolist()):
+        ranks = [get_quantile_rank(q, count) for q in all_quantiles]
+        kth = sorted({rank for low, high, _ in ranks for rank in (low, high)})
+        partitioned = np.partition(series_times, kth)
+        series_quantiles.append(
+            [
+                float(partitioned[low]) * (1 - weight)
+                + float(partitioned[high]) * weight
+                for low, high, weight in ranks
+            ]
+        )
+    return [
+        (count, time_sum, time_avg, time_max, time_med, tuple(quantile_values))
+        for count, time_sum, time_avg, time_max, (time_med, *quantile_values) in zip(
+            counts.tolist(),
+            time_sums.tolist(),
+            time_avgs,
+            time_maxes.tolist(),
+            series_quantiles,
+        )
+    ]
+
+
+def get_series_peaks(series_list: Sequence[Any]) -> List[Tuple[int, int, float]]:
+    """
+    Return peak windows of the exact series with runs of bucket numbers
+    of request times (BucketedSeries): the bucket with the largest sum
+    of request times, the earliest one of equal buckets. Sums of runs come
+    from one np.bincount of lines, sums by (series id, bucket) pairs come from
+    one np.unique and np.bincount of runs of all series, max sums of series
+    come from one np.maximum.reduceat.
+    :param series_list: list of non-empty series
+    :return: list of tuples (bucket number, count, time_sum).
+    """
+    if not series_list:
+        return []
+    series_cnt = len(series_list)
+    counts = np.fromiter(
+        (len(series.times) for series in series_list), dtype=np.int64, count=series_cnt
+    )
+    runs_counts = np.fromiter(
+        (len(series.run_starts) for series in series_list),
+        dtype=np.int64,
+        count=series_cnt,
+    )
+    times = np.concatenate(
+        [np.frombuffer(series.times, dtype=np.float64) for series in series_list]
+    )
+    run_starts = np.concatenate(
+        [np.frombuffer(series.run_starts, dtype=np.int64) for series in series_list]
+    ) + np.repeat(np.cumsum(counts) - counts, runs_counts)
+    run_buckets = np.concatenate(
+        [np.frombuffer(series.run_buckets, dtype=np.uint32) for series in series_list]
+    )
+    run_counts = np.diff(np.append(run_starts, len(times)))
+    # bincount sums values of each run sequentially as the python sum does
+    run_sums = np.bincount(
+        np.repeat(np.arange(len(run_starts)), run_counts), weights=times
+    )
+    ids = np.repeat(np.arange(series_cnt, dtype=np.int64), runs_counts)
+    keys, inverse = np.unique(
+        (ids << 32) | run_buckets.astype(np.int64), return_inverse=True
+    )
+    key_counts = np.bincount(inverse, weights=run_counts).astype(np.int64)
+    key_sums = np.bincount(inverse, weights=run_sums)
+    key_ids = keys >> 32
+    key_buckets = keys & 0xFFFFFFFF
+
+    # keys are sorted by series ids and buckets, so the first key
+    # with the max sum of the series is the earliest peak bucket
+    series_ids = np.arange(series_cnt, dtype=np.int64)
+    max_sums = np.maximum.reduceat(key_sums, np.searchsorted(key_ids, series_ids))
+    candidates = np.flatnonzero(key_sums == max_sums[key_ids])
+    peaks = candidates[np.searchsorted(key_ids[candidates], series_ids)]
+    return list(
+        zip(
+            key_buckets[peaks].tolist(),
+            key_counts[peaks].tolist(),
+            key_sums[peaks].tolist(),
+        )
+    )
@@ -0,0 +1,194 @@
+"""
+Profiling of pipeline stages with cProfile and tracemalloc.
+"""
+
+import cProfile
+import os
+import pstats
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Generator, List, Optional, Tuple
+
+PROFILE_PIPELINE = "pipeline"
+PROFILE_STAGES = "stages"
+PROFILE_FORMAT_PSTATS = "pstats"
+PROFILE_FORMAT_CALLGRIND = "callgrind"
+PIPELINE_STAGE = "total"
+TRACE_MALLOC_FRAMES = 1
+
+FuncKey = Tuple[str, int, str]
+
+
+def save_callgrind(stats: pstats.Stats, path: str) -> None:
+    """
+    Save the profile in the callgrind format (for KCachegrind, QCachegrind).
+    Costs are in microseconds.
+    :param stats: profile statistics
+    :param path: path to the output file
+    :return:
+    """
+    stats_dict: Dict[FuncKey, Any] = stats.stats  # type: ignore
+    callees: Dict[FuncKey, List[Tuple[FuncKey, int, float]]] = defaultdict(list)
+    for func, (_, _, _, _, callers) in stats_dict.items():
+        for caller, (_, calls_cnt, _, cumulative_time) in callers.items():
+            callees[caller].append((func, calls_cnt, cumulative_time))
+
+    with open(path, "w", encoding="UTF-8") as f:
+        f.write("version: 1\ncreator: log_analyzer\nevents: Microseconds\n")
+        for func, (_, _, total_time, _, _) in stats_dict.items():
+            filename, line, name = func
+            f.write(
+                f"\nfl={filename}\nfn={name}:{line}\n{line} {int(total_time * 1e6)}\n"
+            )
+            for callee, calls_cnt, cumulative_time in callees.get(func, []):
+                callee_filename, callee_line, callee_name = callee
+                f.write(
+                    f"cfl={callee_filename}\ncfn={callee_name}:{callee_line}\n"
+                    f"calls={calls_cnt} {callee_line}\n"
+                    f"{line} {int(cumulative_time * 1e6)}\n"
+                )
+
+
+def format_malloc_top(
+    snapshot: tracemalloc.Snapshot,
+    previous_snapshot: Optional[tracemalloc.Snapshot],
+    top_cnt: int,
+) -> List[str]:
+    """
+    Return the top allocation sites of the snapshot (the growth since
+    the previous snapshot, if it is passed).
+    :param snapshot: tracemalloc snapshot
+    :param previous_snapshot: snapshot of the previous stage boundary
+    :param top_cnt: amount of allocation sites
+    :return: list of text lines.
+    """
+    filters = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    snapshot = snapshot.filter_traces(filters)
+    if previous_snapshot is None:
+        return [str(stat) for stat in snapshot.statistics("lineno")[:top_cnt]]
+    stats = snapshot.compare_to(previous_snapshot.filter_traces(filters), "lineno")
+    return [str(stat) for stat in stats[:top_cnt]]
+
+
+class StageProfiler:
+    """
+    Profiler of pipeline stages. In the pipeline mode the whole run
+    (the total stage) is profiled, in the stages mode each other stage
+    is profiled separately. With trace_malloc tracemalloc snapshots
+    are taken at boundaries of stages, and top allocation sites are saved.
+    """
+
+    __slots__ = (
+        "mode",
+        "output_format",
+        "output_dir",
+        "trace_malloc",
+        "_malloc_snapshot",
+    )
+
+    def __init__(
+        self,
+        mode: str = "",
+        output_format: str = PROFILE_FORMAT_PSTATS,
+        output_dir: str = ".",
+        trace_malloc: int = 0,
+    ):
+        """
+        Init the profiler, it is disabled with the empty mode and trace_malloc.
+        :param mode: pipeline, stages or empty
+        :param output_format: pstats or callgrind
+        :param output_dir: directory for profiles and allocation tops
+        :param trace_malloc: amount of top allocation sites (0 - no tracing)
+        """
+        self.mode = mode
+        self.output_format = output_format
+        self.output_dir = output_dir
+        self.trace_malloc = trace_malloc
+        self._malloc_snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def get_output_path(self, stage: str) -> str:
+        """
+        Return path to the profile of the stage.
+        :param stage: name of the stage
+        :return: path string.
+        """
+        if self.output_format == PROFILE_FORMAT_CALLGRIND:
+            filename = f"callgrind.out.{stage}"
+        else:
+            filename = f"profile-{stage}.pstats"
+        return os.path.join(self.output_dir, filename)
+
+    def is_profiled(self, stage: str) -> bool:
+        """
+        Check if the stage should be profiled with cProfile.
+        :param stage: name of the stage
+        :return: bool.
+        """
+        if self.mode == PROFILE_PIPELINE:
+            return stage == PIPELINE_STAGE
+        return self.mode == PROFILE_STAGES and stage != PIPELINE_STAGE
+
+    @contextmanager
+    def stage(self, name: str) -> Generator[List[str], None, None]:
+        """
+        Profile the code block as the stage.
+        :param name: name of the stage
+        :return: list, which is filled with text lines of the top
+        allocation sites at the end of the stage.
+        """
+        malloc_top: List[str] = []
+        profiler = cProfile.Profile() if self.is_profiled(name) else None
+        if self.trace_malloc and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_MALLOC_FRAMES)
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield malloc_top
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self.save_profile(profiler, name)
+            if self.trace_malloc:
+                malloc_top.extend(self.take_malloc_snapshot(name))
+
+    def save_profile(self, profiler: cProfile.Profile, stage: str) -> None:
+        """
+        Save the profile of the stage.
+        :param profiler: disabled profiler
+        :param stage: name of the stage
+        :return:
+        """
+        stats = pstats.Stats(profiler)
+        path = self.get_output_path(stage)
+        if self.output_format == PROFILE_FORMAT_CALLGRIND:
+            save_callgrind(stats, path)
+        else:
+            stats.dump_stats(path)
+
+    def take_malloc_snapshot(self, stage: str) -> List[str]:
+        """
+        Take the tracemalloc snapshot at the end of the stage and save
+        the top allocation sites, which have grown during the stage.
+        :param stage: name of the stage
+        :return: list of text lines.
+        """
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        malloc_top = [
+            f"Stage {stage}: traced memory {current} bytes, peak {peak} bytes"
+        ] + format_malloc_top(snapshot, self._malloc_snapshot, self.trace_malloc)
+        self._malloc_snapshot = snapshot
+        path = os.path.join(self.output_dir, f"tracemalloc-{stage}.txt")
+        with open(path, "w", encoding="UTF-8") as f:
+            f.write("\n".join(malloc_top) + "\n")
+        return malloc_top
+
+    def close(self) -> None:
+        """
+        Stop tracing of memory allocations.
+        :return:
+        """
+        self._malloc_snapshot = None
+        if self.trace_malloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
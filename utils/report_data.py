@@ -0,0 +1,89 @@
+"""
+Streamed JSON sidecar with the report data for the lazy report page.
+"""
+
+import gzip
+import json
+import os
+from itertools import islice
+from typing import IO, Any, Iterable, List
+
+REPORT_DATA_CHUNK_SIZE = 10000
+REPORT_DATA_GZIP_LEVEL = 6
+
+
+def get_report_columns(report_data: List[dict]) -> List[str]:
+    """
+    Return columns of the report data in the order of report lines keys.
+    :param report_data: list of dicts with the data of report lines
+    :return: list of column names.
+    """
+    return list(report_data[0]) if report_data else []
+
+
+def get_column_order(report_data: List[dict], column: str) -> List[int]:
+    """
+    Return indexes of report lines sorted by the values of the column
+    in ascending order, the descending order is the reversed one.
+    :param report_data: list of dicts with the data of report lines
+    :param column: column name
+    :return: list of report lines indexes.
+    """
+    return sorted(range(len(report_data)), key=lambda i: report_data[i][column])
+
+
+def write_json_array(f: IO[str], values: Iterable[Any]) -> None:
+    """
+    Write the json array of values by chunks, so the whole array
+    isn't serialized in memory.
+    :param f: text file object
+    :param values: json serializable values
+    :return:
+    """
+    values_iter = iter(values)
+    f.write("[")
+    separator = ""
+    while True:
+        chunk = list(islice(values_iter, REPORT_DATA_CHUNK_SIZE))
+        if not chunk:
+            break
+        f.write(separator)
+        f.write(json.dumps(chunk, separators=(",", ":"))[1:-1])
+        separator = ","
+    f.write("]")
+
+
+def write_report_data(
+    report_data: List[dict], data_path: str, encoding: str = "UTF-8"
+) -> None:
+    """
+    Stream the report data into the json file (gzip compressed if the path
+    ends with .gz) atomically. Lines are written as arrays of values
+    in the order of columns, and the lines order of every column is
+    pre-sorted, so the page doesn't sort large tables:
+    {"columns": [...], "rows": [[...], ...], "orders": {column: [...], ...}}.
+    :param report_data: list of dicts with the data of report lines
+    :param data_path: path to the json file
+    :param encoding: encoding of the json file
+    :return:
+    """
+    columns = get_report_columns(report_data)
+    tmp_path = f"{data_path}.tmp"
+    f: IO[str]
+    if data_path.endswith(".gz"):
+        f = gzip.open(tmp_path, "wt", REPORT_DATA_GZIP_LEVEL, encoding=encoding)
+    else:
+        f = open(tmp_path, "w", encoding=encoding)
+    with f:
+        f.write('{"columns":')
+        f.write(json.dumps(columns))
+        f.write(',"rows":')
+        write_json_array(
+            f, ([line[column] for column in columns] for line in report_data)
+        )
+        f.write(',"orders":{')
+        for i, column in enumerate(columns):
+            f.write(f'{"," if i else ""}{json.dumps(column)}:')
+            write_json_array(f, get_column_order(report_data, column))
+        f.write("}}")
+    os.replace(tmp_path, data_path)
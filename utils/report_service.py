@@ -0,0 +1,531 @@
+"""
+Asyncio HTTP service of reports: reports by dates rendered on demand,
+json slices of their data, health and metrics endpoints.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Executor
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from utils.report_data import get_report_columns
+
+SERVICE_CACHE_SIZE = 64 * 1024 * 1024
+SLICE_LIMIT = 100
+REQUEST_LINE_LIMIT = 8192
+HEADERS_LIMIT = 100
+REPORT_DATE_FORMAT = "%Y.%m.%d"
+METRICS_PREFIX = "log_analyzer_service"
+HTTP_REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+Response = namedtuple("Response", "status, headers, body")
+CacheEntry = namedtuple("CacheEntry", "value, size")
+
+
+def get_etag(body: bytes) -> str:
+    """
+    Return the strong ETag of the body.
+    :param body: body of the response
+    :return: quoted ETag.
+    """
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def make_response(
+    status: int,
+    body: bytes,
+    content_type: str,
+    etag: Optional[str] = None,
+    request_headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Return the response, it is 304 without the body if the ETag matches
+    the If-None-Match header of the request.
+    :param status: HTTP status
+    :param body: body of the response
+    :param content_type: content type of the body
+    :param etag: ETag of the body
+    :param request_headers: headers of the request with lowercase names
+    :return: named tuple (status, headers, body).
+    """
+    headers = {"Content-Type": content_type}
+    if etag is not None:
+        headers["ETag"] = etag
+        if_none_match = (request_headers or {}).get("if-none-match", "")
+        if etag in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(304, headers, b"")
+    return Response(status, headers, body)
+
+
+def get_json_size(data: Any) -> int:
+    """
+    Return the size of the json of the data.
+    :param data: json serializable data
+    :return: amount of characters.
+    """
+    return len(json.dumps(data))
+
+
+def make_json_response(status: int, data: Any) -> Response:
+    """
+    Return the json response without the ETag.
+    :param status: HTTP status
+    :param data: json serializable data
+    :return: named tuple (status, headers, body).
+    """
+    return make_response(status, json.dumps(data).encode("UTF-8"), "application/json")
+
+
+class LRUCache:
+    """
+    Cache of values bounded by their total size in bytes, least recently
+    used values are evicted first.
+    """
+
+    __slots__ = ("max_size", "size", "hits", "misses", "_entries")
+
+    def __init__(self, max_size: int = SERVICE_CACHE_SIZE):
+        """
+        Init empty cache.
+        :param max_size: max total size of values in bytes
+        """
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Any, CacheEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        """
+        Return amount of cached values.
+        :return: amount of values.
+        """
+        return len(self._entries)
+
+    def get(self, key: Any) -> Any:
+        """
+        Return the cached value and mark it as recently used.
+        :param key: key of the value
+        :return: value or None if it isn't cached.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def put(self, key: Any, value: Any, size: int) -> None:
+        """
+        Cache the value, values larger than the cache aren't cached.
+        :param key: key of the value
+        :param value: value
+        :param size: size of the value in bytes
+        :return:
+        """
+        old_entry = self._entries.pop(key, None)
+        if old_entry is not None:
+            self.size -= old_entry.size
+        if size > self.max_size:
+            return
+        self._entries[key] = CacheEntry(value, size)
+        self.size += size
+        while self.size > self.max_size:
+            _, evicted_entry = self._entries.popitem(last=False)
+            self.size -= evicted_entry.size
+
+
+class RequestCoalescer:
+    """
+    Coalescer of concurrent computations with the same key: the computation
+    is started once and all waiters get its result.
+    """
+
+    __slots__ = ("_inflight",)
+
+    def __init__(self) -> None:
+        """
+        Init the coalescer without computations in flight.
+        """
+        self._inflight: Dict[Any, "asyncio.Future[Any]"] = {}
+
+    async def run(self, key: Any, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the result of the computation of the key.
+        :param key: key of the computation
+        :param compute: function returning awaitable of the computation
+        :return: result of the computation.
+        """
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(compute())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+
+class ReportService:
+    """
+    Service of reports by dates. Report data of the date is computed once
+    in the executor (concurrent requests are coalesced), report pages
+    and json slices are cached with ETags in the size-bounded LRU cache.
+
+    Endpoints:
+    GET /reports/YYYY.MM.DD - report page,
+    GET /reports/YYYY.MM.DD/data?sort=time_sum&order=desc&limit=100&prefix=/api
+    - json slice of the report data,
+    GET /health - status of the service,
+    GET /metrics - metrics in the Prometheus text format.
+    """
+
+    def __init__(
+        self,
+        compute: Callable[[datetime], List[dict]],
+        render: Callable[[List[dict]], str],
+        executor: Executor,
+        cache_size: int = SERVICE_CACHE_SIZE,
+    ):
+        """
+        Init the service.
+        :param compute: picklable function returning report data of the date,
+        it raises FileNotFoundError if there is no log of the date
+        :param render: function returning the report page of the report data
+        :param executor: executor of computations
+        :param cache_size: max size of the cache in bytes
+        """
+        self.compute = compute
+        self.render = render
+        self.executor = executor
+        self.cache = LRUCache(cache_size)
+        self.coalescer = RequestCoalescer()
+        self.started_at = time.time()
+        self.counters: Dict[str, int] = {"requests": 0, "computations": 0}
+
+    async def get_report_data(self, report_date: datetime) -> List[dict]:
+        """
+        Return report data of the date from the cache or compute it.
+        :param report_date: date of the report
+        :return: list of report lines.
+        """
+        key = ("data", report_date)
+        report_data = self.cache.get(key)
+        if report_data is not None:
+            return report_data
+
+        async def compute() -> List[dict]:
+            """
+            Compute report data in the executor and cache it, its size
+            is measured in the default thread pool.
+            :return: list of report lines.
+            """
+            self.counters["computations"] += 1
+            loop = asyncio.get_event_loop()
+            report_data = await loop.run_in_executor(
+                self.executor, self.compute, report_date
+            )
+            size = await loop.run_in_executor(None, get_json_size, report_data)
+            self.cache.put(key, report_data, size)
+            return report_data
+
+        return await self.coalescer.run(key, compute)
+
+    async def get_cached_body(
+        self, key: Tuple, build: Callable[[], Awaitable[bytes]]
+    ) -> Tuple[bytes, str]:
+        """
+        Return the body with its ETag from the cache or build and cache it,
+        concurrent builds of the same body are coalesced.
+        :param key: key of the body
+        :param build: function returning awaitable of the body
+        :return: tuple (body, etag).
+        """
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        async def build_cached() -> Tuple[bytes, str]:
+            """
+            Build the body and cache it with its ETag.
+            :return: tuple (body, etag).
+            """
+            body = await build()
+            self.cache.put(key, (body, get_etag(body)), len(body))
+            return body, get_etag(body)
+
+        return await self.coalescer.run(key, build_cached)
+
+    def render_page(self, report_data: List[dict]) -> bytes:
+        """
+        Return the rendered report page of the report data.
+        :param report_data: list of report lines
+        :return: page bytes.
+        """
+        return self.render(report_data).encode("UTF-8")
+
+    async def get_report_page(self, report_date: datetime) -> bytes:
+        """
+        Return the rendered report page of the date. The template is read
+        and the page is rendered in the default thread pool, so they don't
+        block the event loop.
+        :param report_date: date of the report
+        :return: page bytes.
+        """
+        report_data = await self.get_report_data(report_date)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.render_page, report_data)
+
+    @staticmethod
+    def build_slice(report_data: List[dict], params: Dict[str, str]) -> bytes:
+        """
+        Return the json slice of report data.
+        :param report_data: list of report lines
+        :param params: query params: sort (column), order (asc or desc),
+        limit and prefix of urls
+        :return: json bytes.
+        """
+        prefix = params.get("prefix", "")
+        rows = [row for row in report_data if row["url"].startswith(prefix)]
+        sort = params.get("sort")
+        if sort:
+            rows.sort(key=lambda row: row[sort], reverse=params.get("order") != "asc")
+        limit = int(params.get("limit", SLICE_LIMIT))
+        return json.dumps(rows[:limit] if limit > 0 else rows).encode("UTF-8")
+
+    async def get_report_slice(
+        self, report_date: datetime, params: Dict[str, str]
+    ) -> bytes:
+        """
+        Return the json slice of report data of the date, it is built
+        in the default thread pool (see get_report_page).
+        :param report_date: date of the report
+        :param params: query params (see build_slice)
+        :return: json bytes.
+        """
+        report_data = await self.get_report_data(report_date)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.build_slice, report_data, params)
+
+    def get_slice_params(self, query: str) -> Dict[str, str]:
+        """
+        Return validated query params of the json slice, the sort column
+        is validated with report data (see is_sort_column).
+        :param query: query string
+        :return: dict with params.
+        """
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        if params.get("order", "desc") not in ("asc", "desc"):
+            raise ValueError(f"Unknown sort order: {params['order']!r}")
+        int(params.get("limit", SLICE_LIMIT))
+        return {
+            key: params[key]
+            for key in ("sort", "order", "limit", "prefix")
+            if key in params
+        }
+
+    @staticmethod
+    def is_sort_column(report_data: List[dict], sort: Optional[str]) -> bool:
+        """
+        Check that the sort column of the json slice is a column of the report
+        data, so columns of percentiles and peak windows are sortable too.
+        :param report_data: list of report lines
+        :param sort: sort column or None
+        :return: bool.
+        """
+        return (
+            sort is None or not report_data or sort in get_report_columns(report_data)
+        )
+
+    def format_metrics(self) -> str:
+        """
+        Return metrics of the service in the Prometheus text format.
+        :return: text.
+        """
+        samples = (
+            (
+                "requests_total",
+                "counter",
+                "Handled requests.",
+                self.counters["requests"],
+            ),
+            (
+                "computations_total",
+                "counter",
+                "Computations of report data.",
+                self.counters["computations"],
+            ),
+            ("cache_hits_total", "counter", "Hits of the cache.", self.cache.hits),
+            (
+                "cache_misses_total",
+                "counter",
+                "Misses of the cache.",
+                self.cache.misses,
+            ),
+            ("cache_entries", "gauge", "Entries of the cache.", len(self.cache)),
+            ("cache_bytes", "gauge", "Size of the cache in bytes.", self.cache.size),
+            (
+                "uptime_seconds",
+                "gauge",
+                "Uptime of the service.",
+                round(time.time() - self.started_at, 3),
+            ),
+        )
+        lines = []
+        for name, metric_type, help_text, value in samples:
+            lines.append(f"# HELP {METRICS_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} {metric_type}")
+            lines.append(f"{METRICS_PREFIX}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    async def handle(
+        self, method: str, target: str, headers: Dict[str, str]
+    ) -> Response:
+        """
+        Return the response to the request.
+        :param method: HTTP method
+        :param target: request target (path with the query)
+        :param headers: headers of the request with lowercase names
+        :return: named tuple (status, headers, body).
+        """
+        self.counters["requests"] += 1
+        if method not in ("GET", "HEAD"):
+            return make_json_response(405, {"error": "Method not allowed"})
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.split("/") if part]
+        if parts == ["health"]:
+            return make_json_response(
+                200, {"status": "ok", "uptime": round(time.time() - self.started_at, 3)}
+            )
+        if parts == ["metrics"]:
+            return make_response(
+                200, self.format_metrics().encode("UTF-8"), "text/plain; version=0.0.4"
+            )
+        if len(parts) not in (2, 3) or parts[0] != "reports":
+            return make_json_response(404, {"error": "Not found"})
+        if len(parts) == 3 and parts[2] != "data":
+            return make_json_response(404, {"error": "Not found"})
+
+        try:
+            report_date = datetime.strptime(parts[1], REPORT_DATE_FORMAT)
+            params = self.get_slice_params(url.query) if len(parts) == 3 else {}
+        except ValueError as e:
+            return make_json_response(400, {"error": str(e)})
+        try:
+            if len(parts) == 3:
+                report_data = await self.get_report_data(report_date)
+                if not self.is_sort_column(report_data, params.get("sort")):
+                    return make_json_response(
+                        400, {"error": f"Unknown sort column: {params['sort']!r}"}
+                    )
+                key: Tuple = ("slice", report_date, tuple(sorted(params.items())))
+                body, etag = await self.get_cached_body(
+                    key, lambda: self.get_report_slice(report_date, params)
+                )
+                content_type = "application/json"
+            else:
+                body, etag = await self.get_cached_body(
+                    ("page", report_date), lambda: self.get_report_page(report_date)
+                )
+                content_type = "text/html; charset=utf-8"
+        except FileNotFoundError as e:
+            return make_json_response(404, {"error": str(e)})
+        return make_response(200, body, content_type, etag, headers)
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Serve HTTP/1.1 requests of the connection (with keep-alive).
+        :param reader: stream reader of the connection
+        :param writer: stream writer of the connection
+        :return:
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                if len(request_line) > REQUEST_LINE_LIMIT:
+                    break
+                headers: Dict[str, str] = {}
+                for _ in range(HEADERS_LIMIT):
+                    header_line = await reader.readline()
+                    if header_line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header_line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = (
+                        request_line.decode("latin-1").rstrip().split(" ")
+                    )
+                except ValueError:
+                    response = make_json_response(400, {"error": "Bad request"})
+                    method, version = "GET", "HTTP/1.0"
+                else:
+                    try:
+                        response = await self.handle(method, target, headers)
+                    except Exception as e:
+                        response = make_json_response(500, {"error": repr(e)})
+                keep_alive = (
+                    version == "HTTP/1.1"
+                    and headers.get("connection", "").lower() != "close"
+                )
+                writer.write(
+                    self.format_response(
+                        response, include_body=method != "HEAD", keep_alive=keep_alive
+                    )
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def format_response(
+        response: Response, include_body: bool = True, keep_alive: bool = False
+    ) -> bytes:
+        """
+        Return the HTTP/1.1 response bytes.
+        :param response: named tuple (status, headers, body)
+        :param include_body: the body is sent (it isn't for HEAD requests)
+        :param keep_alive: the connection is kept open
+        :return: bytes.
+        """
+        headers = dict(
+            response.headers,
+            **{
+                "Content-Length": str(len(response.body)),
+                "Connection": "keep-alive" if keep_alive else "close",
+            },
+        )
+        head = f"HTTP/1.1 {response.status} {HTTP_REASONS.get(response.status, '')}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        return (head + "\r\n").encode("latin-1") + (
+            response.body if include_body else b""
+        )
+
+    async def serve(self, host: str, port: int) -> None:
+        """
+        Serve requests until the task is cancelled.
+        :param host: host to bind
+        :param port: port to bind
+        :return:
+        """
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,270 @@
+"""
+Time buckets of request times: bucket numbers of nginx $time_local values
+and per-url latency with buckets of requests for the peak window view.
+"""
+
+from array import array
+from datetime import date, datetime, timezone
+from itertools import chain, islice
+from operator import lt
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from utils.latency_series import LatencySeries
+from utils.latency_summary import DEFAULT_RELATIVE_ACCURACY, LatencySummary
+
+TIME_BUCKET_MINUTE = "minute"
+TIME_BUCKET_HOUR = "hour"
+TIME_BUCKET_SECONDS = {TIME_BUCKET_MINUTE: 60, TIME_BUCKET_HOUR: 3600}
+# $time_local is "29/Jun/2017:03:50:22 +0300", buckets are its prefixes
+TIME_BUCKET_KEY_SIZES = {TIME_BUCKET_MINUTE: 17, TIME_BUCKET_HOUR: 14}
+BUCKET_TYPECODE = "I"
+RUN_START_TYPECODE = "q"
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+MONTHS = {
+    month: number
+    for number, month in enumerate(
+        (
+            "Jan",
+            "Feb",
+            "Mar",
+            "Apr",
+            "May",
+            "Jun",
+            "Jul",
+            "Aug",
+            "Sep",
+            "Oct",
+            "Nov",
+            "Dec",
+        ),
+        1,
+    )
+}
+
+BucketStats = Dict[int, List[float]]
+
+
+def get_time_bucket_size(time_bucket: str) -> int:
+    """
+    Return size of the $time_local prefix, which is the key of the time bucket.
+    The prefix is sliced at the fixed offset, so there is no date parsing
+    per line.
+    :param time_bucket: minute or hour
+    :return: size of the prefix.
+    """
+    if time_bucket not in TIME_BUCKET_KEY_SIZES:
+        raise ValueError(f"Unknown time bucket: {time_bucket!r}")
+    return TIME_BUCKET_KEY_SIZES[time_bucket]
+
+
+def get_time_bucket(key: Union[str, bytes], bucket_seconds: int) -> int:
+    """
+    Return the bucket number of the $time_local prefix: seconds of the local
+    time (the offset is ignored) since the epoch divided by the bucket size.
+    Fields are taken at fixed offsets instead of strptime.
+    :param key: prefix of $time_local (str or bytes), e.g. "29/Jun/2017:03:50"
+    :param bucket_seconds: size of the bucket in seconds
+    :return: bucket number.
+    """
+    text = key.decode("ascii") if isinstance(key, bytes) else key
+    day = date(int(text[7:11]), MONTHS[text[3:6]], int(text[0:2])).toordinal()
+    seconds = (day - EPOCH_ORDINAL) * 86400 + int(text[12:14]) * 3600
+    if len(text) >= TIME_BUCKET_KEY_SIZES[TIME_BUCKET_MINUTE]:
+        seconds += int(text[15:17]) * 60
+    return seconds // bucket_seconds
+
+
+def format_time_bucket(bucket: int, bucket_seconds: int) -> str:
+    """
+    Return the readable label of the bucket with its start time.
+    :param bucket: bucket number
+    :param bucket_seconds: size of the bucket in seconds
+    :return: label, e.g. "2017-06-29 03:50".
+    """
+    started_at = datetime.fromtimestamp(bucket * bucket_seconds, timezone.utc)
+    return started_at.strftime("%Y-%m-%d %H:%M")
+
+
+def get_peak_window(bucket_stats: BucketStats) -> Optional[Tuple[int, int, float]]:
+    """
+    Return the bucket with the largest sum of request times,
+    the earliest one of equal buckets.
+    :param bucket_stats: dict with lists [count, time_sum] by bucket numbers
+    :return: tuple (bucket number, count, time_sum) or None without buckets.
+    """
+    if not bucket_stats:
+        return None
+    bucket, (count, time_sum) = max(
+        bucket_stats.items(), key=lambda item: (item[1][1], -item[0])
+    )
+    return bucket, int(count), time_sum
+
+
+class BucketedSeries(LatencySeries):
+    """
+    Series of request times with runs of bucket numbers: the bucket
+    and the index of the first request time of each run of request times
+    of the same bucket.
+
+    Lines are in the order of time, so the bucket changes rarely and the line
+    costs only the comparison with the last bucket. Stats by buckets
+    are computed only for urls of the report, sums of runs are taken
+    from slices of the times array.
+    """
+
+    __slots__ = ("run_buckets", "run_starts", "last_bucket")
+
+    def __init__(
+        self,
+        times: Optional["array[float]"] = None,
+        run_buckets: Optional["array[int]"] = None,
+        run_starts: Optional["array[int]"] = None,
+    ) -> None:
+        """
+        Init the series, arrays are taken without copying.
+        :param times: array of request times
+        :param run_buckets: array of bucket numbers of runs of request times
+        :param run_starts: array of indexes of the first request times of runs
+        """
+        super().__init__(times)
+        self.run_buckets: "array[int]" = (
+            array(BUCKET_TYPECODE) if run_buckets is None else run_buckets
+        )
+        self.run_starts: "array[int]" = (
+            array(RUN_START_TYPECODE) if run_starts is None else run_starts
+        )
+        self.last_bucket = self.run_buckets[-1] if self.run_buckets else -1
+
+    def add(self, value: float, bucket: int = 0) -> None:  # type: ignore[override]
+        """
+        Add request time of the bucket to the series.
+        :param value: request time
+        :param bucket: bucket number
+        :return:
+        """
+        if bucket != self.last_bucket:
+            self.last_bucket = bucket
+            self.run_buckets.append(bucket)
+            self.run_starts.append(len(self.times))
+        self.times.append(value)
+        self.time_sum += value
+
+    def merge(self, other: LatencySeries) -> "BucketedSeries":
+        """
+        Merge the other series into this one.
+        :param other: other series
+        :return: this series.
+        """
+        offset = len(self.times)
+        super().merge(other)
+        if isinstance(other, BucketedSeries) and other.run_buckets:
+            self.run_buckets.extend(other.run_buckets)
+            self.run_starts.extend(start + offset for start in other.run_starts)
+            self.last_bucket = other.last_bucket
+        return self
+
+    def get_run_ends(self) -> Iterator[int]:
+        """
+        Return end indexes of runs of request times.
+        :return: iterator of indexes.
+        """
+        return islice(chain(self.run_starts, (len(self.times),)), 1, None)
+
+    def get_bucket_stats(self) -> BucketStats:
+        """
+        Return counts and sums of request times by buckets.
+        :return: dict with lists [count, time_sum] by bucket numbers.
+        """
+        bucket_stats: BucketStats = {}
+        times = self.times
+        for bucket, start, end in zip(
+            self.run_buckets, self.run_starts, self.get_run_ends()
+        ):
+            stats = bucket_stats.get(bucket)
+            if stats is None:
+                bucket_stats[bucket] = [end - start, sum(times[start:end])]
+            else:
+                stats[0] += end - start
+                stats[1] += sum(times[start:end])
+        return bucket_stats
+
+    def get_peak_window(self) -> Optional[Tuple[int, int, float]]:
+        """
+        Return the bucket with the largest sum of request times, the earliest
+        one of equal buckets. If buckets of runs are increasing (lines
+        are in the order of time), each run is the whole bucket, so sums
+        of runs are compared without stats by buckets.
+        :return: tuple (bucket number, count, time_sum) or None without buckets.
+        """
+        run_buckets = self.run_buckets
+        if not run_buckets:
+            return None
+        if not all(map(lt, run_buckets, islice(run_buckets, 1, None))):
+            return get_peak_window(self.get_bucket_stats())
+        run_starts = self.run_starts
+        run_ends = list(self.get_run_ends())
+        times = self.times
+        run_sums: List[float] = [
+            sum(times[start:end]) for start, end in zip(run_starts, run_ends)
+        ]
+        peak = max(range(len(run_sums)), key=lambda run: run_sums[run])
+        return run_buckets[peak], run_ends[peak] - run_starts[peak], run_sums[peak]
+
+
+class BucketedSummary(LatencySummary):
+    """
+    Summary of request times with counts and sums of request times by buckets.
+    """
+
+    __slots__ = ("bucket_stats",)
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        """
+        Init the empty summary.
+        :param relative_accuracy: relative error bound of quantiles estimation
+        """
+        super().__init__(relative_accuracy)
+        self.bucket_stats: BucketStats = {}
+
+    def add(self, value: float, bucket: int = 0) -> None:  # type: ignore[override]
+        """
+        Add request time of the bucket to the summary.
+        :param value: request time
+        :param bucket: bucket number
+        :return:
+        """
+        super().add(value)
+        stats = self.bucket_stats.get(bucket)
+        if stats is None:
+            self.bucket_stats[bucket] = [1, value]
+        else:
+            stats[0] += 1
+            stats[1] += value
+
+    def merge(self, other: LatencySummary) -> "BucketedSummary":
+        """
+        Merge the other summary into this one.
+        :param other: other summary
+        :return: this summary.
+        """
+        super().merge(other)
+        for bucket, (count, time_sum) in getattr(other, "bucket_stats", {}).items():
+            stats = self.bucket_stats.setdefault(bucket, [0, 0.0])
+            stats[0] += count
+            stats[1] += time_sum
+        return self
+
+    def get_bucket_stats(self) -> BucketStats:
+        """
+        Return counts and sums of request times by buckets.
+        :return: dict with lists [count, time_sum] by bucket numbers.
+        """
+        return self.bucket_stats
+
+    def get_peak_window(self) -> Optional[Tuple[int, int, float]]:
+        """
+        Return the bucket with the largest sum of request times,
+        the earliest one of equal buckets.
+        :return: tuple (bucket number, count, time_sum) or None without buckets.
+        """
+        return get_peak_window(self.bucket_stats)
@@ -0,0 +1,62 @@
+"""
+Normalization of urls into templates, e.g. /api/v2/banner/{id}.
+"""
+
+import re
+from functools import lru_cache
+from typing import Callable, Iterable, List, Pattern, Sequence, Tuple
+
+URL_NORMALIZE_CACHE_SIZE = 100000
+
+SEGMENT_END = r"(?=[/;.]|$)"
+DEFAULT_URL_RULES: Tuple[Tuple[str, str], ...] = (
+    (
+        r"/[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+        + SEGMENT_END,
+        "/{uuid}",
+    ),
+    (r"/\d+" + SEGMENT_END, "/{id}"),
+    (r"/(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{8,}" + SEGMENT_END, "/{hex}"),
+)
+
+
+def compile_url_rules(rules: Iterable[Sequence[str]]) -> List[Tuple[Pattern, str]]:
+    """
+    Compile (pattern, replacement) rules of urls normalization.
+    :param rules: pairs of regex pattern and replacement string
+    :return: list of compiled rules.
+    """
+    return [(re.compile(pattern), replacement) for pattern, replacement in rules]
+
+
+def get_url_normalizer(
+    rules: Iterable[Sequence[str]] = DEFAULT_URL_RULES,
+    strip_query: bool = True,
+    cache_size: int = URL_NORMALIZE_CACHE_SIZE,
+) -> Callable[[str], str]:
+    """
+    Return the function, that normalizes the url into its template.
+    Results are kept in the bounded LRU cache by the raw url, so repeated
+    urls cost one lookup.
+    :param rules: pairs of regex pattern and replacement string,
+    applied to the path in order
+    :param strip_query: remove query string of the url
+    :param cache_size: max amount of cached urls
+    :return: url normalization function.
+    """
+    compiled_rules = compile_url_rules(rules)
+
+    @lru_cache(maxsize=cache_size)
+    def normalize_url(url: str) -> str:
+        """
+        Return the template of the url.
+        :param url: raw url
+        :return: normalized url.
+        """
+        if strip_query:
+            url = url.split("?", 1)[0]
+        for pattern, replacement in compiled_rules:
+            url = pattern.sub(replacement, url)
+        return url
+
+    return normalize_url